@@ -5,10 +5,19 @@ echo "=== Deploying Simple StyleGenieAI Lambda Function ==="
 # Copy the simple_ai_lambda.py to lambda_function.py
 echo "Copying Lambda function code..."
 cp ../lambda/simple_ai_lambda.py lambda_function.py
+cp -r ../stylegenie stylegenie
 
-# Zip the file
+# Pillow (Lambda's Linux build) for the WebP image variants; without it only the PNG is served.
+# boto3 >= 1.35 for S3 conditional writes (IfNoneMatch), which the runtime's bundled boto3 may predate;
+# without them identical requests are only coalesced within a container
+echo "Installing Pillow and boto3..."
+mkdir -p vendor
+pip install --quiet --platform manylinux2014_x86_64 --python-version 3.9 --only-binary=:all: --target vendor pillow "boto3>=1.35"
+
+# Zip the handler together with the shared helpers, Pillow and boto3
 echo "Creating deployment package..."
-zip lambda_function.zip lambda_function.py
+zip -r lambda_function.zip lambda_function.py stylegenie -x "*/__pycache__/*"
+(cd vendor && zip -qr ../lambda_function.zip . -x "*/__pycache__/*")
 
 # Update the Lambda function
 echo "Updating Lambda function code..."
@@ -31,8 +40,15 @@ aws iam attach-role-policy \
   --role-name LambdaBedrockExecutionRole \
   --policy-arn arn:aws:iam::aws:policy/AmazonS3FullAccess
 
+# Bedrock access and lambda:InvokeFunction on StyleGenieAI, used by its asynchronous self-invocations
+echo "Adding Bedrock and self-invocation permissions to Lambda role..."
+aws iam put-role-policy \
+  --role-name LambdaBedrockExecutionRole \
+  --policy-name StyleGenieBedrockLambda \
+  --policy-document file://bedrock-lambda-policy.json
+
 echo "Cleaning up temporary files..."
-rm lambda_function.py lambda_function.zip
+rm -rf lambda_function.py lambda_function.zip stylegenie vendor
 
 echo "=== Lambda Deployment Complete ==="
 echo ""
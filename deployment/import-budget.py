@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import subprocess
+import sys
+
+# Repository root and the Lambda handler modules to check
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HANDLERS = {
+    "lambda_function": REPO_ROOT,
+    "simple_ai_lambda": os.path.join(REPO_ROOT, "lambda"),
+    "fixed_ai_lambda": os.path.join(REPO_ROOT, "lambda"),
+    "complete_ai_lambda": os.path.join(REPO_ROOT, "lambda")
+}
+
+# Modules that must not be imported at init; clients are built on first use
+FORBIDDEN_MODULES = ("boto3", "botocore")
+
+def profile_import(module, directory):
+    """Import a handler in a fresh interpreter with -X importtime and parse the report"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([directory, REPO_ROOT, env.get("PYTHONPATH", "")])
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def baseline_modules():
+    """Modules the bare interpreter imports, which do not count against the budget"""
+    return profile_import("sys", REPO_ROOT)
+
+def check_handler(module, directory, baseline, max_ms, max_modules):
+    modules = profile_import(module, directory)
+    extra = {name: times for name, times in modules.items() if name not in baseline}
+    init_ms = sum(self_us for self_us, _ in extra.values()) / 1000
+    slowest = sorted(extra.items(), key=lambda item: item[1][0], reverse=True)[:5]
+
+    print(f"{module}: {init_ms:.1f} ms, {len(extra)} modules (budget {max_ms} ms, {max_modules} modules)")
+    for name, (self_us, _) in slowest:
+        print(f"    {self_us / 1000:7.1f} ms  {name}")
+
+    failures = []
+    if init_ms > max_ms:
+        failures.append(f"{module} import took {init_ms:.1f} ms (budget {max_ms} ms)")
+    if len(extra) > max_modules:
+        failures.append(f"{module} imported {len(extra)} modules (budget {max_modules})")
+    for name in extra:
+        if name.split(".")[0] in FORBIDDEN_MODULES:
+            failures.append(f"{module} imports {name} at init")
+            break
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Check Lambda handler cold-start import cost against a budget")
+    parser.add_argument("--max-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "100")))
+    parser.add_argument("--max-modules", type=int, default=int(os.environ.get("IMPORT_BUDGET_MODULES", "85")))
+    parser.add_argument("handlers", nargs="*", default=list(HANDLERS))
+    args = parser.parse_args()
+
+    baseline = baseline_modules()
+    failures = []
+    for module in args.handlers:
+        failures.extend(check_handler(module, HANDLERS[module], baseline, args.max_ms, args.max_modules))
+
+    if failures:
+        print("\nImport budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nAll handlers within import budget")
+
+if __name__ == "__main__":
+    main()
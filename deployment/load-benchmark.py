@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+import argparse
+import functools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Repository root and the Lambda handler modules to drive
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HANDLERS = {
+    "lambda_function": REPO_ROOT,
+    "simple_ai_lambda": os.path.join(REPO_ROOT, "lambda"),
+    "fixed_ai_lambda": os.path.join(REPO_ROOT, "lambda"),
+    "complete_ai_lambda": os.path.join(REPO_ROOT, "lambda")
+}
+
+# Payloads in the shape of deployment/lambda-test.py, varied so caches see distinct requests
+OCCASIONS = ["casual", "wedding", "business", "party"]
+BODY_TYPES = ["slim", "athletic", "pear", "average"]
+
+# Upper edges of the latency histogram buckets in milliseconds
+HISTOGRAM_EDGES_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000]
+
+def payloads():
+    return [{"occasion": occasion, "body_type": body_type} for occasion in OCCASIONS for body_type in BODY_TYPES]
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(seconds):
+    ms = [value * 1000 for value in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": round(percentile(ms, 0.5), 3) if ms else None,
+        "p90_ms": round(percentile(ms, 0.9), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 0.99), 3) if ms else None,
+        "max_ms": round(max(ms), 3) if ms else None
+    }
+
+def histogram(seconds):
+    counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+    for value in seconds:
+        ms = value * 1000
+        index = next((i for i, edge in enumerate(HISTOGRAM_EDGES_MS) if ms <= edge), len(HISTOGRAM_EDGES_MS))
+        counts[index] += 1
+    labels = [f"<={edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f">{HISTOGRAM_EDGES_MS[-1]}ms"]
+    return dict(zip(labels, counts))
+
+class PhaseTimer:
+    """Wall time per phase, counting only the outermost instrumented call on each thread"""
+
+    def __init__(self):
+        self.samples = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def wrap(self, phase, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            depth = getattr(self._local, "depth", 0)
+            self._local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._local.depth = depth
+                if depth == 0:
+                    self.record(phase, time.perf_counter() - start)
+        return timed
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self.samples.setdefault(phase, []).append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+    def report(self, requests):
+        with self._lock:
+            samples = dict(self.samples)
+        return {
+            phase: dict(summarize(values), total_ms=round(sum(values) * 1000, 3),
+                        per_request_ms=round(sum(values) * 1000 / max(1, requests), 3))
+            for phase, values in sorted(samples.items())
+        }
+
+def instrument(phases):
+    """Wrap the seams shared by all handlers so each phase is timed without changing them"""
+    from stylegenie import artifacts, local_backend, prompts, storage
+
+    prompts.PromptTemplate.render = phases.wrap("prompt_build", prompts.PromptTemplate.render)
+    storage.store_image = phases.wrap("upload", storage.store_image)
+    artifacts.read_images = phases.wrap("decode", artifacts.read_images)
+    json.dumps = phases.wrap("serialization", json.dumps)
+    json.loads = phases.wrap("serialization", json.loads)
+
+    invoke_model = local_backend.BedrockRuntime.invoke_model
+    text_call = phases.wrap("text_call", invoke_model)
+    image_call = phases.wrap("image_call", invoke_model)
+
+    def route(self, modelId, body, **kwargs):
+        call = image_call if modelId.startswith("stability.") else text_call
+        return call(self, modelId=modelId, body=body, **kwargs)
+    local_backend.BedrockRuntime.invoke_model = route
+
+    # Streamed text is timed while the handler pulls each event
+    invoke_stream = local_backend.BedrockRuntime.invoke_model_with_response_stream
+
+    def stream(self, modelId, body, **kwargs):
+        response = phases.wrap("text_call", invoke_stream)(self, modelId=modelId, body=body, **kwargs)
+        events = iter(response["body"])
+        next_event = phases.wrap("text_call", next)
+
+        def timed_events():
+            while True:
+                try:
+                    yield next_event(events)
+                except StopIteration:
+                    return
+        return dict(response, body=timed_events())
+    local_backend.BedrockRuntime.invoke_model_with_response_stream = stream
+
+def run_load(handler, events, settings):
+    """Drive handler with events and return (latencies, errors, elapsed seconds)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(index, scheduled):
+        event = events[index % len(events)]
+        try:
+            response = handler(event, None)
+            status = response.get("statusCode", 200) if isinstance(response, dict) else 200
+            error = None if status == 200 else f"status {status}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+        # Open-loop latency counts from the scheduled start, so queueing is not hidden
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            if error:
+                errors.append(error)
+
+    total = settings["requests"]
+    start = time.perf_counter()
+    if settings["rps"]:
+        with ThreadPoolExecutor(max_workers=settings["max_workers"]) as executor:
+            for index in range(total):
+                scheduled = start + index / settings["rps"]
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(one, index, scheduled)
+    else:
+        counter = iter(range(total))
+        counter_lock = threading.Lock()
+
+        def client():
+            while True:
+                with counter_lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                one(index, time.perf_counter())
+
+        threads = [threading.Thread(target=client) for _ in range(settings["concurrency"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+def run_worker(name, settings):
+    """Benchmark one handler in this process and print its report as JSON"""
+    sys.path[:0] = [HANDLERS[name], REPO_ROOT]
+    from stylegenie import clients, local_backend
+    clients.use_backend("local")
+    local_backend.configure(**settings["backend"])
+
+    start = time.perf_counter()
+    module = __import__(name)
+    init_ms = (time.perf_counter() - start) * 1000
+
+    # Events are serialized before instrumenting so the harness does not count as handler time
+    events = [{"body": json.dumps(payload)} for payload in payloads()]
+    phases = PhaseTimer()
+    instrument(phases)
+
+    warmup = dict(settings, requests=settings["warmup"], rps=None)
+    if warmup["requests"]:
+        run_load(module.lambda_handler, events, warmup)
+    phases.reset()
+
+    latencies, errors, elapsed = run_load(module.lambda_handler, events, settings)
+    report = {
+        "init_ms": round(init_ms, 3),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "latency": summarize(latencies),
+        "histogram": histogram(latencies),
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "phases": phases.report(len(latencies))
+    }
+    sys.stdout.write(json.JSONEncoder().encode(report) + "\n")
+
+def benchmark(name, settings):
+    env = dict(os.environ)
+    env["LOAD_BENCHMARK_SETTINGS"] = json.dumps(settings)
+    # Measure generation, not cache hits, unless caching is enabled explicitly
+    env.setdefault("CACHE_ENABLED", "false")
+    env.setdefault("PRECOMPUTED_ENABLED", "false")
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", name],
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmarking {name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def print_report(report):
+    print(f"{'handler':20s} {'rps':>8s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'errors':>7s} {'rss MB':>7s}")
+    for name, result in report["handlers"].items():
+        latency = result["latency"]
+        print(f"{name:20s} {result['throughput_rps']:8.1f} {latency['p50_ms']:9.1f} {latency['p90_ms']:9.1f} "
+              f"{latency['p99_ms']:9.1f} {result['errors']:7d} {result['max_rss_mb']:7.1f}")
+        for phase, stats in result["phases"].items():
+            print(f"    {phase:16s} {stats['per_request_ms']:9.2f} ms/request  {stats['count']:6d} calls  p99 {stats['p99_ms']:.2f} ms")
+
+def compare(report, baseline, tolerance):
+    """Return regressions of p99 latency, throughput and memory beyond tolerance"""
+    failures = []
+    if baseline.get("settings") != report["settings"]:
+        print("Warning: baseline was recorded with different settings; numbers may not be comparable")
+    for name, result in report["handlers"].items():
+        before = baseline.get("handlers", {}).get(name)
+        if not before:
+            continue
+        checks = [
+            ("p99 latency", before["latency"]["p99_ms"], result["latency"]["p99_ms"], 1),
+            ("throughput", before["throughput_rps"], result["throughput_rps"], -1),
+            ("max RSS", before["max_rss_mb"], result["max_rss_mb"], 1)
+        ]
+        for label, old, new, direction in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"{name:20s} {label:12s} {old:10.1f} -> {new:10.1f} ({change:+.1%})")
+            if change * direction > tolerance:
+                failures.append(f"{name} {label} went from {old} to {new} ({change:+.1%})")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Lambda handlers against the local Bedrock/S3 stand-in")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per handler")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before the run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients (ignored with --rps)")
+    parser.add_argument("--rps", type=float, help="Open-loop target requests per second")
+    parser.add_argument("--max-workers", type=int, default=256, help="Thread cap for open-loop requests in flight")
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Multiplier on the stand-in's model and S3 latencies (0 measures handler CPU only)")
+    parser.add_argument("--error-rate", type=float, help="Fraction of model calls that fail")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression against --compare")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("handlers", nargs="*", default=list(HANDLERS))
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, json.loads(os.environ["LOAD_BENCHMARK_SETTINGS"]))
+        return
+
+    backend = {"latency_scale": args.latency_scale}
+    if args.error_rate is not None:
+        backend["error_rate"] = args.error_rate
+    settings = {
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "rps": args.rps,
+        "max_workers": args.max_workers,
+        "backend": backend
+    }
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": settings,
+        "handlers": {}
+    }
+    for name in args.handlers:
+        report["handlers"][name] = benchmark(name, settings)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        failures = compare(report, baseline, args.tolerance)
+        if failures:
+            print("\nRegressions against baseline:")
+            for failure in failures:
+                print(f"  - {failure}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from itertools import product
+
+# Import the handler straight from the repository so results come from the same code path
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import lambda_function
+from stylegenie import batch
+from stylegenie.cache import normalize_value
+
+FIELDS = ("body_type", "occasion", "gender", "country", "age_range")
+
+def load_traffic(path):
+    """Count the parameter sets of observed requests
+
+    Each line is a JSON request body as sent to lambda_handler (or an API
+    Gateway event carrying one), optionally with a "count". Requests with
+    extra_details are skipped; they are never served from precomputed results.
+    """
+    traffic = Counter()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                body, params = lambda_function.parse_request(record)
+            except (ValueError, AttributeError):
+                continue
+            if params[5] and str(params[5]).strip():
+                continue
+            traffic[tuple(normalize_value(value) for value in params[:5])] += int(body.get("count", 1))
+    return traffic
+
+def plan(space, traffic, limit, seed=0):
+    """Return up to limit parameter sets: the most requested first, then a sample weighted by traffic
+
+    Unseen combinations are drawn with each field weighted by how often its
+    value was requested (plus one, so every value stays reachable).
+    """
+    chosen = [params for params, _ in traffic.most_common(limit)]
+    total = 1
+    for field in FIELDS:
+        total *= len(space[field])
+    if len(chosen) >= limit:
+        return chosen
+    seen = set(chosen)
+    if total <= limit:
+        return chosen + [params for params in product(*(space[field] for field in FIELDS)) if params not in seen]
+
+    weights = []
+    for position, field in enumerate(FIELDS):
+        counts = Counter()
+        for params, count in traffic.items():
+            counts[params[position]] += count
+        weights.append([counts[value] + 1 for value in space[field]])
+    rng = random.Random(seed)
+    attempts = 0
+    while len(chosen) < limit and attempts < limit * 20:
+        attempts += 1
+        params = tuple(rng.choices(space[field], weights=weights[position])[0] for position, field in enumerate(FIELDS))
+        if params not in seen:
+            seen.add(params)
+            chosen.append(params)
+    return chosen
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute lambda_function results for popular parameter sets")
+    parser.add_argument("--traffic", help="NDJSON file of observed request bodies used to weight the parameter sets")
+    parser.add_argument("--limit", type=int, default=200, help="Parameter sets to precompute")
+    parser.add_argument("--workers", type=int, default=lambda_function.BATCH_MAX_WORKERS, help="Parameter sets generated at once")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the weighted sample")
+    parser.add_argument("--force", action="store_true", help="Regenerate parameter sets that are already stored")
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned parameter sets without generating")
+    args = parser.parse_args()
+
+    if lambda_function.precomputed_store is None:
+        print("PRECOMPUTED_ENABLED is false; nothing would be served from the results")
+        sys.exit(1)
+
+    traffic = load_traffic(args.traffic) if args.traffic else Counter()
+    params_list = plan(lambda_function.PARAMETER_SPACE, traffic, args.limit, args.seed)
+    print(f"{len(params_list)} parameter sets ({len(traffic)} observed)")
+    if args.dry_run:
+        for params in params_list:
+            print("  " + json.dumps(dict(zip(FIELDS, params))))
+        return
+
+    start = time.perf_counter()
+    outcomes = Counter()
+    for index, status, error in batch.run_in_order(
+        params_list,
+        lambda params: lambda_function.precompute_outfit(*params, force=args.force),
+        args.workers
+    ):
+        status = status or "failed"
+        outcomes[status] += 1
+        if error:
+            print(f"Error precomputing {params_list[index]}: {error}")
+        if (index + 1) % 25 == 0 or index + 1 == len(params_list):
+            print(f"  {index + 1}/{len(params_list)} {dict(outcomes)}")
+    elapsed = time.perf_counter() - start
+    print(f"Done in {elapsed:.1f}s: {dict(outcomes)}")
+    if outcomes["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
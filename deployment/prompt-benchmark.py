@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import timeit
+
+# Import the handlers straight from the repository
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "lambda")]
+
+import lambda_function
+import simple_ai_lambda
+import fixed_ai_lambda
+import complete_ai_lambda
+
+# A long model answer with markdown, the worst case for the image prompt slot
+LONG_DESCRIPTION = (
+    "Here is a stylish outfit suggestion for you:\n\n"
+    "1. **Top**: A tailored navy blazer over a crisp white cotton shirt with a relaxed collar.\n"
+    "2. **Bottom**: Slim-fit stone chinos that end just above the ankle.\n"
+    "3. **Shoes**: Brown suede loafers with a thin leather sole.\n"
+    "4. **Accessories**: A minimalist silver watch, a woven belt and tortoiseshell sunglasses.\n\n"
+) * 4
+SHORT_DESCRIPTION = "A navy blazer with white shirt and chinos."
+PARAMS = ("pear", "wedding", "female", "india", "young-adult", "no heels, prefers pastel colours and breathable fabrics")
+
+def cases():
+    """(name, builder, max_length, expected_tail) for every prompt the handlers build"""
+    return [
+        ("lambda_function.description", lambda: lambda_function.build_description_prompt(*PARAMS), None, None),
+        ("lambda_function.image/short", lambda: lambda_function.build_image_prompt(SHORT_DESCRIPTION, *PARAMS), lambda_function.IMAGE_PROMPT_LIMIT, "fashionable look"),
+        ("lambda_function.image/long", lambda: lambda_function.build_image_prompt(LONG_DESCRIPTION, *PARAMS), lambda_function.IMAGE_PROMPT_LIMIT, "fashionable look"),
+        ("simple_ai_lambda.description", lambda: simple_ai_lambda.DESCRIPTION_TEMPLATE.render(body_type="pear", occasion="wedding"), None, None),
+        ("simple_ai_lambda.image/long", lambda: simple_ai_lambda.IMAGE_TEMPLATE.render(outfit_description=LONG_DESCRIPTION, occasion="wedding", body_type="pear"), 500, "high quality."),
+        ("fixed_ai_lambda.text", lambda: fixed_ai_lambda.build_prompt("wedding", "pear"), None, None),
+        ("fixed_ai_lambda.outfit_image/long", lambda: fixed_ai_lambda.OUTFIT_IMAGE_TEMPLATE.render(description=LONG_DESCRIPTION, occasion="wedding", body_type="pear"), 500, "high quality."),
+        ("fixed_ai_lambda.historical_image/long", lambda: fixed_ai_lambda.HISTORICAL_IMAGE_TEMPLATE.render(year="1950s", description=LONG_DESCRIPTION), 500, "high quality."),
+        ("complete_ai_lambda.prompt", lambda: complete_ai_lambda.PROMPT_TEMPLATE.render(occasion="wedding", body_type="pear", photo_line=""), None, None)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark prompt building for every Lambda variant")
+    parser.add_argument("--max-us", type=float, default=float(os.environ.get("PROMPT_BUDGET_US", "100")),
+                        help="Budget per prompt build in microseconds")
+    parser.add_argument("--number", type=int, default=2000, help="Builds per timing run")
+    args = parser.parse_args()
+
+    failures = []
+    for name, build, max_length, tail in cases():
+        # Best of several runs to keep scheduler noise out of the number
+        best = min(timeit.repeat(build, number=args.number, repeat=5)) / args.number * 1e6
+        prompt = build()
+        print(f"{name:42s} {best:8.1f} us  {len(prompt):5d} chars")
+
+        if best > args.max_us:
+            failures.append(f"{name} took {best:.1f} us (budget {args.max_us} us)")
+        if max_length is not None and len(prompt) > max_length:
+            failures.append(f"{name} is {len(prompt)} chars (limit {max_length})")
+        if tail is not None and not prompt.endswith(tail):
+            failures.append(f"{name} lost its fixed ending: ...{prompt[-40:]!r}")
+
+    if failures:
+        print("\nPrompt budget exceeded:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nAll prompts within budget")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,49 @@
-import json
-import boto3
-import os
 import traceback
-from datetime import datetime
 
-# Initialize Bedrock client
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+from stylegenie.engine import Engine, parse_body, pipeline, response
+from stylegenie.prompts import PromptTemplate, optional
 
 # Set the model ID to use an available model
 model_id = "anthropic.claude-3-sonnet-20240229-v1:0"
 
+# Text only, always with the full settings
+engine = Engine(
+    "complete_ai_lambda",
+    text_model_id=model_id,
+    text_settings={"max_tokens": 4096, "temperature": 0.7}
+)
+
+# Prompt template, parsed once at import
+PROMPT_TEMPLATE = PromptTemplate("""Human: I need some fashion advice for the following scenario:
+Occasion: {occasion}
+Body Type: {body_type}
+{photo_line}
+
+Please provide:
+1. Three outfit suggestions including clothes, shoes, and accessories. Each should have a detailed description.
+2. Two examples of how this style has evolved throughout history, with the year and a brief description.
+
+Format your response as JSON with the following structure:
+{{
+  "outfit_suggestions": [
+    {{ 
+      "image_url": "https://placehold.co/600x400/png?text=Outfit+Suggestion+1",
+      "description": "Complete description of the outfit"
+    }},
+    ...
+  ],
+  "historical_fashion": [
+    {{ 
+      "year": "1950s",
+      "image_url": "https://placehold.co/600x400/png?text=1950s+Fashion"
+    }},
+    ...
+  ]
+}}""")
+
 def format_response(status_code, body):
     """Format the API Gateway response with CORS headers"""
-    return {
-        "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Credentials": True
-        },
-        "body": json.dumps(body)
-    }
+    return response(status_code, body)
 
 def get_default_response():
     """Generate a default response structure if the model fails"""
@@ -51,55 +74,56 @@ def get_default_response():
         ]
     }
 
-def lambda_handler(event, context):
+def parse_request(engine, request):
+    """Read occasion, body type and photo URL from the body, or from the event when the body is not JSON"""
     try:
-        # Parse the request
-        if 'body' in event and event['body']:
-            try:
-                body = json.loads(event['body'])
-                occasion = body.get('occasion', '')
-                body_type = body.get('body_type', '')
-                photo_url = body.get('photo', '')
-            except Exception as e:
-                print(f"Error parsing body: {str(e)}")
-                occasion = event.get('occasion', '')
-                body_type = event.get('body_type', '')
-                photo_url = event.get('photo', '')
-        else:
-            occasion = event.get('occasion', '')
-            body_type = event.get('body_type', '')
-            photo_url = event.get('photo', '')
-        
-        print(f"Processing request: occasion={occasion}, body_type={body_type}, photo_url={'present' if photo_url else 'not present'}")
-        
-        if not occasion or not body_type:
-            print("Missing required parameters")
-            return format_response(400, {"error": "occasion and body_type are required"})
-        
-        # Prepare prompt for Claude
-        prompt = f"""Human: I need some fashion advice for the following scenario:
-Occasion: {occasion}
-Body Type: {body_type}
-{'Photo URL: ' + photo_url if photo_url else ''}
+        source = parse_body(request.event)
+    except Exception as e:
+        print(f"Error parsing body: {str(e)}")
+        source = request.event
+    request.params = {name: source.get(name, '') for name in ('occasion', 'body_type', 'photo')}
+    request.profile = engine.profiles["quality"]
+    print(f"Processing request: occasion={request.params['occasion']}, body_type={request.params['body_type']}, photo_url={'present' if request.params['photo'] else 'not present'}")
+    
+    if not request.params['occasion'] or not request.params['body_type']:
+        print("Missing required parameters")
+        return format_response(400, {"error": "occasion and body_type are required"})
 
-Please provide:
-1. Three outfit suggestions including clothes, shoes, and accessories. Each should have a detailed description.
-2. Two examples of how this style has evolved throughout history, with the year and a brief description.
+def advise(engine, request):
+    """Ask the model for advice, falling back to the default structure when it fails"""
+    request.prompt = PROMPT_TEMPLATE.render(
+        occasion=request.params['occasion'],
+        body_type=request.params['body_type'],
+        photo_line=optional("Photo URL: {value}", request.params['photo'])
+    )
+    
+    # Invoke Bedrock model
+    try:
+        print(f"Invoking Bedrock model: {model_id}")
+        ai_response = engine.invoke_text(request.prompt, request.profile, request.budget)
+        print(f"AI response length: {len(ai_response)}")
+    except Exception as e:
+        print(f"Error invoking Bedrock: {str(e)}")
+        print(traceback.format_exc())
+        # Return default response if Bedrock invocation fails
+        return format_response(200, get_default_response())
+    
+    # Extract the JSON part (tolerating prose, fences and truncation)
+    result = engine.extract_json(ai_response)
+    if result is None:
+        print(f"No JSON in AI response: {ai_response}")
+        return format_response(200, get_default_response())
+    print("Successfully parsed JSON from response")
+    
+    # Ensure the response has the expected structure
+    if 'outfit_suggestions' not in result or 'historical_fashion' not in result:
+        print("Response missing required fields, using default structure")
+        # Fill in missing fields with defaults
+        default = get_default_response()
+        if 'outfit_suggestions' not in result:
+            result['outfit_suggestions'] = default['outfit_suggestions']
+        if 'historical_fashion' not in result:
+            result['historical_fashion'] = default['historical_fashion']
+    request.result = result
 
-Format your response as JSON with the following structure:
-{{
-  "outfit_suggestions": [
-    {{ 
-      "image_url": "https://placehold.co/600x400/png?text=Outfit+Suggestion+1",
-      "description": "Complete description of the outfit"
-    }},
-    ...
-  ],
-  "historical_fashion": [
-    {{ 
-      "year": "1950s",
-      "image_url": "https://placehold.co/600x400/png?text=1950s+Fashion"
-    }},
-    ...
-  ]
-}} 
\ No newline at end of file
+lambda_handler = pipeline(engine, [parse_request, advise])
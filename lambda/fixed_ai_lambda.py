@@ -1,12 +1,12 @@
 import json
-import boto3
-import base64
 import os
-from datetime import datetime
-
-# Initialize Bedrock client
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-s3 = boto3.client('s3', region_name='us-east-1')
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from stylegenie import clients, tracing
+from stylegenie.cache import build_cache
+from stylegenie.engine import Engine, error_response, parse, pipeline, response
+from stylegenie.jsonstream import JSONExtractor
+from stylegenie.prompts import PromptTemplate
 
 # Set model IDs
 text_model_id = "anthropic.claude-instant-v1"
@@ -15,8 +15,53 @@ image_model_id = "stability.stable-diffusion-xl-v1"
 # S3 bucket for storing images
 S3_BUCKET = "stylegenie-uploads"
 
-def build_prompt(occasion, body_type):
-    return f"""
+# Maximum number of image generations in flight at once (1 = sequential)
+IMAGE_MAX_CONCURRENCY = clients.IMAGE_MAX_CONCURRENCY
+
+# Stream the advice and start each image as soon as its suggestion is complete
+STREAM_ADVICE = os.environ.get("STREAM_ADVICE", "true").lower() == "true"
+ADVICE_ARRAYS = ("outfit_suggestions", "historical_fashion")
+
+# Results are kept under their request_id so failed images can be retried alone
+RETRY_ENABLED = os.environ.get("RETRY_ENABLED", "true").lower() == "true"
+RETRY_TTL_SECONDS = int(os.environ.get("RETRY_TTL_SECONDS", str(24 * 3600)))
+result_store = build_cache(clients.s3, S3_BUCKET, prefix="results/", ttl=RETRY_TTL_SECONDS, name="results") if RETRY_ENABLED else None
+
+# Asynchronous jobs: submit returns a job_id at once, the work runs in a self-invocation or a local pool
+JOBS_ENABLED = os.environ.get("JOBS_ENABLED", "true").lower() == "true"
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+# Hosts allowed in callback_url; callbacks are refused unless some are configured
+JOB_CALLBACK_HOSTS = [host.strip().lower() for host in os.environ.get("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()]
+JOB_CALLBACK_TIMEOUT_SECONDS = 5
+job_store = build_cache(clients.s3, S3_BUCKET, prefix="jobs/", ttl=JOB_TTL_SECONDS, name="jobs") if JOBS_ENABLED else None
+# Pool running jobs outside Lambda (containers), created on first use
+_job_executor = None
+
+# Generation settings of the "quality" profile, scaled down by the faster profiles
+TEXT_SETTINGS = {"max_tokens": 1000, "temperature": 0.7}
+IMAGE_SETTINGS = {"cfg_scale": 8, "seed": 0, "steps": 30}
+PROFILE_ESTIMATES_MS = {"fast": 11000, "balanced": 15000, "quality": 20000}
+
+engine = Engine(
+    "fixed_ai_lambda",
+    text_model_id=text_model_id,
+    image_model_id=image_model_id,
+    text_settings=TEXT_SETTINGS,
+    image_settings=IMAGE_SETTINGS,
+    params={"occasion": "casual", "body_type": "average"},
+    profile_estimates_ms=PROFILE_ESTIMATES_MS,
+    bucket=S3_BUCKET,
+    upload_args={"ACL": "public-read"}
+)
+PROFILES = engine.profiles
+
+# Cost estimates used before any latency has been observed in this container
+IMAGE_SECONDS_PER_STEP = 0.25
+UPLOAD_SECONDS = 1.0
+
+# Prompt templates, parsed once at import
+TEXT_TEMPLATE = PromptTemplate("""
 You are a professional fashion stylist.
 Suggest 3 outfit ideas for a {body_type} body type for a {occasion} occasion.
 Each suggestion should include a detailed description and suitable style notes.
@@ -25,145 +70,378 @@ Also include 2 historical fashion references related to this style.
 Respond in JSON format with these exact keys:
 - outfit_suggestions (list of dicts with 'description' field)
 - historical_fashion (list of dicts with 'year' and 'description' fields)
-"""
+""")
+OUTFIT_IMAGE_TEMPLATE = PromptTemplate(
+    "Fashion outfit: {description}. Style for {occasion} occasion, {body_type} body type. "
+    "Professional fashion photography, detailed clothing, high quality.",
+    max_length=500,
+    flexible=('description',)
+)
+HISTORICAL_IMAGE_TEMPLATE = PromptTemplate(
+    "Historical fashion from {year}: {description}. Professional fashion photography, vintage clothing, high quality.",
+    max_length=500,
+    flexible=('description',)
+)
 
-def upload_image_to_s3(image_data, prefix):
-    """Upload base64 image to S3 and return the URL"""
-    try:
-        # Remove data URL prefix if present
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-            
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{prefix}-{timestamp}.png"
-        
-        # Upload to S3
-        s3.put_object(
-            Bucket=S3_BUCKET,
-            Key=filename,
-            Body=image_bytes,
-            ContentType='image/png',
-            ACL='public-read'
-        )
-        
-        # Return S3 URL
-        return f"https://{S3_BUCKET}.s3.amazonaws.com/{filename}"
-    except Exception as e:
-        print(f"Error uploading image to S3: {str(e)}")
+def build_prompt(occasion, body_type):
+    return TEXT_TEMPLATE.render(occasion=occasion, body_type=body_type)
+
+def image_cost_estimate(profile):
+    return profile["image"]["steps"] * IMAGE_SECONDS_PER_STEP + UPLOAD_SECONDS
+
+def affordable_profile(profile, budget):
+    """Return profile, or the fast profile, if an image still fits in the budget; else None"""
+    for candidate in (profile, PROFILES["fast"]):
+        if budget is None or budget.can_run(engine.image_latency_key(candidate), image_cost_estimate(candidate)):
+            return candidate
+    return None
+
+@tracing.traced("image")
+def generate_and_upload_image(prompt, prefix, profile=PROFILES["quality"], budget=None):
+    """Generate one image and upload it to S3, returning the URL or None"""
+    # Downgrade or skip work that would not finish before the Lambda timeout
+    chosen = affordable_profile(profile, budget)
+    if chosen is None:
+        print(f"Skipping image {prefix}: not enough time left")
         return None
+    return engine.generate_image(prompt, prefix, chosen, budget)
+
+def collect_images(futures, budget=None, on_result=None):
+    """Wait for image job futures in order, returning a URL or None for each
 
-def generate_image(prompt):
-    """Generate an image using Stability AI's SDXL model"""
+    Jobs still running when the budget runs out are abandoned and come back
+    as None, so the caller can always answer before the hard timeout.
+    on_result(index, url) is called as each one is collected.
+    """
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result(timeout=budget.remaining() if budget else None))
+        except FutureTimeoutError:
+            print("Image job did not finish before the deadline")
+            results.append(None)
+        except Exception as e:
+            print(f"Error in image job: {str(e)}")
+            results.append(None)
+        if on_result:
+            on_result(len(results) - 1, results[-1])
+    return results
+
+def generate_images(jobs, profile=PROFILES["quality"], budget=None):
+    """Run (prompt, prefix) image jobs with bounded concurrency, returning URLs (or None) in order"""
+    if not jobs:
+        return []
+    executor = ThreadPoolExecutor(max_workers=max(1, min(IMAGE_MAX_CONCURRENCY, len(jobs))))
+    job = tracing.bind(generate_and_upload_image)
     try:
-        response = bedrock.invoke_model(
-            modelId=image_model_id,
-            body=json.dumps({
-                "text_prompts": [{"text": prompt}],
-                "cfg_scale": 8,
-                "seed": 0,
-                "steps": 30,
-            })
-        )
-        
-        response_body = json.loads(response['body'].read())
-        if 'artifacts' in response_body and len(response_body['artifacts']) > 0:
-            # Get the base64 encoded image
-            return response_body['artifacts'][0]['base64']
-        else:
-            return None
-    except Exception as e:
-        print(f"Error generating image: {str(e)}")
+        return collect_images([executor.submit(job, prompt, prefix, profile, budget) for prompt, prefix in jobs], budget)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def advice_element(key, value):
+    """Validate one suggestion against the expected schema, returning it cleaned or None"""
+    if isinstance(value, str):
+        value = {"description": value}
+    if not isinstance(value, dict):
+        return None
+    description = value.get("description")
+    if not isinstance(description, str) or not description.strip():
+        return None
+    element = dict(value, description=description.strip())
+    if key == "historical_fashion":
+        element["year"] = str(value.get("year") or "").strip()
+    return element
+
+def validate_advice(data, text):
+    """Return the advice with only valid suggestions, falling back to the raw text as one outfit"""
+    data = data if isinstance(data, dict) else {}
+    advice = {}
+    for key in ADVICE_ARRAYS:
+        items = data.get(key)
+        items = items if isinstance(items, list) else []
+        advice[key] = [element for element in (advice_element(key, item) for item in items) if element]
+    if not advice["outfit_suggestions"] and not advice["historical_fashion"] and text.strip():
+        print("No JSON advice in model output; using the text as one suggestion")
+        advice["outfit_suggestions"] = [{"description": text.strip()}]
+    return advice
+
+def image_job(key, element, index, occasion, body_type):
+    """Return the (prompt, prefix) image job of a suggestion"""
+    if key == "outfit_suggestions":
+        image_prompt = OUTFIT_IMAGE_TEMPLATE.render(description=element["description"], occasion=occasion, body_type=body_type)
+        return image_prompt, f"outfit-{index+1}"
+    image_prompt = HISTORICAL_IMAGE_TEMPLATE.render(year=element["year"], description=element["description"])
+    return image_prompt, f"historical-{index+1}"
+
+def read_advice(occasion, body_type, profile, on_text, budget=None):
+    """Invoke the text model, passing its output to on_text as it arrives (or at once without streaming)"""
+    prompt = build_prompt(occasion, body_type)
+    if STREAM_ADVICE:
+        engine.stream_text(prompt, profile, on_text, budget)
+    else:
+        on_text(engine.invoke_text(prompt, profile, budget))
+
+def run_job_step(engine, request):
+    """Worker side of an asynchronous job, invoked with {"job": {"job_id": ...}}"""
+    job = request.event.get("job")
+    if job:
+        return run_job(job["job_id"], request.budget)
+
+def poll(engine, request):
+    """Return the status, progress and (partial) result of a job"""
+    job_id = request.body.get("job_id")
+    if job_id:
+        job = job_store.get(job_id, fresh=True) if job_store is not None else None
+        if job is None:
+            return error_response(404, "Unknown or expired job_id")
+        return response(200, job_view(job))
+
+def submit(engine, request):
+    """Queue the request as a job when it sets "async": true"""
+    if request.body.get("async"):
+        if job_store is None:
+            return error_response(400, "Asynchronous jobs are disabled")
+        callback_url = request.body.get("callback_url")
+        if callback_url and not JOB_CALLBACK_HOSTS:
+            return error_response(400, "Job callbacks are disabled; poll with the job_id instead")
+        if callback_url and not callback_allowed(callback_url):
+            return error_response(400, "callback_url must be an https URL on an allowed host")
+        return submit_job(request.params["occasion"], request.params["body_type"], request.profile, callback_url, request.context)
+
+def retry(engine, request):
+    """Regenerate only the failed images of an earlier request"""
+    if request.body.get("request_id"):
+        return retry_fashion_advice(request.body["request_id"], request.body.get("retry"), request.budget)
+
+def advise(engine, request):
+    """Generate new advice with the profile picked by the parse step"""
+    return generate_fashion_advice(request.params["occasion"], request.params["body_type"], request.profile, request.budget)
+
+def advice_body(record, request_id=None):
+    body = dict(record["advice"], profile=record["profile"], partial=bool(record["failed"]), failed=record["failed"])
+    if request_id:
+        body["request_id"] = request_id
+    return body
+
+def advice_response(record, request_id):
+    """Build the API response of a stored result"""
+    return response(200, advice_body(record, request_id))
+
+def placeholder_url(key, index, element):
+    if key == "outfit_suggestions":
+        return f"https://placehold.co/600x400/png?text=Outfit+Suggestion+{index+1}"
+    return f"https://placehold.co/600x400/png?text={element.get('year', '')}+Fashion"
+
+def apply_image(record, item, image_url):
+    """Set the image of one "<section>/<index>" item of a result, tracking it in record["failed"]"""
+    key, index = item.split("/")
+    element = record["advice"][key][int(index)]
+    element["image_url"] = image_url or placeholder_url(key, int(index), element)
+    image_variants = engine.image_variants(image_url)
+    if image_variants:
+        element["image_variants"] = image_variants
+    if image_url and item in record["failed"]:
+        record["failed"].remove(item)
+    elif not image_url and item not in record["failed"]:
+        record["failed"].append(item)
+
+def save_result(record):
+    """Store a result with failed images for retries and return its request_id, else None"""
+    if result_store is None or not record["failed"]:
         return None
+    request_id = os.urandom(16).hex()
+    result_store.set(request_id, record)
+    return request_id
+
+def result_items(record):
+    """The "<section>/<index>" names of every element of a stored result"""
+    return {f"{key}/{index}" for key in ADVICE_ARRAYS for index in range(len(record["advice"].get(key, [])))}
+
+def retry_fashion_advice(request_id, items=None, budget=None):
+    """Regenerate the failed images (or the given failed items) of a stored result"""
+    if isinstance(items, str):
+        items = [items]
+    if items is not None and not (isinstance(items, list) and all(isinstance(item, str) for item in items)):
+        return error_response(400, 'retry must be an item such as "outfit_suggestions/0" or a list of them')
+    record = result_store.get(request_id) if result_store is not None else None
+    if record is None:
+        return error_response(404, "Unknown or expired request_id")
+    unknown = [item for item in items or [] if item not in result_items(record)]
+    if unknown:
+        return error_response(400, f"Unknown retry items: {', '.join(unknown)}")
+    # Items that are not failed (any more) have nothing to regenerate
+    targets = [item for item in record["failed"] if not items or item in items]
+    jobs = []
+    for item in targets:
+        key, index = item.split("/")
+        jobs.append(image_job(key, record["advice"][key][int(index)], int(index), record["occasion"], record["body_type"]))
+    
+    # Reuses the stored text and images; only the failed items cost a model call
+    tracing.count("retried_images", len(jobs))
+    for item, image_url in zip(targets, generate_images(jobs, PROFILES[record["profile"]], budget)):
+        apply_image(record, item, image_url)
+    if targets:
+        result_store.set(request_id, record)
+    return advice_response(record, request_id)
 
-def lambda_handler(event, context):
+def build_advice(occasion, body_type, profile, budget=None, on_progress=None):
+    """Generate the suggestions and their images, returning the result record
+
+    Each suggestion's image starts as soon as the suggestion is complete in
+    the streamed text, so text and image latency overlap. on_progress(record,
+    completed, total) is called when the text is complete and after each image.
+    """
+    extractor = JSONExtractor(ADVICE_ARRAYS)
+    executor = ThreadPoolExecutor(max_workers=max(1, IMAGE_MAX_CONCURRENCY))
+    job = tracing.bind(generate_and_upload_image)
+    # Image futures by prompt, so suggestions seen while streaming are not generated twice
+    futures = {}
+    started = {key: 0 for key in ADVICE_ARRAYS}
+    
+    def submit(image_prompt, prefix):
+        if image_prompt not in futures:
+            futures[image_prompt] = executor.submit(job, image_prompt, prefix, profile, budget)
+        return futures[image_prompt]
+    
+    def on_text(text):
+        for key, _, value in extractor.feed(text):
+            element = advice_element(key, value)
+            if element is not None:
+                submit(*image_job(key, element, started[key], occasion, body_type))
+                started[key] += 1
+    
     try:
-        # Extract inputs
-        body = json.loads(event["body"]) if event.get("body") else event
-        occasion = body.get("occasion", "casual")
-        body_type = body.get("body_type", "average")
-        
         # Generate fashion advice using Claude Instant
-        text_response = bedrock.invoke_model(
-            modelId=text_model_id,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "temperature": 0.7,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": build_prompt(occasion, body_type)
-                            }
-                        ]
-                    }
-                ]
-            })
-        )
-        
-        # Parse text response
-        text_result = json.loads(text_response['body'].read())
-        ai_response = text_result['content'][0]['text']
-        
-        # Extract JSON from text response
-        if "```json" in ai_response:
-            json_str = ai_response.split("```json")[1].split("```")[0].strip()
-        elif "```" in ai_response:
-            json_str = ai_response.split("```")[1].strip()
-        else:
-            json_str = ai_response
-        
-        fashion_data = json.loads(json_str)
+        read_advice(occasion, body_type, profile, on_text, budget)
         
-        # Generate images for outfit suggestions
-        for i, outfit in enumerate(fashion_data.get('outfit_suggestions', [])):
-            image_prompt = f"Fashion outfit: {outfit.get('description')}. Style for {occasion} occasion, {body_type} body type. Professional fashion photography, detailed clothing, high quality."
-            image_data = generate_image(image_prompt)
-            
-            if image_data:
-                # Upload to S3 instead of including in response
-                image_url = upload_image_to_s3(image_data, f"outfit-{i+1}")
-                outfit['image_url'] = image_url or f"https://placehold.co/600x400/png?text=Outfit+Suggestion+{i+1}"
-            else:
-                outfit['image_url'] = f"https://placehold.co/600x400/png?text=Outfit+Suggestion+{i+1}"
+        # Validate the complete (or repaired) JSON; anything not started yet is submitted now
+        with tracing.span("deserialize"):
+            fashion_data = validate_advice(extractor.result(), extractor.text)
+        outfits = fashion_data["outfit_suggestions"]
+        historicals = fashion_data["historical_fashion"]
+        items = [("outfit_suggestions", i, outfit) for i, outfit in enumerate(outfits)]
+        items += [("historical_fashion", i, historical) for i, historical in enumerate(historicals)]
+        record = {"occasion": occasion, "body_type": body_type, "profile": profile["name"], "advice": fashion_data, "failed": []}
+        if on_progress:
+            on_progress(record, 0, len(items))
         
-        # Generate images for historical fashion
-        for i, historical in enumerate(fashion_data.get('historical_fashion', [])):
-            year = historical.get('year', '')
-            image_prompt = f"Historical fashion from {year}: {historical.get('description')}. Professional fashion photography, vintage clothing, high quality."
-            image_data = generate_image(image_prompt)
-            
-            if image_data:
-                # Upload to S3 instead of including in response
-                image_url = upload_image_to_s3(image_data, f"historical-{i+1}")
-                historical['image_url'] = image_url or f"https://placehold.co/600x400/png?text={year}+Fashion"
-            else:
-                historical['image_url'] = f"https://placehold.co/600x400/png?text={year}+Fashion"
-        
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            "body": json.dumps(fashion_data)
-        }
+        def on_image(index, image_url):
+            key, i, _ = items[index]
+            apply_image(record, f"{key}/{i}", image_url)
+            if on_progress:
+                on_progress(record, index + 1, len(items))
         
+        collect_images([submit(*image_job(key, element, i, occasion, body_type)) for key, i, element in items], budget, on_image)
+    finally:
+        # Do not wait for abandoned jobs; queued ones are cancelled
+        executor.shutdown(wait=False, cancel_futures=True)
+    return record
+
+def generate_fashion_advice(occasion, body_type, profile, budget=None):
+    """Generate the suggestions and their images and build the API response"""
+    record = build_advice(occasion, body_type, profile, budget)
+    return advice_response(record, save_result(record))
+
+def callback_allowed(callback_url):
+    from urllib.parse import urlparse
+    url = urlparse(callback_url)
+    return url.scheme == "https" and bool(url.hostname) and url.hostname.lower() in JOB_CALLBACK_HOSTS
+
+def job_view(job):
+    """The client's view of a job record"""
+    return {name: value for name, value in job.items() if name not in ("occasion", "body_type", "callback_url")}
+
+def submit_job(occasion, body_type, profile, callback_url=None, context=None):
+    """Store a queued job and hand it to a worker, returning 202 with its job_id"""
+    job_id = os.urandom(16).hex()
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "occasion": occasion,
+        "body_type": body_type,
+        "profile": profile["name"],
+        "callback_url": callback_url,
+        "progress": {"completed": 0, "total": None},
+        "submitted_at": int(time.time())
+    }
+    job_store.set(job_id, job)
+    view = job_view(job)
+    try:
+        if context is not None and getattr(context, "function_name", None):
+            # Lambda freezes after returning, so the worker is an async self-invocation with its own timeout
+            clients.lambda_client().invoke(
+                FunctionName=context.function_name,
+                InvocationType="Event",
+                Payload=json.dumps({"job": {"job_id": job_id}})
+            )
+        else:
+            global _job_executor
+            if _job_executor is None:
+                _job_executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS))
+            _job_executor.submit(run_job, job_id)
+    except Exception as e:
+        # Running the job here instead would bring back the API Gateway timeout it exists to avoid
+        print(f"Error dispatching job: {str(e)}")
+        job["status"] = "failed"
+        job["error"] = "The job could not be started"
+        save_job(job)
+        return error_response(503, "The job could not be started; try again later")
+    return response(202, view)
+
+def save_job(job):
+    job["updated_at"] = int(time.time())
+    # A copy, so readers of the in-process tier never see a record being updated
+    job_store.set(job["job_id"], dict(job))
+
+def run_job(job_id, budget=None):
+    """Generate a queued job, storing its progress after the text and each image, and return the final record"""
+    job = job_store.get(job_id, fresh=True)
+    if job is None:
+        print(f"Unknown job {job_id}")
+        return {"job_id": job_id, "status": "failed", "error": "Unknown or expired job_id"}
+    job = dict(job, status="running")
+    save_job(job)
+    
+    def on_progress(record, completed, total):
+        job["progress"] = {"completed": completed, "total": total}
+        job["result"] = advice_body(record)
+        save_job(job)
+    
+    try:
+        with tracing.span("job"):
+            record = build_advice(job["occasion"], job["body_type"], PROFILES[job["profile"]], budget, on_progress)
+        job["status"] = "done"
+        # Failed images can still be retried with the request_id
+        job["result"] = advice_body(record, save_result(record))
+    except Exception as e:
+        print(f"Error running job {job_id}: {str(e)}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    save_job(job)
+    notify(job)
+    return job
+
+def notify(job):
+    """POST the finished job to its callback_url, if any"""
+    if not job.get("callback_url"):
+        return
+    import urllib.request
+    request = urllib.request.Request(
+        job["callback_url"],
+        data=tracing.dumps(job_view(job)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        # A redirect could lead the POST away from the allowed hosts
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    try:
+        with urllib.request.build_opener(NoRedirect).open(request, timeout=JOB_CALLBACK_TIMEOUT_SECONDS) as reply:
+            reply.read()
     except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Content-Type": "application/json",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Credentials": True
-            },
-            "body": json.dumps({"error": str(e)})
-        }
\ No newline at end of file
+        print(f"Error calling job callback: {str(e)}")
+
+lambda_handler = pipeline(engine, [run_job_step, parse, poll, retry, submit, advise])
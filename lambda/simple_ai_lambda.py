@@ -1,139 +1,64 @@
-import json
-import boto3
-import base64
-from datetime import datetime
-
-# Initialize clients
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-s3_client = boto3.client('s3', region_name='us-east-1')
+from stylegenie import tracing
+from stylegenie.engine import Engine, parse, pipeline
+from stylegenie.prompts import PromptTemplate
 
 # S3 bucket for uploads if needed
 S3_BUCKET = "stylegenie-uploads"
 
-def lambda_handler(event, context):
-    try:
-        # Get input parameters from the event
-        body = json.loads(event.get('body', '{}')) if event.get('body') else event
-        body_type = body.get('body_type', 'average')
-        occasion = body.get('occasion', 'casual')
-        
-        # Generate outfit description using Claude Instant
-        outfit_description = generate_outfit_description(body_type, occasion)
-        
-        # Generate image using Stability AI
-        image_url = generate_outfit_image(outfit_description, body_type, occasion)
-        
-        # Return the final output as a JSON response
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({
-                'outfit_description': outfit_description,
-                'image_url': image_url
-            })
-        }
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
+# Generation settings of the "quality" profile, scaled down by the faster profiles
+TEXT_SETTINGS = {"max_tokens": 300, "temperature": 0.7}
+IMAGE_SETTINGS = {"cfg_scale": 8, "seed": 0, "steps": 30}
+PROFILE_ESTIMATES_MS = {"fast": 6000, "balanced": 8000, "quality": 11000}
+
+engine = Engine(
+    "simple_ai_lambda",
+    text_model_id="anthropic.claude-instant-v1",
+    image_model_id="stability.stable-diffusion-xl-v1",
+    text_settings=TEXT_SETTINGS,
+    image_settings=IMAGE_SETTINGS,
+    params={"body_type": "average", "occasion": "casual"},
+    profile_estimates_ms=PROFILE_ESTIMATES_MS,
+    bucket=S3_BUCKET
+)
+PROFILES = engine.profiles
+
+# Prompt templates, parsed once at import
+DESCRIPTION_TEMPLATE = PromptTemplate(
+    "You are a professional fashion stylist. Suggest a stylish outfit for a {body_type} body type, suitable for a {occasion} occasion. "
+    "The outfit should be modern, fashionable, and appropriate for the event."
+)
+IMAGE_TEMPLATE = PromptTemplate(
+    "Fashion outfit: {outfit_description}. Style for {occasion} occasion, {body_type} body type. "
+    "Professional fashion photography, detailed clothing, high quality.",
+    max_length=500,
+    flexible=('outfit_description',)
+)
 
-def generate_outfit_description(body_type, occasion):
-    """Generate outfit description using Claude Instant"""
+@tracing.traced('description')
+def describe(engine, request):
+    """Generate the outfit description using Claude Instant"""
+    request.prompt = DESCRIPTION_TEMPLATE.render(**request.params)
     try:
-        prompt = f"You are a professional fashion stylist. Suggest a stylish outfit for a {body_type} body type, suitable for a {occasion} occasion. The outfit should be modern, fashionable, and appropriate for the event."
-        
-        response = bedrock.invoke_model(
-            modelId="anthropic.claude-instant-v1",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 300,
-                "temperature": 0.7,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            })
-        )
-        
-        response_body = json.loads(response['body'].read())
-        return response_body['content'][0]['text']
+        request.text = engine.invoke_text(request.prompt, request.profile, request.budget)
     except Exception as e:
         print(f"Error generating outfit description: {str(e)}")
-        return "A stylish outfit suitable for the occasion"
+        request.text = "A stylish outfit suitable for the occasion"
 
-def upload_to_s3(image_data, prefix="fashion"):
-    """Upload base64 image to S3 and return the URL"""
-    try:
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{prefix}-{timestamp}.png"
-        
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=filename,
-            Body=image_bytes,
-            ContentType='image/png'
-        )
-        
-        # Return S3 URL
-        return f"https://{S3_BUCKET}.s3.amazonaws.com/{filename}"
-    except Exception as e:
-        print(f"Error uploading to S3: {str(e)}")
-        return f"https://placehold.co/600x400/png?text=S3+Upload+Error"
+@tracing.traced('image')
+def draw(engine, request):
+    """Generate the outfit image using Stability AI SDXL and store it with its variants"""
+    # Shorten the description to fit the model limit
+    image_prompt = IMAGE_TEMPLATE.render(outfit_description=request.text, **request.params)
+    prefix = f"outfit-{request.params['body_type']}-{request.params['occasion']}"
+    image_url = engine.generate_image(image_prompt, prefix, request.profile, request.budget)
+    request.result = {
+        'outfit_description': request.text,
+        'image_url': image_url or "https://placehold.co/600x400/png?text=Image+Generation+Error",
+        'profile': request.profile['name']
+    }
+    # Responsive WebP sources, when the image and its variants are in the bucket
+    image_variants = engine.image_variants(image_url)
+    if image_variants:
+        request.result['image_variants'] = image_variants
 
-def generate_outfit_image(outfit_description, body_type, occasion):
-    """Generate outfit image using Stability AI SDXL"""
-    try:
-        # Create image prompt
-        image_prompt = f"Fashion outfit: {outfit_description}. Style for {occasion} occasion, {body_type} body type. Professional fashion photography, detailed clothing, high quality."
-        
-        # Truncate prompt if it's too long
-        if len(image_prompt) > 500:
-            image_prompt = image_prompt[:500]
-        
-        # Call Stability AI
-        response = bedrock.invoke_model(
-            modelId="stability.stable-diffusion-xl-v1",
-            body=json.dumps({
-                "text_prompts": [{"text": image_prompt}],
-                "cfg_scale": 8,
-                "seed": 0,
-                "steps": 30,
-            })
-        )
-        
-        # Process the response and upload to S3
-        response_body = json.loads(response['body'].read())
-        if 'artifacts' in response_body and len(response_body['artifacts']) > 0:
-            image_data = response_body['artifacts'][0]['base64']
-            # Upload to S3 and get the URL
-            return upload_to_s3(image_data, f"outfit-{body_type}-{occasion}")
-        else:
-            return "https://placehold.co/600x400/png?text=No+Image+Generated"
-    except Exception as e:
-        print(f"Error generating image: {str(e)}")
-        return "https://placehold.co/600x400/png?text=Image+Generation+Error" 
\ No newline at end of file
+lambda_handler = pipeline(engine, [parse, describe, draw])
@@ -1,166 +1,625 @@
 import json
-import boto3
-import base64
+import os
+import queue
+import threading
 from datetime import datetime
-
-# Initialize AWS clients
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-s3_client = boto3.client('s3', region_name='us-east-1')
+from stylegenie import batch, clients, deadline, profiles, similarity, singleflight, storage, tracing
+from stylegenie.cache import build_cache, cache_key
+from stylegenie.engine import Engine, parse_body, pipeline, response
+from stylegenie.prompts import PromptTemplate, optional
 
 # S3 bucket for image uploads
 S3_BUCKET = "stylegenie-uploads"
 
-def lambda_handler(event, context):
+# Model IDs
+TEXT_MODEL_ID = "anthropic.claude-instant-v1"
+IMAGE_MODEL_ID = "stability.stable-diffusion-xl-v1"
+
+# Generation settings of the "quality" profile (part of the cache key)
+TEXT_SETTINGS = {"max_tokens": 300, "temperature": 0.7}
+IMAGE_SETTINGS = {"cfg_scale": 9, "seed": 0, "steps": 40}
+
+# Expected end-to-end duration per generation profile
+PROFILE_ESTIMATES_MS = {"fast": 7000, "balanced": 10000, "quality": 14000}
+
+# Image cost estimate per step, used before any latency has been observed
+IMAGE_SECONDS_PER_STEP = 0.2
+# Returned instead of an image that could not finish before the Lambda timeout
+SKIPPED_IMAGE_URL = "https://placehold.co/600x400/png?text=Image+Skipped"
+
+# SDXL prompt length limit
+IMAGE_PROMPT_LIMIT = 500
+
+# Age range wording for the text and image prompts
+AGE_MAPPING = {
+    "teen": "teenagers (13–19 years)",
+    "young-adult": "young adults (20–29 years)",
+    "adult": "adults (30–45 years)",
+    "mature": "mature adults (46–60 years)",
+    "senior": "seniors (60+ years)"
+}
+AGE_STYLE_MAP = {
+    "teen": "teen fashion",
+    "young-adult": "young adult fashion",
+    "adult": "adult fashion",
+    "mature": "mature adult fashion",
+    "senior": "senior fashion"
+}
+
+# Values offered by the frontend form; deployment/precompute-cache.py draws parameter sets from them
+PARAMETER_SPACE = {
+    "body_type": ["slim", "curvy", "athletic", "petite", "plus-size", "tall", "short", "hourglass",
+                  "pear", "apple", "rectangle", "inverted-triangle"],
+    "occasion": ["date night", "wedding", "wedding guest", "cocktail party", "formal gala", "party", "casual",
+                 "business casual", "business formal", "job interview", "beach vacation", "travel",
+                 "outdoor activities", "gym workout", "dinner", "brunch", "festival", "concert", "graduation"],
+    "gender": ["male", "female", "non-binary"],
+    "country": ["global", "us", "uk", "france", "italy", "japan", "korea", "india", "australia", "canada",
+                "brazil", "germany", "spain", "mexico", "china"],
+    "age_range": list(AGE_MAPPING)
+}
+
+# Negative prompt to reduce deformities
+NEGATIVE_PROMPT = (
+    "extra limbs, extra fingers, missing hands, distorted body, deformed face, mutated anatomy, "
+    "bad proportions, blurry, cloned hands, broken pose, duplicate arms"
+)
+
+engine = Engine(
+    'lambda_function',
+    text_model_id=TEXT_MODEL_ID,
+    image_model_id=IMAGE_MODEL_ID,
+    text_settings=TEXT_SETTINGS,
+    image_settings=IMAGE_SETTINGS,
+    profile_estimates_ms=PROFILE_ESTIMATES_MS,
+    negative_prompt=NEGATIVE_PROMPT,
+    bucket=S3_BUCKET
+)
+# Settings per generation profile
+PROFILES = engine.profiles
+
+# Prompt templates, parsed once at import
+DESCRIPTION_TEMPLATE = PromptTemplate(
+    "You are a professional fashion stylist. Suggest a stylish outfit for a {gender} "
+    "with a {body_type} body type, suitable for a {occasion} occasion. "
+    "The outfit should be modern, fashionable, and appropriate for the event."
+    "{country_context}{age_context}{extra_context}"
+)
+IMAGE_TEMPLATE = PromptTemplate(
+    "A full-body portrait of a {gender} with a {body_type} body type, standing pose, "
+    "visible head to toe, perfect human anatomy, natural lighting, realistic skin texture, DSLR photo, Canon EOS R5, "
+    "wearing: {outfit_description}. {occasion} theme{country_style}{age_style}{extra_style}, "
+    "high resolution, hyper-realistic, clean background, 85mm lens, fashionable look",
+    # The description is shortened to whole sentences to keep the prompt within the model limit
+    max_length=IMAGE_PROMPT_LIMIT,
+    flexible=('outfit_description', 'extra_style')
+)
+
+# Fallback returned when the text model fails (never cached)
+DEFAULT_DESCRIPTION = "A stylish outfit suitable for the occasion."
+
+# Response cache for descriptions and image URLs
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+response_cache = build_cache(clients.s3, S3_BUCKET) if CACHE_ENABLED else None
+# Identical generations in flight share one Bedrock call (through the cache when it is enabled)
+flights = singleflight.Group('generation')
+# Previously cached extra_details, so near-duplicate wording reuses their cache entries
+similar_index = similarity.build_index(clients.s3, S3_BUCKET) if CACHE_ENABLED else None
+
+# Complete results for popular parameter sets, written by deployment/precompute-cache.py
+PRECOMPUTED_ENABLED = os.environ.get('PRECOMPUTED_ENABLED', 'true').lower() == 'true'
+PRECOMPUTED_TTL_SECONDS = int(os.environ.get('PRECOMPUTED_TTL_SECONDS', str(30 * 24 * 3600)))
+# Most lookups miss, so a miss is remembered this long instead of reading the store on every request
+PRECOMPUTED_MISS_TTL_SECONDS = int(os.environ.get('PRECOMPUTED_MISS_TTL_SECONDS', '300'))
+precomputed_store = build_cache(
+    clients.s3, S3_BUCKET, prefix="precomputed/", ttl=PRECOMPUTED_TTL_SECONDS, name="precomputed", miss_ttl=PRECOMPUTED_MISS_TTL_SECONDS
+) if PRECOMPUTED_ENABLED else None
+
+# Stream the description and start the image as soon as its prompt is fixed
+PIPELINE_ENABLED = os.environ.get('PIPELINE_ENABLED', 'false').lower() == 'true'
+
+# Batch requests: parameter sets generated concurrently per invocation
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '8'))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '500'))
+
+def run_image_job(engine, request):
+    """Asynchronous image fill scheduled by a "respond early" request"""
+    job = request.event.get('image_job')
+    if job:
+        return {'image_url': generate_image_from_prompt(job['image_prompt'], key=job['key'], profile=job.get('profile'), budget=request.budget)}
+
+def parse(engine, request):
+    request.body, request.params = parse_request(request.event)
+    if isinstance(request.body.get('requests'), list):
+        return batch_handler(request.event, request.context)
+    # Profiles are passed around by name and resolved with profile_settings
+    request.profile = engine.profile(request.body.get('profile'), request.context, cache_probe(request.params))['name']
+    request.params = canonical_params(request.params, request.profile)
+
+def serve_precomputed(engine, request):
+    """Answer from a precomputed result without calling Bedrock"""
+    item = precomputed_outfit(*request.params)
+    if item is not None:
+        return response(200, item)
+
+def generate(engine, request):
+    """Generate the description and the image, or schedule the image when respond_early is set"""
+    params, profile, budget = request.params, request.profile, request.budget
+    image_status = None
+    if request.body.get('respond_early', False):
+        outfit_description = generate_outfit_description(*params, profile=profile, budget=budget)
+        image_url, image_status = schedule_outfit_image(outfit_description, *params, context=request.context, profile=profile)
+    else:
+        outfit_description, image_url = generate_outfit(*params, profile=profile, budget=budget)
+        if image_url == SKIPPED_IMAGE_URL:
+            image_status = 'skipped'
+
+    request.text = outfit_description
+    request.result = {
+        'outfit_description': outfit_description,
+        'image_url': image_url,
+        'profile': profile
+    }
+    if image_status:
+        request.result['image_status'] = image_status
+    else:
+        image_variants = describe_variants(image_url)
+        if image_variants:
+            request.result['image_variants'] = image_variants
+
+lambda_handler = pipeline(engine, [run_image_job, parse, serve_precomputed, generate])
+
+def parse_request(event):
+    """Return the request body and the (body_type, occasion, gender, country, age_range, extra_details) tuple"""
+    body = parse_body(event)
+    body_type = body.get('body_type', 'average')
+    occasion = body.get('occasion', 'casual')
+    gender = body.get('gender', 'female')
+    country = body.get('country', 'global')
+    age_range = body.get('age_range', 'adult')
+    extra_details = body.get('extra_details', '')  # Get extra details from request
+    return body, (body_type, occasion, gender, country, age_range, extra_details)
+
+@tracing.handler('lambda_function.stream')
+def stream_handler(event, context):
+    """Streaming variant of lambda_handler yielding NDJSON lines
+
+    Emits {"type": "text", "text": ...} for each description chunk as it
+    arrives from Bedrock, then one {"type": "result", ...} line with the
+    same fields lambda_handler returns, or {"type": "error", ...}.
+    """
     try:
-        # Parse request body
-        body = json.loads(event.get('body', '{}')) if event.get('body') else event
-        body_type = body.get('body_type', 'average')
-        occasion = body.get('occasion', 'casual')
-        gender = body.get('gender', 'female')
-        country = body.get('country', 'global')
-        age_range = body.get('age_range', 'adult')
-        extra_details = body.get('extra_details', '')  # Get extra details from request
-
-        # Generate outputs
-        outfit_description = generate_outfit_description(body_type, occasion, gender, country, age_range, extra_details)
-        image_url = generate_outfit_image(outfit_description, body_type, occasion, gender, country, age_range, extra_details)
-
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({
-                'outfit_description': outfit_description,
-                'image_url': image_url
-            })
-        }
+        body, params = parse_request(event)
+        profile = engine.profile(body.get('profile'), context, cache_probe(params))['name']
+        params = canonical_params(params, profile)
+        budget = deadline.Deadline(context)
     except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({'error': str(e)})
-        }
-
-def generate_outfit_description(body_type, occasion, gender, country, age_range, extra_details):
-    try:
-        country_context = f" Your recommendation should incorporate fashion styles and trends popular in {country}." if country and country != "global" else ""
-        age_mapping = {
-            "teen": "teenagers (13–19 years)",
-            "young-adult": "young adults (20–29 years)",
-            "adult": "adults (30–45 years)",
-            "mature": "mature adults (46–60 years)",
-            "senior": "seniors (60+ years)"
-        }
-        age_context = f" The outfit should be age-appropriate for {age_mapping.get(age_range, 'adults')}."
-        
+        yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+        return
+
+    item = precomputed_outfit(*params)
+    if item is not None:
+        yield json.dumps({'type': 'text', 'text': item['outfit_description']}) + "\n"
+        yield json.dumps(dict(item, type='result')) + "\n"
+        return
+
+    chunks = queue.Queue()
+    result = {}
+
+    def on_text(text):
+        chunks.put(text)
+
+    def run():
+        try:
+            with profiles.track_request():
+                result['outfit_description'], result['image_url'] = generate_outfit_pipelined(*params, on_text=on_text, profile=profile, budget=budget)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            result['error'] = str(e)
+        finally:
+            chunks.put(None)
+
+    threading.Thread(target=tracing.bind(run), daemon=True).start()
+
+    sent = 0
+    while True:
+        text = chunks.get()
+        if text is None:
+            break
+        if len(text) > sent:
+            yield json.dumps({'type': 'text', 'text': text[sent:]}) + "\n"
+            sent = len(text)
+
+    if 'error' in result:
+        yield json.dumps({'type': 'error', 'error': result['error']}) + "\n"
+        return
+
+    # Cached or non-streamed descriptions arrive in one piece
+    if sent < len(result['outfit_description']):
+        yield json.dumps({'type': 'text', 'text': result['outfit_description'][sent:]}) + "\n"
+    line = {
+        'type': 'result',
+        'outfit_description': result['outfit_description'],
+        'image_url': result['image_url'],
+        'profile': profile
+    }
+    image_variants = describe_variants(result['image_url'])
+    if image_variants:
+        line['image_variants'] = image_variants
+    yield json.dumps(line) + "\n"
+
+def generate_outfit(body_type, occasion, gender, country, age_range, extra_details, profile=None, budget=None):
+    """Generate the description and image for one parameter set"""
+    if PIPELINE_ENABLED:
+        return generate_outfit_pipelined(body_type, occasion, gender, country, age_range, extra_details, profile=profile, budget=budget)
+    outfit_description = generate_outfit_description(body_type, occasion, gender, country, age_range, extra_details, profile=profile, budget=budget)
+    return outfit_description, generate_outfit_image(outfit_description, body_type, occasion, gender, country, age_range, extra_details, profile=profile, budget=budget)
+
+def batch_stream_handler(event, context):
+    """Generate a list of parameter sets, yielding one NDJSON line per input in input order
+
+    Identical parameter sets (after normalization) are generated once and
+    their result is repeated for every occurrence. Items that would not finish
+    before the Lambda timeout are not started and come back as
+    {"error": "skipped"}, so the finished ones are still returned.
+    """
+    body = parse_body(event)
+    requests = body.get('requests') or []
+    budget = deadline.Deadline(context)
+    profile = profiles.select(body.get('profile'), context, PROFILE_ESTIMATES_MS)
+    item_seconds = PROFILE_ESTIMATES_MS.get(profile, PROFILE_ESTIMATES_MS['quality']) / 1000
+    if len(requests) > BATCH_MAX_ITEMS:
+        yield json.dumps({'type': 'error', 'error': f"At most {BATCH_MAX_ITEMS} requests per batch"}) + "\n"
+        return
+
+    parsed = []
+    for item in requests:
+        if not isinstance(item, dict):
+            parsed.append(ValueError("Each request must be a JSON object"))
+            continue
+        try:
+            parsed.append(canonical_params(parse_request(item)[1], profile))
+        except Exception as e:
+            parsed.append(e)
+
+    def item_key(params):
+        if isinstance(params, Exception):
+            return ('invalid', id(params))
+        return description_cache_key(*params, profile=profile)
+
+    def worker(params):
+        if isinstance(params, Exception):
+            raise params
+        item = precomputed_outfit(*params)
+        if item is not None:
+            return {name: value for name, value in item.items() if name != 'profile'}
+        remaining = budget.remaining()
+        if remaining is not None and remaining < item_seconds:
+            return {'error': 'skipped'}
+        outfit_description, image_url = generate_outfit(*params, profile=profile, budget=budget)
+        item = {'outfit_description': outfit_description, 'image_url': image_url}
+        image_variants = describe_variants(image_url)
+        if image_variants:
+            item['image_variants'] = image_variants
+        return item
+
+    unique, positions = batch.dedupe(parsed, item_key)
+    outcomes = {}
+    next_index = 0
+    skipped = 0
+    for position, result, error in batch.run_in_order(unique, worker, BATCH_MAX_WORKERS):
+        outcomes[position] = {'error': error} if error else result
+        if outcomes[position].get('error') == 'skipped':
+            skipped += 1
+        # Emit every input whose parameter set has now been generated
+        while next_index < len(positions) and positions[next_index] <= position:
+            line = {'type': 'item', 'index': next_index}
+            line.update(outcomes[positions[next_index]])
+            yield json.dumps(line) + "\n"
+            next_index += 1
+    yield json.dumps({'type': 'summary', 'count': len(parsed), 'unique': len(unique), 'skipped': skipped}) + "\n"
+
+def batch_handler(event, context):
+    """Batch entry point returning all results as JSON, or as NDJSON when format is 'ndjson'"""
+    ndjson = parse_body(event).get('format') == 'ndjson'
+
+    lines = list(batch_stream_handler(event, context))
+    if ndjson:
+        return response(200, ''.join(lines), content_type='application/x-ndjson')
+    messages = [json.loads(line) for line in lines]
+    return response(200, json.dumps({
+        'results': [message for message in messages if message['type'] == 'item'],
+        'summary': next((message for message in messages if message['type'] != 'item'), None)
+    }))
+
+def build_description_prompt(body_type, occasion, gender, country, age_range, extra_details):
+    return DESCRIPTION_TEMPLATE.render(
+        gender=gender,
+        body_type=body_type,
+        occasion=occasion,
+        country_context=optional(" Your recommendation should incorporate fashion styles and trends popular in {value}.", country, skip=("global",)),
+        age_context=f" The outfit should be age-appropriate for {AGE_MAPPING.get(age_range, 'adults')}.",
         # Add extra details context if provided
-        extra_context = f" Additional preferences: {extra_details}." if extra_details else ""
-
-        prompt = (
-            f"You are a professional fashion stylist. Suggest a stylish outfit for a {gender} "
-            f"with a {body_type} body type, suitable for a {occasion} occasion. "
-            f"The outfit should be modern, fashionable, and appropriate for the event."
-            f"{country_context}{age_context}{extra_context}"
-        )
-
-        response = bedrock.invoke_model(
-            modelId="anthropic.claude-instant-v1",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 300,
-                "temperature": 0.7,
-                "messages": [
-                    {"role": "user", "content": [{"type": "text", "text": prompt}]}
-                ]
-            })
-        )
-
-        response_body = json.loads(response['body'].read())
-        return response_body['content'][0]['text']
+        extra_context=optional(" Additional preferences: {value}.", extra_details)
+    )
+
+def profile_settings(profile=None):
+    """Return the resolved settings of a profile name (the default profile when None)"""
+    return PROFILES.get(profile) or PROFILES.get(profiles.DEFAULT_PROFILE) or PROFILES["quality"]
+
+def description_cache_key(body_type, occasion, gender, country, age_range, extra_details, profile=None):
+    params = {
+        'body_type': body_type, 'occasion': occasion, 'gender': gender,
+        'country': country, 'age_range': age_range, 'extra_details': extra_details
+    }
+    return cache_key('text', params, TEXT_MODEL_ID, profile_settings(profile)["text"])
+
+def precomputed_key(body_type, occasion, gender, country, age_range):
+    """Key of a complete result; the quality settings are included so changing them invalidates it"""
+    params = {'body_type': body_type, 'occasion': occasion, 'gender': gender, 'country': country, 'age_range': age_range}
+    return cache_key('result', params, f"{TEXT_MODEL_ID}+{IMAGE_MODEL_ID}", {'text': TEXT_SETTINGS, 'image': IMAGE_SETTINGS})
+
+def image_cache_key(image_prompt, profile=None):
+    return cache_key('image', {'image_prompt': image_prompt}, IMAGE_MODEL_ID, profile_settings(profile)["image"])
+
+def image_latency_key(profile=None):
+    return engine.image_latency_key(profile_settings(profile))
+
+def image_profile_for(profile=None, budget=None):
+    """Return the profile to render the image with in the time left: profile, "fast", or None to skip"""
+    for candidate in (profile_settings(profile)["name"], "fast"):
+        steps = profile_settings(candidate)["image"]["steps"]
+        if budget is None or budget.can_run(image_latency_key(candidate), steps * IMAGE_SECONDS_PER_STEP):
+            return candidate
+    return None
+
+def is_placeholder(image_url):
+    return image_url.startswith("https://placehold.co/")
+
+def canonical_params(params, profile=None):
+    """Replace extra_details by a previously served text with the same meaning, if there is one"""
+    body_type, occasion, gender, country, age_range, extra_details = params
+    if similar_index is None or not isinstance(extra_details, str) or not extra_details.strip():
+        return params
+    match = similar_index.lookup(description_cache_key(body_type, occasion, gender, country, age_range, '', profile=profile), extra_details)
+    if match is None:
+        return params
+    return body_type, occasion, gender, country, age_range, match[0]
+
+def cache_probe(params):
+    """Return is_cached(profile) for profiles.select: whether the description and image of params are both cached"""
+    if response_cache is None:
+        return None
+
+    def is_cached(profile):
+        params_for_profile = canonical_params(params, profile)
+        outfit_description = cached_description(*params_for_profile, profile=profile)
+        if outfit_description is None:
+            return False
+        image_prompt = build_image_prompt(outfit_description, *params_for_profile)
+        return response_cache.get(image_cache_key(image_prompt, profile)) is not None
+    return is_cached
+
+def cached_description(body_type, occasion, gender, country, age_range, extra_details, profile=None):
+    if response_cache is None:
+        return None
+    return response_cache.get(description_cache_key(body_type, occasion, gender, country, age_range, extra_details, profile=profile))
+
+def cache_description(outfit_description, body_type, occasion, gender, country, age_range, extra_details, profile=None):
+    if response_cache is not None and outfit_description != DEFAULT_DESCRIPTION:
+        response_cache.set(description_cache_key(body_type, occasion, gender, country, age_range, extra_details, profile=profile), outfit_description)
+        index_extra_details(body_type, occasion, gender, country, age_range, extra_details, profile=profile)
+
+def index_extra_details(body_type, occasion, gender, country, age_range, extra_details, profile=None):
+    if similar_index is not None and isinstance(extra_details, str) and extra_details.strip():
+        similar_index.add(description_cache_key(body_type, occasion, gender, country, age_range, '', profile=profile), extra_details)
+
+def coalesced(key, producer, cacheable=None, budget=None):
+    """Produce the value of key once for concurrent identical requests, caching it when the cache is enabled"""
+    wait = singleflight.wait_seconds(budget)
+    if response_cache is None:
+        return flights.do(key, producer, wait)
+    return response_cache.get_or_create(key, producer, cacheable, wait)
+
+def precomputed_outfit(body_type, occasion, gender, country, age_range, extra_details):
+    """Return the precomputed response body of a parameter set, or None
+
+    Requests with extra_details are the long tail and are always generated.
+    """
+    if precomputed_store is None or (extra_details and str(extra_details).strip()):
+        return None
+    return precomputed_store.get(precomputed_key(body_type, occasion, gender, country, age_range))
+
+def precompute_outfit(body_type, occasion, gender, country, age_range, force=False):
+    """Generate and store the complete result of a parameter set; returns 'stored', 'exists' or 'failed'
+
+    Results are always generated with the "quality" profile, whose settings are part of the key.
+    """
+    key = precomputed_key(body_type, occasion, gender, country, age_range)
+    if not force and precomputed_store.get(key) is not None:
+        return 'exists'
+    outfit_description, image_url = generate_outfit(body_type, occasion, gender, country, age_range, '', profile="quality")
+    # Fallbacks and placeholders are never stored, so the next run tries again
+    if outfit_description == DEFAULT_DESCRIPTION or is_placeholder(image_url):
+        return 'failed'
+    item = {'outfit_description': outfit_description, 'image_url': image_url, 'profile': "quality"}
+    # Stored results are served for a long time, so they wait for the background render
+    image_variants = describe_variants(image_url, wait=True)
+    if image_variants:
+        item['image_variants'] = image_variants
+    precomputed_store.set(key, item)
+    return 'stored'
+
+@tracing.traced('description')
+def generate_outfit_description(body_type, occasion, gender, country, age_range, extra_details, profile=None, budget=None):
+    outfit_description = coalesced(
+        description_cache_key(body_type, occasion, gender, country, age_range, extra_details, profile=profile),
+        lambda: invoke_description_model(body_type, occasion, gender, country, age_range, extra_details, profile=profile, budget=budget),
+        cacheable=lambda description: description != DEFAULT_DESCRIPTION,
+        budget=budget
+    )
+    if response_cache is not None and outfit_description != DEFAULT_DESCRIPTION:
+        index_extra_details(body_type, occasion, gender, country, age_range, extra_details, profile=profile)
+    return outfit_description
+
+def invoke_description_model(body_type, occasion, gender, country, age_range, extra_details, profile=None, budget=None):
+    try:
+        prompt = build_description_prompt(body_type, occasion, gender, country, age_range, extra_details)
+        return engine.invoke_text(prompt, profile_settings(profile), budget)
     except Exception as e:
         print(f"Error generating outfit description: {str(e)}")
-        return "A stylish outfit suitable for the occasion."
+        return DEFAULT_DESCRIPTION
 
-def generate_outfit_image(outfit_description, body_type, occasion, gender, country, age_range, extra_details):
+def stream_outfit_description(body_type, occasion, gender, country, age_range, extra_details, on_text=None, profile=None, budget=None):
+    """Generate the description with response streaming, calling on_text with the text so far"""
     try:
-        country_style = f", {country} fashion style" if country and country != "global" else ""
-        age_style_map = {
-            "teen": "teen fashion",
-            "young-adult": "young adult fashion",
-            "adult": "adult fashion",
-            "mature": "mature adult fashion",
-            "senior": "senior fashion"
-        }
-        age_style = f", {age_style_map.get(age_range, 'adult fashion')}"
-        
+        prompt = build_description_prompt(body_type, occasion, gender, country, age_range, extra_details)
+        pieces = []
+
+        def on_delta(delta):
+            pieces.append(delta)
+            if on_text:
+                on_text("".join(pieces))
+
+        return engine.stream_text(prompt, profile_settings(profile), on_delta, budget)
+    except Exception as e:
+        print(f"Error streaming outfit description: {str(e)}")
+        return DEFAULT_DESCRIPTION
+
+def image_prompt_values(body_type, occasion, gender, country, age_range, extra_details):
+    return {
+        'gender': gender,
+        'body_type': body_type,
+        'occasion': occasion,
+        'country_style': optional(", {value} fashion style", country, skip=("global",)),
+        'age_style': f", {AGE_STYLE_MAP.get(age_range, 'adult fashion')}",
         # Add extra details to image prompt if provided
-        extra_style = f", {extra_details}" if extra_details else ""
-
-        image_prompt = (
-            f"A full-body portrait of a {gender} with a {body_type} body type, standing pose, "
-            f"visible head to toe, perfect human anatomy, natural lighting, realistic skin texture, DSLR photo, Canon EOS R5, "
-            f"wearing: {outfit_description}. {occasion} theme{country_style}{age_style}{extra_style}, "
-            f"high resolution, hyper-realistic, clean background, 85mm lens, fashionable look"
-        )
-
-        # Truncate prompt to meet model limits
-        if len(image_prompt) > 500:
-            image_prompt = image_prompt[:500]
-
-        # Negative prompt to reduce deformities
-        negative_prompt = (
-            "extra limbs, extra fingers, missing hands, distorted body, deformed face, mutated anatomy, "
-            "bad proportions, blurry, cloned hands, broken pose, duplicate arms"
-        )
-
-        payload = {
-            "text_prompts": [{"text": image_prompt}],
-            "cfg_scale": 9,
-            "seed": 0,
-            "steps": 40,
-            "negative_prompt": negative_prompt
-        }
-
-        response = bedrock.invoke_model(
-            modelId="stability.stable-diffusion-xl-v1",
-            body=json.dumps(payload),
-            contentType="application/json",
-            accept="application/json"
-        )
-
-        response_body = json.loads(response['body'].read())
-
-        if 'artifacts' in response_body and response_body['artifacts']:
-            image_data = response_body['artifacts'][0]['base64']
-            return upload_to_s3(image_data, f"outfit-{gender}-{country}-{age_range}-{body_type}-{occasion}")
-        else:
-            return "https://placehold.co/600x400/png?text=No+Image+Generated"
+        'extra_style': optional(", {value}", extra_details)
+    }
+
+def build_image_prompt(outfit_description, body_type, occasion, gender, country, age_range, extra_details):
+    values = image_prompt_values(body_type, occasion, gender, country, age_range, extra_details)
+    return IMAGE_TEMPLATE.render(outfit_description=outfit_description, **values)
+
+def image_prompt_complete(partial_description, body_type, occasion, gender, country, age_range, extra_details):
+    """Return True once more description text can no longer change the image prompt"""
+    values = image_prompt_values(body_type, occasion, gender, country, age_range, extra_details)
+    return IMAGE_TEMPLATE.is_settled('outfit_description', partial_description, **values)
+
+def image_prefix(body_type, occasion, gender, country, age_range):
+    return f"outfit-{gender}-{country}-{age_range}-{body_type}-{occasion}"
+
+@tracing.traced('image')
+def generate_outfit_image(outfit_description, body_type, occasion, gender, country, age_range, extra_details, profile=None, budget=None):
+    try:
+        image_prompt = build_image_prompt(outfit_description, body_type, occasion, gender, country, age_range, extra_details)
+        return generate_image_within(budget, image_prompt, image_prefix(body_type, occasion, gender, country, age_range), profile=profile)
     except Exception as e:
         print(f"Error generating image: {str(e)}")
         return "https://placehold.co/600x400/png?text=Image+Generation+Error"
 
-def upload_to_s3(image_data, prefix="fashion"):
+def generate_image_from_prompt(image_prompt, prefix="fashion", key=None, profile=None, budget=None):
+    if key is not None:
+        # The image must land at the key reserved by a respond-early request, so it is not shared
+        image_url = invoke_image_model(image_prompt, prefix, key, profile, budget)
+        if response_cache is not None and not is_placeholder(image_url):
+            response_cache.set(image_cache_key(image_prompt, profile), image_url)
+        return image_url
+    return coalesced(
+        image_cache_key(image_prompt, profile),
+        lambda: invoke_image_model(image_prompt, prefix, key, profile, budget),
+        cacheable=lambda image_url: not is_placeholder(image_url),
+        budget=budget
+    )
+
+def generate_image_within(budget, image_prompt, prefix="fashion", profile=None):
+    """Generate the image with the best profile that still fits the budget, or skip it"""
+    image_profile = image_profile_for(profile, budget)
+    if image_profile is None:
+        print(f"Skipping image {prefix}: not enough time left")
+        return SKIPPED_IMAGE_URL
+    return generate_image_from_prompt(image_prompt, prefix, profile=image_profile, budget=budget)
+
+def invoke_image_model(image_prompt, prefix="fashion", key=None, profile=None, budget=None):
+    image_url = engine.generate_image(image_prompt, prefix, profile_settings(profile), budget, key=key)
+    return image_url or "https://placehold.co/600x400/png?text=Image+Generation+Error"
+
+def generate_outfit_pipelined(body_type, occasion, gender, country, age_range, extra_details, on_text=None, profile=None, budget=None):
+    """Stream the description and start the image as soon as its prompt is fixed"""
+    params = (body_type, occasion, gender, country, age_range, extra_details)
+    forward_text = on_text
+    outfit_description = cached_description(*params, profile=profile)
+    if outfit_description is not None:
+        return outfit_description, generate_outfit_image(outfit_description, *params, profile=profile, budget=budget)
+
+    prefix = image_prefix(body_type, occasion, gender, country, age_range)
+    result = {}
+    image_thread = None
+
+    def run_image(image_prompt):
+        result['image_url'] = generate_image_within(budget, image_prompt, prefix, profile=profile)
+
+    def on_text(text):
+        nonlocal image_thread
+        if image_thread is None and image_prompt_complete(text, *params):
+            image_thread = threading.Thread(target=tracing.bind(run_image), args=(build_image_prompt(text, *params),))
+            image_thread.start()
+        if forward_text:
+            forward_text(text)
+
+    outfit_description = stream_outfit_description(*params, on_text=on_text, profile=profile, budget=budget)
+    cache_description(outfit_description, *params, profile=profile)
+
+    # Short descriptions only fix the prompt once the stream has finished
+    if image_thread is None:
+        run_image(build_image_prompt(outfit_description, *params))
+    else:
+        image_thread.join()
+    return outfit_description, result.get('image_url', "https://placehold.co/600x400/png?text=Image+Generation+Error")
+
+def schedule_outfit_image(outfit_description, body_type, occasion, gender, country, age_range, extra_details, context=None, profile=None):
+    """Reserve an S3 key for the image and fill it asynchronously, returning (url, status) immediately"""
+    image_prompt = build_image_prompt(outfit_description, body_type, occasion, gender, country, age_range, extra_details)
+    if response_cache is not None:
+        image_url = response_cache.get(image_cache_key(image_prompt, profile))
+        if image_url is not None:
+            return image_url, 'ready'
+
+    key = allocate_s3_key(image_prefix(body_type, occasion, gender, country, age_range))
+    job = {'image_prompt': image_prompt, 'key': key, 'profile': profile}
+
     try:
-        image_bytes = base64.b64decode(image_data)
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{prefix}-{timestamp}.png"
-
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=filename,
-            Body=image_bytes,
-            ContentType='image/png'
-        )
-
-        return f"https://{S3_BUCKET}.s3.amazonaws.com/{filename}"
+        if context is not None and getattr(context, 'function_name', None):
+            # Lambda freezes after returning, so hand the work to an async self-invocation
+            clients.lambda_client().invoke(
+                FunctionName=context.function_name,
+                InvocationType='Event',
+                Payload=json.dumps({'image_job': job})
+            )
+        else:
+            # Long-lived container: fill the image from a background thread
+            threading.Thread(target=generate_image_from_prompt, args=(image_prompt,), kwargs={'key': key, 'profile': profile}, daemon=True).start()
     except Exception as e:
-        print(f"Error uploading to S3: {str(e)}")
-        return "https://placehold.co/600x400/png?text=S3+Upload+Error"
+        print(f"Error scheduling image generation: {str(e)}")
+        return generate_image_from_prompt(image_prompt, key=key, profile=profile), 'ready'
+
+    return s3_url(key), 'pending'
+
+def allocate_s3_key(prefix="fashion"):
+    # The content is not known yet, so add a random suffix to keep concurrent requests apart
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{prefix}-{timestamp}-{os.urandom(4).hex()}.png"
+
+def s3_url(key):
+    return storage.s3_url(S3_BUCKET, key)
+
+def describe_variants(image_url, wait=False):
+    """Return the responsive sources of a generated image, or None to serve image_url alone"""
+    if not image_url or is_placeholder(image_url):
+        return None
+    return engine.image_variants(image_url, wait)
+
+if __name__ == "__main__":
+    # Chunked HTTP server for the streaming endpoint (container or Lambda Web Adapter)
+    from stylegenie import http_stream
+    http_stream.run_server(lambda_handler, {'/stream': stream_handler, '/batch': batch_stream_handler})
@@ -14,9 +14,15 @@ const modelImages = [
 "https://images.unsplash.com/photo-1539109136881-3be0616acf4b?q=80&w=300&h=400&auto=format&fit=crop",
 ];
 
+interface ImageVariants {
+sources: { type: string; srcset: string }[];
+placeholder?: string | null;
+}
+
 interface OutfitSuggestion {
 image_url: string;
 description: string;
+image_variants?: ImageVariants;
 }
 
 interface AIResponse {
@@ -28,6 +34,10 @@ const API_ENDPOINTS = [
 'https://zkbluoyybf.execute-api.us-east-1.amazonaws.com/prod/StyleGenieAI'  // New working API endpoint
 ];
 
+// Optional NDJSON streaming endpoint; the endpoints above remain the fallback
+const STREAM_ENDPOINT = import.meta.env.VITE_STREAM_API_URL as string | undefined;
+const GENERATING_IMAGE_URL = 'https://placehold.co/600x800/EEE/31343C?text=Generating+image...';
+
 const AIStyleAdvisor: React.FC = () => {
 const [occasion, setOccasion] = useState<string>('');
 const [gender, setGender] = useState<string>('');
@@ -103,7 +113,8 @@ const convertedData = {
 outfit_suggestions: [
 {
 description: data.outfit_description,
-image_url: data.image_url
+image_url: data.image_url,
+image_variants: data.image_variants
 }
 ]
 };
@@ -135,6 +146,74 @@ return null;
 }
 };
 
+// Stream the description from the streaming endpoint, rendering text as it arrives
+const tryStreamEndpoint = async (endpoint: string, payload: any) => {
+console.log(`Trying streaming endpoint: ${endpoint}`);
+
+try {
+const response = await fetch(endpoint, {
+method: 'POST',
+headers: {
+'Content-Type': 'application/json',
+'Accept': 'application/x-ndjson'
+},
+body: JSON.stringify(payload)
+});
+
+if (!response.ok || !response.body) {
+console.log(`Error from ${endpoint}:`, response.status, response.statusText);
+return null;
+}
+
+const reader = response.body.getReader();
+const decoder = new TextDecoder();
+let buffer = '';
+let description = '';
+
+while (true) {
+const { done, value } = await reader.read();
+if (done) {
+break;
+}
+buffer += decoder.decode(value, { stream: true });
+const lines = buffer.split('\n');
+buffer = lines.pop() || '';
+
+for (const line of lines) {
+if (!line.trim()) {
+continue;
+}
+const message = JSON.parse(line);
+if (message.type === 'text') {
+description += message.text;
+setSuggestions({
+outfit_suggestions: [{ description, image_url: GENERATING_IMAGE_URL }]
+});
+} else if (message.type === 'result') {
+return {
+outfit_suggestions: [
+{
+description: message.outfit_description,
+image_url: message.image_url,
+image_variants: message.image_variants
+}
+]
+};
+} else if (message.type === 'error') {
+console.log(`Streaming error from ${endpoint}:`, message.error);
+return null;
+}
+}
+}
+
+console.log(`Stream from ${endpoint} ended without a result`);
+return null;
+} catch (e) {
+console.log(`Streaming error with ${endpoint}:`, e);
+return null;
+}
+};
+
 const getStyleSuggestions = async () => {
 if (!occasion || !bodyType || !gender) {
 setError('Please fill in all required fields');
@@ -157,13 +236,15 @@ extra_details: extraDetails
 
 console.log('Sending request with payload:', payload);
 
-// Try each endpoint in order until one works
-let successData = null;
+// Prefer the streaming endpoint so the first words render immediately
+let successData = STREAM_ENDPOINT ? await tryStreamEndpoint(STREAM_ENDPOINT, payload) : null;
+
+// Otherwise try each endpoint in order until one works
 const endpointsToTry = workingEndpoint 
 ? [workingEndpoint, ...API_ENDPOINTS.filter(e => e !== workingEndpoint)] 
 : API_ENDPOINTS;
 
-for (const endpoint of endpointsToTry) {
+for (const endpoint of successData ? [] : endpointsToTry) {
 const data = await tryEndpoint(endpoint, payload);
 if (data) {
 successData = data;
@@ -578,16 +659,35 @@ Perfect Match
 </span>
 </div>
 
-<div className="relative h-80 overflow-hidden">
+<div
+className="relative h-80 overflow-hidden bg-cover bg-center"
+style={outfit.image_variants?.placeholder ? { backgroundImage: `url(${outfit.image_variants.placeholder})` } : undefined}
+>
+{/* Resized WebP sources when available; the original PNG stays the fallback */}
+<picture>
+{outfit.image_variants?.sources.map((source) => (
+<source
+key={source.type}
+type={source.type}
+srcSet={source.srcset}
+sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
+/>
+))}
 <img
 src={outfit.image_url}
 alt={outfit.description}
+loading="lazy"
+decoding="async"
 className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
 onError={(e) => {
 console.error(`Error loading image: ${outfit.image_url}`);
-(e.target as HTMLImageElement).src = `https://placehold.co/600x800/EEE/31343C?text=Outfit+${index+1}`;
+const image = e.target as HTMLImageElement;
+image.srcset = '';
+image.parentElement?.querySelectorAll('source').forEach((source) => source.remove());
+image.src = `https://placehold.co/600x800/EEE/31343C?text=Outfit+${index+1}`;
 }}
 />
+</picture>
 <div className="absolute inset-0 bg-gradient-to-t from-purple-900/80 via-purple-700/20 to-transparent flex items-end">
 <div className="p-5 w-full">
 <p className="text-white font-medium line-clamp-2 text-lg">
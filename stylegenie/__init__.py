@@ -0,0 +1 @@
+"""Shared helpers for the StyleGenie Lambda handlers"""
@@ -0,0 +1,138 @@
+"""Streaming decode of SDXL responses into spooled image files
+
+The Bedrock body is scanned in fixed-size chunks for "base64" fields, and
+each value is decoded as it arrives into a temporary file that stays in
+memory up to IMAGE_SPOOL_MAX_BYTES and moves to /tmp beyond that, hashing
+the bytes on the way. Neither the JSON document, nor the base64 string,
+nor the decoded image is ever held whole in memory.
+"""
+import binascii
+import hashlib
+import os
+
+from stylegenie import tracing
+
+READ_CHUNK_BYTES = int(os.environ.get("IMAGE_READ_CHUNK_BYTES", str(64 * 1024)))
+IMAGE_SPOOL_MAX_BYTES = int(os.environ.get("IMAGE_SPOOL_MAX_BYTES", str(256 * 1024)))
+
+FIELD = b'"base64"'
+WHITESPACE = b" \t\r\n"
+
+class DecodedImage:
+    """A decoded image in a spooled temporary file, with its size and SHA-256"""
+
+    def __init__(self, spool_max=IMAGE_SPOOL_MAX_BYTES):
+        # tempfile pulls in random and shutil, so it is imported on first use
+        import tempfile
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self.sha256 = None
+
+    def write(self, data):
+        if data:
+            self.file.write(data)
+            self._hash.update(data)
+            self.size += len(data)
+
+    def finish(self):
+        self.sha256 = self._hash.hexdigest()
+        self.file.seek(0)
+        return self
+
+    def read(self):
+        """Return the whole image; only for callers that really need the bytes"""
+        self.file.seek(0)
+        data = self.file.read()
+        self.file.seek(0)
+        return data
+
+    def close(self):
+        self.file.close()
+
+class _Scanner:
+    """Incremental state machine over the raw JSON bytes"""
+
+    def __init__(self, spool_max):
+        self.spool_max = spool_max
+        self.state = "field"
+        self.buffer = b""
+        self.pending = b""
+        self.image = None
+
+    def feed(self, chunk):
+        """Consume a chunk and yield every image whose base64 value ended in it"""
+        data = self.buffer + chunk
+        self.buffer = b""
+        position = 0
+        while position < len(data):
+            if self.state == "field":
+                index = data.find(FIELD, position)
+                if index < 0:
+                    # Keep a tail in case the field name is split across chunks
+                    self.buffer = data[max(position, len(data) - len(FIELD) + 1):]
+                    return
+                position = index + len(FIELD)
+                self.state = "colon"
+            elif self.state in ("colon", "quote"):
+                byte = data[position:position + 1]
+                position += 1
+                if byte in WHITESPACE:
+                    continue
+                expected = b":" if self.state == "colon" else b'"'
+                if byte != expected:
+                    # "base64" appeared as a value or in text, not as a key
+                    self.state = "field"
+                elif self.state == "colon":
+                    self.state = "quote"
+                else:
+                    self.state = "value"
+                    self.image = DecodedImage(self.spool_max)
+                    self.pending = b""
+            else:
+                end = data.find(b'"', position)
+                stop = len(data) if end < 0 else end
+                self._decode(data[position:stop])
+                if end < 0:
+                    return
+                position = end + 1
+                yield self._finish()
+
+    def _decode(self, text):
+        # JSON may escape "/" as "\/"; base64 needs no other escapes
+        text = self.pending + text.replace(b"\\", b"")
+        usable = len(text) - len(text) % 4
+        self.pending = text[usable:]
+        if usable:
+            self.image.write(binascii.a2b_base64(text[:usable]))
+
+    def _finish(self):
+        if self.pending:
+            self.image.write(binascii.a2b_base64(self.pending + b"=" * (-len(self.pending) % 4)))
+        image = self.image.finish()
+        self.image = None
+        self.pending = b""
+        self.state = "field"
+        return image
+
+def iter_images(body, chunk_size=READ_CHUNK_BYTES, spool_max=IMAGE_SPOOL_MAX_BYTES):
+    """Yield a DecodedImage for every "base64" field of a streaming Bedrock body"""
+    scanner = _Scanner(spool_max)
+    received = 0
+    while True:
+        chunk = body.read(chunk_size)
+        if not chunk:
+            break
+        received += len(chunk)
+        yield from scanner.feed(chunk)
+    tracing.add_size("image_response", received)
+
+def read_images(body, chunk_size=READ_CHUNK_BYTES, spool_max=IMAGE_SPOOL_MAX_BYTES):
+    """Decode every image of a Bedrock SDXL body; an empty list means no artifacts"""
+    with tracing.span("decode"):
+        try:
+            return list(iter_images(body, chunk_size, spool_max))
+        finally:
+            close = getattr(body, "close", None)
+            if close:
+                close()
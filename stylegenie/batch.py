@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from stylegenie import tracing
+
+def run_in_order(items, worker, max_workers):
+    """Run worker over items on a bounded pool, yielding (index, result, error) in input order
+
+    Results are yielded as soon as every earlier item has finished, so the
+    caller can stream them while later items are still running.
+    """
+    if not items:
+        return
+    # Keep work on the pool attributed to the calling request
+    worker = tracing.bind(worker)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = [executor.submit(worker, item) for item in items]
+        for index, future in enumerate(futures):
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, str(e)
+
+def dedupe(items, key):
+    """Return (unique_items, positions) where positions[i] indexes items[i] in unique_items"""
+    unique = []
+    seen = {}
+    positions = []
+    for item in items:
+        item_key = key(item)
+        if item_key not in seen:
+            seen[item_key] = len(unique)
+            unique.append(item)
+        positions.append(seen[item_key])
+    return unique, positions
@@ -0,0 +1,351 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from stylegenie import singleflight, tracing
+from stylegenie.ratelimit import error_code
+
+# Default cache settings, overridable through the environment
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '512'))
+CACHE_PREFIX = "cache/"
+# Store misses remembered per cache, apart from the values so they never evict a hit
+CACHE_MISS_MAX_ENTRIES = int(os.environ.get('CACHE_MISS_MAX_ENTRIES', '4096'))
+
+def normalize_value(value):
+    """Lower-case and collapse whitespace so equivalent inputs share a key"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+def cache_key(namespace, params, model_id=None, settings=None):
+    """Hash the normalized parameters together with the model and its generation settings"""
+    material = {
+        "namespace": namespace,
+        "params": {name: normalize_value(value) for name, value in params.items()},
+        "model_id": model_id,
+        "settings": settings or {}
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return f"{namespace}-{hashlib.sha256(encoded).hexdigest()}"
+
+class LRUCache:
+    """In-process LRU tier with per-entry TTL"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._entries[key] = (expires_at or time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class S3Store:
+    """Durable tier storing one JSON object per key, with the expiry in object metadata"""
+
+    # Cleared for the container when botocore predates conditional writes (IfNoneMatch, botocore 1.35)
+    conditional_writes = True
+
+    def __init__(self, get_s3_client, bucket, prefix=CACHE_PREFIX, ttl=CACHE_TTL_SECONDS):
+        self.get_s3_client = get_s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            response = self.get_s3_client().get_object(Bucket=self.bucket, Key=f"{self.prefix}{key}.json")
+        except Exception:
+            return None
+        expires_at = float(response.get('Metadata', {}).get('expires-at', 0))
+        if expires_at < time.time():
+            return None
+        return expires_at, json.loads(response['Body'].read())
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self.get_s3_client().put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{key}.json",
+            Body=json.dumps(value).encode('utf-8'),
+            ContentType='application/json',
+            Metadata={'expires-at': str(int(expires_at))}
+        )
+
+    def _marker(self, key):
+        return f"{self.prefix}{key}.lock"
+
+    def claim(self, key, ttl=singleflight.COALESCE_MARKER_TTL_SECONDS):
+        """Create the in-progress marker of key; False when another producer holds a live one, None without markers"""
+        if not S3Store.conditional_writes:
+            return None
+        marker = {'Bucket': self.bucket, 'Key': self._marker(key), 'Body': b"", 'Metadata': {'expires-at': str(int(time.time() + ttl))}}
+        try:
+            self.get_s3_client().put_object(IfNoneMatch='*', **marker)
+            return True
+        except Exception as e:
+            if type(e).__name__ == 'ParamValidationError':
+                S3Store.conditional_writes = False
+                print("S3 conditional writes are not supported by this botocore; coalescing across containers is off")
+                return None
+            if error_code(e) not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+        if self.claimed(key):
+            return False
+        # Left behind by a producer that died; take it over
+        self.get_s3_client().put_object(**marker)
+        return True
+
+    def claimed(self, key):
+        try:
+            response = self.get_s3_client().head_object(Bucket=self.bucket, Key=self._marker(key))
+        except Exception:
+            return False
+        return float(response.get('Metadata', {}).get('expires-at', 0)) >= time.time()
+
+    def release(self, key):
+        self.get_s3_client().delete_object(Bucket=self.bucket, Key=self._marker(key))
+
+class LocalStore:
+    """Durable tier on the local filesystem for containers and offline runs"""
+
+    def __init__(self, directory, max_entries=CACHE_MAX_ENTRIES * 8, ttl=CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] < time.time():
+            return None
+        return entry['expires_at'], entry['value']
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'expires_at': expires_at, 'value': value}, f)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def claim(self, key, ttl=singleflight.COALESCE_MARKER_TTL_SECONDS):
+        """Create the in-progress marker of key; False when another producer holds a live one"""
+        path = self._path(key) + ".lock"
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                if self.claimed(key, ttl):
+                    return False
+                # Left behind by a producer that died; remove it and try again
+                self.release(key)
+        return False
+
+    def claimed(self, key, ttl=singleflight.COALESCE_MARKER_TTL_SECONDS):
+        try:
+            return os.path.getmtime(self._path(key) + ".lock") + ttl >= time.time()
+        except OSError:
+            return False
+
+    def release(self, key):
+        try:
+            os.remove(self._path(key) + ".lock")
+        except OSError:
+            pass
+
+    def _evict(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(names) <= self.max_entries:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class ResponseCache:
+    """Two-tier cache: in-process LRU in front of an optional durable store"""
+
+    def __init__(self, memory=None, store=None, name="cache", miss_ttl=0, miss_max_entries=CACHE_MISS_MAX_ENTRIES):
+        self.memory = memory or LRUCache()
+        self.store = store
+        self.name = name
+        # Seconds a store miss is remembered in memory, so absent keys do not cost a store read each time
+        self.miss_ttl = miss_ttl
+        self.misses = LRUCache(max_entries=miss_max_entries, ttl=miss_ttl) if miss_ttl else None
+        self.counters = {'memory_hits': 0, 'store_hits': 0, 'misses': 0, 'errors': 0, 'coalesced': 0}
+        self.flights = singleflight.Group(name)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+        tracing.count(f"{self.name}_{name}")
+
+    def get(self, key, fresh=False):
+        """Return the value of key, or None; fresh skips the in-process tier for records others update"""
+        value = self.memory.get(key) if not fresh or self.store is None else None
+        if value is None and not fresh and self.misses is not None and self.misses.get(key):
+            self._count('misses')
+            return None
+        if value is not None:
+            self._count('memory_hits')
+            return value
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                print(f"Error reading cache store: {str(e)}")
+                self._count('errors')
+                entry = None
+            if entry is not None:
+                expires_at, value = entry
+                self.memory.set(key, value, expires_at)
+                self._count('store_hits')
+                return value
+            if self.misses is not None:
+                self.misses.set(key, True)
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.misses is not None:
+            self.misses.delete(key)
+        if self.store is not None:
+            try:
+                self.store.set(key, value)
+            except Exception as e:
+                print(f"Error writing cache store: {str(e)}")
+                self._count('errors')
+
+    def get_or_create(self, key, producer, cacheable=None, wait=singleflight.COALESCE_WAIT_SECONDS):
+        """Return the cached value for key, or produce it and cache it if cacheable(value)
+
+        Concurrent callers for the same key, in this process or (through the
+        store's in-progress marker) in others, wait up to wait seconds for
+        one producer instead of each producing the value.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self.flights.do(key, lambda: self._create(key, producer, cacheable, wait), wait)
+
+    def _create(self, key, producer, cacheable, wait):
+        claimed = self._claim(key)
+        if claimed is False:
+            value = self._await(key, wait)
+            if value is not None:
+                return value
+        try:
+            value = producer()
+            if value is not None and (cacheable is None or cacheable(value)):
+                self.set(key, value)
+            return value
+        finally:
+            if claimed:
+                self._release(key)
+
+    def _claim(self, key):
+        """True when this caller holds the store's marker, False when another does, None without markers"""
+        if self.store is None or not singleflight.COALESCE_ENABLED or not hasattr(self.store, 'claim'):
+            return None
+        try:
+            return self.store.claim(key)
+        except Exception as e:
+            print(f"Error claiming cache key: {str(e)}")
+            return None
+
+    def _release(self, key):
+        try:
+            self.store.release(key)
+        except Exception as e:
+            print(f"Error releasing cache key: {str(e)}")
+
+    def _await(self, key, wait):
+        """Poll the store for the value another producer is making; None when it gave up or wait ran out"""
+        deadline = time.monotonic() + wait
+        interval = singleflight.POLL_SECONDS
+        with tracing.span('coalesce_wait'):
+            while time.monotonic() + interval < deadline:
+                time.sleep(interval)
+                interval = min(interval * 2, singleflight.MAX_POLL_SECONDS)
+                try:
+                    entry = self.store.get(key)
+                    if entry is None and not self.store.claimed(key):
+                        # The producer may have stored the value just before releasing its marker
+                        entry = self.store.get(key)
+                        if entry is None:
+                            return None
+                except Exception as e:
+                    print(f"Error reading cache store: {str(e)}")
+                    return None
+                if entry is not None:
+                    expires_at, value = entry
+                    self.memory.set(key, value, expires_at)
+                    self._count('coalesced')
+                    return value
+        print(f"Timed out waiting for {key}; producing it independently")
+        return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['coalesced'] += self.flights.coalesced
+        stats['memory_entries'] = len(self.memory)
+        return stats
+
+def build_cache(get_s3_client=None, bucket=None, prefix=CACHE_PREFIX, ttl=CACHE_TTL_SECONDS, name="cache", miss_ttl=0):
+    """Build the cache described by CACHE_STORE ('s3', 'local' or 'none')
+
+    prefix, ttl and name (the metrics prefix) let other kinds of records
+    share the configured store; miss_ttl caches store misses in memory,
+    in a separate LRU of CACHE_MISS_MAX_ENTRIES keys.
+    """
+    store_type = os.environ.get('CACHE_STORE', 's3').lower()
+    store = None
+    if store_type == 's3' and get_s3_client is not None and bucket:
+        store = S3Store(get_s3_client, bucket, prefix, ttl)
+    elif store_type == 'local':
+        directory = os.environ.get('CACHE_DIR', '/tmp/stylegenie-cache')
+        if prefix != CACHE_PREFIX:
+            directory = os.path.join(directory, prefix.strip('/'))
+        store = LocalStore(directory, ttl=ttl)
+    return ResponseCache(LRUCache(ttl=ttl), store, name, miss_ttl)
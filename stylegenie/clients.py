@@ -0,0 +1,127 @@
+import os
+import threading
+
+# Region hosting the Bedrock models and the upload bucket
+REGION = "us-east-1"
+
+# Size the connection pool for the image fan-out plus the text call and uploads
+IMAGE_MAX_CONCURRENCY = int(os.environ.get("IMAGE_MAX_CONCURRENCY", "5"))
+MAX_POOL_CONNECTIONS = int(os.environ.get("CLIENT_MAX_POOL_CONNECTIONS", str(max(10, 2 * IMAGE_MAX_CONCURRENCY + 2))))
+MAX_ATTEMPTS = int(os.environ.get("CLIENT_MAX_ATTEMPTS", "3"))
+
+# "local" replaces Bedrock, S3 and Lambda with the in-process stand-in in local_backend
+BACKEND = os.environ.get("AWS_BACKEND", "aws").lower()
+CONNECT_TIMEOUT = 5
+
+# Read timeouts per model family; SDXL takes far longer than a short text completion
+DEFAULT_READ_TIMEOUT = 60
+MODEL_READ_TIMEOUTS = {
+    "anthropic.": 60,
+    "stability.": 90
+}
+
+_clients = {}
+_pool_stats = {}
+_lock = threading.Lock()
+
+def read_timeout_for(model_id):
+    for prefix, timeout in MODEL_READ_TIMEOUTS.items():
+        if model_id and model_id.startswith(prefix):
+            return timeout
+    return DEFAULT_READ_TIMEOUT
+
+class PoolStats:
+    """Tracks in-flight requests of one client against its connection pool size"""
+
+    def __init__(self, name, max_connections):
+        self.name = name
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak = 0
+        self.saturated = 0
+        self._lock = threading.Lock()
+
+    def before_call(self, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            if self.in_flight > self.max_connections:
+                self.saturated += 1
+                print(f"Connection pool for {self.name} saturated: {self.in_flight} requests for {self.max_connections} connections")
+
+    def after_call(self, **kwargs):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'peak': self.peak,
+                'max_connections': self.max_connections,
+                'saturated_calls': self.saturated
+            }
+
+def _build(service, read_timeout):
+    if BACKEND == "local":
+        from stylegenie import local_backend
+        return local_backend.client(service)
+
+    # boto3 is imported on first use so handlers only pay for the clients they need
+    import boto3
+    from botocore.config import Config
+
+    # Bedrock calls are retried by ratelimit.ModelRateLimits.call, per model and within the request deadline
+    if service == 'bedrock-runtime':
+        retries = {'mode': 'standard', 'max_attempts': 1}
+    else:
+        retries = {'mode': 'adaptive', 'max_attempts': MAX_ATTEMPTS}
+    config = Config(
+        region_name=REGION,
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        retries=retries,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=read_timeout
+    )
+    client = boto3.client(service, config=config)
+
+    name = f"{service}:{read_timeout}s"
+    stats = PoolStats(name, MAX_POOL_CONNECTIONS)
+    client.meta.events.register('before-call.*.*', stats.before_call)
+    client.meta.events.register('after-call.*.*', stats.after_call)
+    client.meta.events.register('after-call-error.*.*', stats.after_call)
+    _pool_stats[name] = stats
+    return client
+
+def get_client(service, read_timeout=DEFAULT_READ_TIMEOUT):
+    """Return the container-wide client for a service, building it on first use"""
+    key = (service, read_timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _build(service, read_timeout)
+                _clients[key] = client
+    return client
+
+def use_backend(name):
+    """Switch between the "aws" and "local" backends, dropping clients built so far"""
+    global BACKEND
+    with _lock:
+        BACKEND = name
+        _clients.clear()
+
+def bedrock(model_id=None):
+    return get_client('bedrock-runtime', read_timeout_for(model_id))
+
+def s3():
+    return get_client('s3')
+
+def lambda_client():
+    return get_client('lambda')
+
+def pool_stats():
+    """Return pool usage for every client built so far"""
+    return {name: stats.snapshot() for name, stats in _pool_stats.items()}
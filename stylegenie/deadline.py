@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Time kept back from the Lambda timeout to serialize and return the response
+RESERVE_MS = int(os.environ.get("DEADLINE_RESERVE_MS", "1500"))
+# Number of recent calls kept per key for the latency estimate
+WINDOW = 50
+# Percentile of recent latencies used as the cost estimate
+ESTIMATE_PERCENTILE = 0.9
+
+class LatencyStats:
+    """Rolling per-key latency samples, e.g. one key per model and generation setting"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def estimate(self, key, default, percentile=ESTIMATE_PERCENTILE):
+        """Return the given percentile of recent samples, or default before any were recorded"""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples:
+            return default
+        return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+    def count(self, key):
+        with self._lock:
+            return len(self._samples.get(key, ()))
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(samples) for key, samples in self._samples.items()}
+
+latency = LatencyStats()
+
+@contextmanager
+def timed(key):
+    """Record the duration of the wrapped call under key"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        latency.record(key, time.monotonic() - start)
+
+class Deadline:
+    """Tracks the time left in an invocation and decides whether more work fits
+
+    Without a Lambda context (local runs, containers) there is no deadline
+    and every check passes.
+    """
+
+    def __init__(self, context=None, reserve_ms=RESERVE_MS):
+        self.reserve = reserve_ms / 1000
+        self.expires_at = None
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            self.expires_at = time.monotonic() + context.get_remaining_time_in_millis() / 1000
+
+    def remaining(self):
+        """Seconds left before the reserve, or None when unbounded"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic() - self.reserve)
+
+    def can_run(self, key, default):
+        """Return True when a call estimated from the stats for key finishes in time"""
+        remaining = self.remaining()
+        return remaining is None or latency.estimate(key, default) <= remaining
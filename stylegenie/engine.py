@@ -0,0 +1,234 @@
+"""One request path for every Lambda handler
+
+An Engine holds a handler's models, generation settings and bucket, and
+makes every Bedrock call and S3 upload the same way: rate limited and
+retried within the deadline, hedged, decoded as it streams, stored by
+content with its responsive variants, and traced. A handler is a pipeline
+of steps over a Request (parse -> prompt -> text -> images -> store ->
+respond); the shared steps live here and each handler adds its own.
+"""
+import json
+
+from stylegenie import artifacts, clients, deadline, hedging, profiles, ratelimit, storage, tracing, variants
+from stylegenie.jsonstream import extract
+
+# Bucket for generated images
+S3_BUCKET = "stylegenie-uploads"
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Credentials": True
+}
+
+# Per-model request rate limits shared by all requests in this container
+model_limits = ratelimit.limits_from_env()
+
+def response(status_code, body, content_type="application/json"):
+    """API Gateway response with CORS headers; body is serialized unless it already is a string"""
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": content_type, **CORS_HEADERS},
+        "body": body if isinstance(body, str) else tracing.dumps(body)
+    }
+
+def error_response(status_code, message):
+    return response(status_code, {"error": message})
+
+def parse_body(event):
+    """Return the JSON body of an API Gateway event, or the event itself when invoked directly"""
+    return json.loads(event["body"]) if event.get("body") else event
+
+class Engine:
+    """Models, generation settings and storage of one handler"""
+
+    def __init__(self, name, text_model_id, image_model_id=None, text_settings=None, image_settings=None,
+                 params=None, profile_estimates_ms=None, negative_prompt=None, bucket=S3_BUCKET, upload_args=None):
+        self.name = name
+        self.text_model_id = text_model_id
+        self.image_model_id = image_model_id
+        # Request parameters read by the parse step, with their defaults
+        self.params = params or {}
+        self.profile_estimates_ms = profile_estimates_ms
+        self.negative_prompt = negative_prompt
+        self.bucket = bucket
+        # Extra put_object arguments for images and their variants (e.g. ACL)
+        self.upload_args = upload_args or {}
+        self.profiles = {
+            profile: profiles.resolve(profile, text_settings or {}, image_settings or {}) for profile in profiles.PROFILE_ORDER
+        }
+
+    def profile(self, requested=None, context=None, is_cached=None):
+        """Settings of the profile picked from the request, container load and remaining time"""
+        return self.profiles[profiles.select(requested, context, self.profile_estimates_ms, is_cached)]
+
+    def text_latency_key(self, profile):
+        return f"{self.text_model_id}/max_tokens={profile['text']['max_tokens']}"
+
+    def image_latency_key(self, profile):
+        return f"{self.image_model_id}/steps={profile['image']['steps']}"
+
+    def text_request(self, prompt, profile):
+        return json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": profile["text"]["max_tokens"],
+            "temperature": profile["text"]["temperature"],
+            "messages": [
+                {"role": "user", "content": [{"type": "text", "text": prompt}]}
+            ]
+        })
+
+    def invoke_text(self, prompt, profile, budget=None):
+        """Return the text model's answer to prompt"""
+        request = self.text_request(prompt, profile)
+
+        def invoke():
+            result = clients.bedrock(self.text_model_id).invoke_model(modelId=self.text_model_id, body=request)
+            return tracing.loads_body(result["body"], "text_response")
+
+        # Throttled calls are retried within the budget; hedges are not rate limited
+        with tracing.span("text_call", model=self.text_model_id):
+            answer = model_limits.call(self.text_model_id, lambda: hedging.call(self.text_latency_key(profile), invoke), budget)
+        return answer["content"][0]["text"]
+
+    def stream_text(self, prompt, profile, on_delta=None, budget=None):
+        """Stream the text model's answer, calling on_delta with each new piece, and return all of it"""
+        request = self.text_request(prompt, profile)
+        pieces = []
+        with tracing.span("text_call", model=self.text_model_id), deadline.timed(self.text_latency_key(profile)):
+            result = model_limits.call(
+                self.text_model_id,
+                lambda: clients.bedrock(self.text_model_id).invoke_model_with_response_stream(modelId=self.text_model_id, body=request),
+                budget
+            )
+            for event in result["body"]:
+                chunk = event.get("chunk")
+                if not chunk:
+                    continue
+                tracing.add_size("text_response", len(chunk["bytes"]))
+                data = json.loads(chunk["bytes"])
+                if data.get("type") == "content_block_delta":
+                    delta = data["delta"].get("text", "")
+                    pieces.append(delta)
+                    if on_delta:
+                        on_delta(delta)
+        return "".join(pieces)
+
+    def image_request(self, prompt, profile):
+        payload = {
+            "text_prompts": [{"text": prompt}],
+            "cfg_scale": profile["image"]["cfg_scale"],
+            "seed": profile["image"]["seed"],
+            "steps": profile["image"]["steps"]
+        }
+        if self.negative_prompt:
+            payload["negative_prompt"] = self.negative_prompt
+        return json.dumps(payload)
+
+    def invoke_image(self, prompt, profile, budget=None):
+        """Return the artifacts.DecodedImage list of an image model call; the caller closes them"""
+        request = self.image_request(prompt, profile)
+
+        def invoke():
+            result = clients.bedrock(self.image_model_id).invoke_model(
+                modelId=self.image_model_id,
+                body=request,
+                contentType="application/json",
+                accept="application/json"
+            )
+            # Decode the artifacts while they stream in instead of parsing the whole body
+            return artifacts.read_images(result["body"])
+
+        # Duplicated after the p95 latency when HEDGE_ENABLED is set
+        with tracing.span("image_call", model=self.image_model_id):
+            return model_limits.call(self.image_model_id, lambda: hedging.call(self.image_latency_key(profile), invoke), budget)
+
+    def upload_image(self, image, prefix="fashion", key=None):
+        """Store a decoded image and its responsive variants, returning the image URL"""
+        with tracing.span("upload"):
+            tracing.add_size("image", image.size)
+            image_url = storage.store_image(clients.s3(), self.bucket, image, prefix, key=key, **self.upload_args)
+        # Rendering the variants takes longer than the upload, so it happens after the response
+        variants.store_variants_later(clients.s3(), self.bucket, image_url, image, **self.upload_args)
+        return image_url
+
+    def generate_image(self, prompt, prefix, profile, budget=None, key=None):
+        """Generate and store an image, returning its URL, or None when generation or upload failed"""
+        try:
+            images = self.invoke_image(prompt, profile, budget)
+        except Exception as e:
+            print(f"Error generating image: {str(e)}")
+            return None
+        try:
+            if not images:
+                print("No image in model response")
+                return None
+            # Only the first artifact is used
+            return self.upload_image(images[0], prefix, key)
+        except Exception as e:
+            print(f"Error uploading image to S3: {str(e)}")
+            return None
+        finally:
+            for image in images:
+                image.close()
+
+    def image_variants(self, image_url, wait=False):
+        """Responsive sources of a stored image, or None to serve image_url alone
+
+        With wait, variants still being rendered in this container are waited for.
+        """
+        if not image_url:
+            return None
+        try:
+            with tracing.span("variant_lookup"):
+                if wait:
+                    variants.wait(self.bucket, image_url)
+                return variants.describe(clients.s3(), self.bucket, image_url)
+        except Exception as e:
+            print(f"Error describing image variants: {str(e)}")
+            return None
+
+    def extract_json(self, text, arrays=()):
+        """The first (possibly repaired) JSON object in model output, or None"""
+        with tracing.span("deserialize"):
+            return extract(text, arrays)
+
+class Request:
+    """One invocation on its way through a pipeline; steps read and set its attributes"""
+
+    def __init__(self, event, context):
+        self.event = event
+        self.context = context
+        self.budget = deadline.Deadline(context)
+        self.body = {}
+        self.params = {}
+        self.profile = None
+        self.prompt = None
+        self.text = None
+        self.result = {}
+
+def pipeline(engine, steps):
+    """Build a traced Lambda handler running steps, functions of (engine, request), in order
+
+    A step returning a value ends the request with it as the response;
+    otherwise request.result is returned with status 200.
+    """
+    @tracing.handler(engine.name)
+    def handler(event, context):
+        request = Request(event, context)
+        try:
+            with profiles.track_request():
+                for step in steps:
+                    outcome = step(engine, request)
+                    if outcome is not None:
+                        return outcome
+            return response(200, request.result)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return error_response(500, str(e))
+    return handler
+
+def parse(engine, request):
+    """Read the body, the engine's parameters (with their defaults) and the generation profile"""
+    request.body = parse_body(request.event)
+    request.params = {name: request.body.get(name, default) for name, default in engine.params.items()}
+    request.profile = engine.profile(request.body.get("profile"), request.context)
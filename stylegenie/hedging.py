@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import time
+
+from stylegenie import deadline, tracing
+
+# Opt-in: send a second copy of slow Bedrock calls and use whichever answers first
+HEDGE_ENABLED = os.environ.get("HEDGE_ENABLED", "false").lower() == "true"
+# Latency percentile after which the duplicate request is sent
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "0.95"))
+# Maximum extra requests as a fraction of all calls (0.1 = at most 10% more spend)
+HEDGE_MAX_RATIO = float(os.environ.get("HEDGE_MAX_RATIO", "0.1"))
+# Samples needed for a key before its percentile is trusted
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", "20"))
+
+class HedgeBudget:
+    """Counts calls and hedges so that hedges stay below max_ratio of all calls"""
+
+    def __init__(self, max_ratio=HEDGE_MAX_RATIO):
+        self.max_ratio = max_ratio
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self):
+        """Reserve one hedge if the budget allows it"""
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.wins}
+
+budget = HedgeBudget()
+
+def hedge_delay(key, percentile=HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES):
+    """Return the seconds to wait before hedging a call under key, or None without enough data"""
+    if deadline.latency.count(key) < min_samples:
+        return None
+    return deadline.latency.estimate(key, None, percentile)
+
+class _Race:
+    """Outcomes of the attempts of one call; only the first success is handed to the caller"""
+
+    def __init__(self):
+        self.results = queue.Queue()
+        self.won = False
+        self._lock = threading.Lock()
+
+def _discard(value):
+    """Release the result of an attempt that lost, e.g. decoded images"""
+    for item in value if isinstance(value, list) else (value,):
+        close = getattr(item, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing hedged result: {str(e)}")
+
+def _attempt(key, fn, race, tag):
+    start = time.monotonic()
+    try:
+        outcome = (tag, fn(), None)
+    except Exception as e:
+        outcome = (tag, None, e)
+    # Every attempt, including the one that lost, feeds the latency window
+    deadline.latency.record(key, time.monotonic() - start)
+    with race._lock:
+        lost = race.won and outcome[2] is None
+        if outcome[2] is None:
+            race.won = True
+    if lost:
+        _discard(outcome[1])
+    else:
+        race.results.put(outcome)
+
+def call(key, fn, enabled=None):
+    """Run fn() and return its result, hedging it with a second fn() when it is slow
+
+    fn must be safe to run twice (e.g. a Bedrock invoke_model that also reads
+    the body); the losing attempt is left to finish in the background and
+    its result is closed. The duration of every attempt is recorded under
+    key in deadline.latency.
+    """
+    enabled = HEDGE_ENABLED if enabled is None else enabled
+    budget.record_call()
+    delay = hedge_delay(key) if enabled else None
+    if delay is None:
+        with deadline.timed(key):
+            return fn()
+
+    race = _Race()
+    results = race.results
+    fn = tracing.bind(fn)
+    threading.Thread(target=_attempt, args=(key, fn, race, "primary"), daemon=True).start()
+    try:
+        tag, value, error = results.get(timeout=delay)
+    except queue.Empty:
+        if not budget.try_spend():
+            tag, value, error = results.get()
+        else:
+            threading.Thread(target=_attempt, args=(key, fn, race, "hedge"), daemon=True).start()
+            tag, value, error = results.get()
+            if error is not None:
+                # One attempt failed; the other one may still succeed
+                tag, value, error = results.get()
+            if error is None and tag == "hedge":
+                budget.record_win()
+    if error is not None:
+        raise error
+    return value
+
+def stats():
+    return budget.stats()
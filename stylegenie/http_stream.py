@@ -0,0 +1,71 @@
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Lambda Web Adapter forwards to this port; AWS_LWA_INVOKE_MODE=response_stream enables streaming
+DEFAULT_PORT = int(os.environ.get('PORT', os.environ.get('AWS_LWA_PORT', '8080')))
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': 'true',
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS'
+}
+
+def make_request_handler(handler, stream_routes):
+    """Build an HTTP handler streaming the paths in stream_routes and serving other POSTs through handler"""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_headers(self, status, content_type, chunked=False, length=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            for name, value in CORS_HEADERS.items():
+                self.send_header(name, value)
+            if chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('X-Accel-Buffering', 'no')
+            else:
+                self.send_header('Content-Length', str(length or 0))
+            self.end_headers()
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        def do_OPTIONS(self):
+            self._send_headers(204, 'text/plain')
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            raw_body = self.rfile.read(length).decode('utf-8') if length else ''
+            event = {'body': raw_body, 'path': self.path}
+
+            stream_handler = stream_routes.get(self.path.rstrip('/'))
+            if stream_handler is not None:
+                self._send_headers(200, 'application/x-ndjson', chunked=True)
+                try:
+                    for line in stream_handler(event, None):
+                        self._write_chunk(line.encode('utf-8'))
+                finally:
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                return
+
+            # Non-streaming fallback with the regular API Gateway response shape
+            response = handler(event, None)
+            data = response.get('body', json.dumps(response)).encode('utf-8')
+            self._send_headers(response.get('statusCode', 200), 'application/json', length=len(data))
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} - {format % args}")
+
+    return RequestHandler
+
+def run_server(handler, stream_routes, host='0.0.0.0', port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), make_request_handler(handler, stream_routes))
+    print(f"Serving StyleGenie on {host}:{port} (NDJSON streaming on {', '.join(sorted(stream_routes))})")
+    server.serve_forever()
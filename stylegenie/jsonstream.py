@@ -0,0 +1,176 @@
+"""Tolerant, incremental extraction of a JSON object from model output
+
+Model text may wrap the object in prose or Markdown fences, or stop in the
+middle of it when max_tokens is reached. JSONExtractor is fed the text as
+it streams in, reports each element of the watched top-level arrays as soon
+as it is complete, and finally returns the first balanced object, or the
+longest prefix of a truncated one that can be closed into valid JSON.
+"""
+import json
+from collections import deque
+
+CLOSERS = {"{": "}", "[": "]"}
+# Recent points where the text can be cut and closed; the last few are enough
+SAFE_CUTS = 16
+REPAIR_ATTEMPTS = 8
+
+class JSONExtractor:
+    """Character-level scanner over streamed text
+
+    feed() returns the (array key, index, value) elements completed by the
+    new text; result() returns the parsed root object or None.
+    """
+
+    def __init__(self, arrays=()):
+        self.arrays = set(arrays)
+        self.text = ""
+        self.root = None
+        self._position = 0
+        self._reset()
+
+    def _reset(self):
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._expect_key = False
+        self._root_key = None
+        self._array_key = None
+        self._array_index = 0
+        self._element_start = None
+        self._cuts = deque(maxlen=SAFE_CUTS)
+
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        if self.root is not None:
+            return completed
+        text = self.text
+        position = self._position
+        while position < len(text):
+            char = text[position]
+            if self._start is None:
+                # Skip prose and fences up to the first object
+                position = text.find("{", position)
+                if position < 0:
+                    position = len(text)
+                    break
+                self._start = position
+                self._open("{", position)
+                position += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(position, completed)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = position
+                self._string_is_key = self._stack[-1] == "{" and self._expect_key
+                if len(self._stack) == 2 and self._array_key and not self._string_is_key:
+                    self._element_start = position
+            elif char in "{[":
+                if len(self._stack) == 2 and self._array_key:
+                    self._element_start = position
+                if len(self._stack) == 1 and char == "[" and self._root_key in self.arrays:
+                    self._array_key = self._root_key
+                    self._array_index = 0
+                self._open(char, position)
+            elif char in "}]":
+                if not self._stack or CLOSERS[self._stack[-1]] != char:
+                    # Not JSON after all; look for the next object after this one's start
+                    position = self._start + 1
+                    self._reset()
+                    continue
+                self._stack.pop()
+                self._cuts.append((position + 1, "".join(self._stack)))
+                if not self._stack:
+                    if self._finish_root(position):
+                        break
+                    position = self._start + 1
+                    self._reset()
+                    continue
+                if len(self._stack) == 2 and self._element_start is not None:
+                    self._emit(position, completed)
+                elif len(self._stack) == 1:
+                    self._array_key = None
+            elif char == ",":
+                self._cuts.append((position, "".join(self._stack)))
+                self._expect_key = self._stack[-1] == "{"
+            elif char == ":":
+                self._expect_key = False
+            position += 1
+        self._position = position
+        return completed
+
+    def _open(self, char, position):
+        self._stack.append(char)
+        self._expect_key = char == "{"
+        self._cuts.append((position + 1, "".join(self._stack)))
+
+    def _close_string(self, position, completed):
+        if self._string_is_key:
+            if len(self._stack) == 1:
+                try:
+                    self._root_key = json.loads(self.text[self._string_start:position + 1])
+                except ValueError:
+                    self._root_key = None
+        elif len(self._stack) == 2 and self._element_start is not None:
+            self._emit(position, completed)
+
+    def _emit(self, position, completed):
+        try:
+            value = json.loads(self.text[self._element_start:position + 1])
+        except ValueError:
+            value = None
+        if value is not None:
+            completed.append((self._array_key, self._array_index, value))
+        self._array_index += 1
+        self._element_start = None
+
+    def _finish_root(self, position):
+        try:
+            value = json.loads(self.text[self._start:position + 1])
+        except ValueError:
+            return False
+        if not isinstance(value, dict):
+            return False
+        self.root = value
+        return True
+
+    def result(self):
+        """Return the first object in the text, repairing it if the text stopped inside it"""
+        if self.root is not None or self._start is None:
+            return self.root
+        text = self.text[self._start:]
+        closers = "".join(CLOSERS[char] for char in reversed(self._stack))
+        candidates = []
+        if self._in_string:
+            if not self._string_is_key:
+                # Close a string value cut off mid-way, dropping a dangling escape
+                tail = text[:-1] if self._escape else text
+                candidates.append(tail + '"' + closers)
+        else:
+            candidates.append(text.rstrip().rstrip(",") + closers)
+        for position, stack in reversed(self._cuts):
+            candidates.append(self.text[self._start:position] + "".join(CLOSERS[char] for char in reversed(stack)))
+        for candidate in candidates[:REPAIR_ATTEMPTS]:
+            try:
+                value = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+        return None
+
+def extract(text, arrays=()):
+    """Return the first (possibly repaired) JSON object in text, or None"""
+    extractor = JSONExtractor(arrays)
+    extractor.feed(text)
+    return extractor.result()
@@ -0,0 +1,276 @@
+"""In-process stand-in for Bedrock, S3 and Lambda used for offline benchmarks
+
+Selected with AWS_BACKEND=local (or clients.use_backend("local")). Responses
+are deterministic for a given request body; latency, error rate and
+throttling are configured with LOCAL_BACKEND_CONFIG, a JSON object merged
+over DEFAULT_SETTINGS, or with configure().
+"""
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+from stylegenie.ratelimit import TokenBucket
+
+# Latency per model prefix (or "s3"/"lambda") as a log-normal fitted to a median and p99
+DEFAULT_SETTINGS = {
+    "latency": {
+        "anthropic.": {"median_ms": 1200, "p99_ms": 4000},
+        "stability.": {"median_ms": 6000, "p99_ms": 15000},
+        "s3": {"median_ms": 25, "p99_ms": 120},
+        "lambda": {"median_ms": 20, "p99_ms": 80}
+    },
+    # Multiplier on every delay; 0 measures handler CPU time only
+    "latency_scale": 1.0,
+    # Fraction of model calls failing with a service error
+    "error_rate": 0.0,
+    # Requests per second per model prefix above which calls are throttled
+    "throttle_rps": {},
+    # Side of the square PNG returned by SDXL calls
+    "image_size": 1024,
+    # Directory for S3 objects; kept in memory when unset
+    "s3_dir": None,
+    "seed": 0
+}
+
+# z-score of the 99th percentile of a normal distribution
+Z_99 = 2.326
+
+settings = {}
+_random = random.Random()
+_throttles = {}
+_lock = threading.Lock()
+
+class LocalClientError(Exception):
+    """Mirrors botocore's ClientError: the error code is in response['Error']['Code']"""
+
+    def __init__(self, code, operation):
+        super().__init__(f"An error occurred ({code}) when calling the {operation} operation")
+        self.response = {"Error": {"Code": code, "Message": str(self)}}
+
+def configure(**overrides):
+    """Reset the stand-in to DEFAULT_SETTINGS updated with LOCAL_BACKEND_CONFIG and overrides"""
+    merged = json.loads(json.dumps(DEFAULT_SETTINGS))
+    try:
+        merged.update(json.loads(os.environ.get("LOCAL_BACKEND_CONFIG", "{}")))
+    except ValueError:
+        print("Ignoring invalid LOCAL_BACKEND_CONFIG")
+    merged.update(overrides)
+    with _lock:
+        settings.clear()
+        settings.update(merged)
+        _random.seed(merged["seed"])
+        _throttles.clear()
+        for prefix, rate in merged["throttle_rps"].items():
+            if rate:
+                _throttles[prefix] = TokenBucket(rate)
+    _objects.clear()
+    invocations.clear()
+
+def _match(table, name):
+    for prefix, value in table.items():
+        if name.startswith(prefix):
+            return value
+    return None
+
+def sample_latency(name):
+    """Draw one delay in seconds for a model ID or service name"""
+    spec = _match(settings["latency"], name)
+    if not spec:
+        return 0.0
+    median = spec["median_ms"] / 1000
+    p99 = spec.get("p99_ms", spec["median_ms"]) / 1000
+    sigma = math.log(p99 / median) / Z_99 if p99 > median else 0.0
+    with _lock:
+        delay = _random.lognormvariate(math.log(median), sigma) if sigma else median
+    return delay * settings["latency_scale"]
+
+def _check_call(name, operation):
+    bucket = _match(_throttles, name)
+    if bucket is not None and not bucket.try_acquire():
+        raise LocalClientError("ThrottlingException", operation)
+    with _lock:
+        failed = _random.random() < settings["error_rate"]
+    if failed:
+        raise LocalClientError("ServiceUnavailableException", operation)
+
+# Canned Claude output; prompts asking for JSON get the fashion advice structure
+DESCRIPTIONS = [
+    "A tailored navy blazer over a crisp white shirt, paired with slim charcoal chinos and brown leather loafers. A slim leather belt and a minimalist watch finish the look.",
+    "A flowing midi dress in soft sage green with a fitted waist, layered under a cropped denim jacket. Tan ankle boots and small gold hoops keep it relaxed but polished.",
+    "Dark straight-leg jeans with a fine-knit merino crew neck in camel, topped with a wool overcoat. White leather sneakers and a structured tote complete the outfit.",
+    "High-waisted wide-leg trousers in cream with a tucked-in black silk blouse. Pointed block heels and a quilted crossbody bag add an elegant finish."
+]
+YEARS = ["1920s", "1950s", "1970s", "1990s"]
+
+def canned_text(prompt):
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    if "JSON" not in prompt:
+        return DESCRIPTIONS[digest % len(DESCRIPTIONS)]
+    advice = {
+        "outfit_suggestions": [
+            {"description": DESCRIPTIONS[(digest + i) % len(DESCRIPTIONS)]} for i in range(3)
+        ],
+        "historical_fashion": [
+            {"year": YEARS[(digest + i) % len(YEARS)], "description": f"Silhouettes of the {YEARS[(digest + i) % len(YEARS)]} reworked with modern fabrics."} for i in range(2)
+        ]
+    }
+    return "Here are my suggestions:\n```json\n" + json.dumps(advice, indent=2) + "\n```"
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+@lru_cache(maxsize=32)
+def canned_png(seed, size):
+    """Deterministic RGB PNG of roughly SDXL output size (half noise, half flat)"""
+    rng = random.Random(seed)
+    noise = size * 3 // 2
+    rows = b"".join(b"\x00" + rng.randbytes(noise) + bytes(size * 3 - noise) for _ in range(size))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header) + _png_chunk(b"IDAT", zlib.compress(rows, 1)) + _png_chunk(b"IEND", b"")
+
+def _prompt_of(request):
+    if "text_prompts" in request:
+        return " ".join(part.get("text", "") for part in request["text_prompts"])
+    texts = []
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        else:
+            texts.extend(part.get("text", "") for part in content or [] if part.get("type") == "text")
+    return "\n".join(texts) or request.get("prompt", "")
+
+class BedrockRuntime:
+    def invoke_model(self, modelId, body, **kwargs):
+        _check_call(modelId, "InvokeModel")
+        time.sleep(sample_latency(modelId))
+        request = json.loads(body)
+        prompt = _prompt_of(request)
+        if modelId.startswith("stability."):
+            seed = int(hashlib.sha256(f"{prompt}|{request.get('seed', 0)}|{request.get('steps')}".encode("utf-8")).hexdigest()[:8], 16)
+            image = base64.b64encode(canned_png(seed, settings["image_size"])).decode("ascii")
+            payload = {"result": "success", "artifacts": [{"seed": seed, "base64": image, "finishReason": "SUCCESS"}]}
+        else:
+            payload = {"type": "message", "role": "assistant", "content": [{"type": "text", "text": canned_text(prompt)}], "stop_reason": "end_turn"}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8")), "contentType": "application/json"}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        _check_call(modelId, "InvokeModelWithResponseStream")
+        text = canned_text(_prompt_of(json.loads(body)))
+        total = sample_latency(modelId)
+        words = text.split(" ")
+
+        def events():
+            # About a third of the latency is time to first token, the rest is spread over the words
+            time.sleep(total / 3)
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                chunk = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": delta}}
+                yield {"chunk": {"bytes": json.dumps(chunk).encode("utf-8")}}
+                time.sleep(total * 2 / 3 / len(words))
+            yield {"chunk": {"bytes": json.dumps({"type": "message_stop"}).encode("utf-8")}}
+
+        return {"body": events(), "contentType": "application/json"}
+
+_objects = {}
+_objects_lock = threading.Lock()
+
+class S3:
+    def _path(self, bucket, key):
+        return os.path.join(settings["s3_dir"], bucket, key)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        time.sleep(sample_latency("s3"))
+        if hasattr(Body, "read"):
+            data = Body.read()
+        else:
+            data = Body.encode("utf-8") if isinstance(Body, str) else bytes(Body)
+        metadata = kwargs.get("Metadata", {})
+        # IfNoneMatch="*" only writes objects that do not exist yet, like S3 conditional writes
+        exclusive = kwargs.get("IfNoneMatch") == "*"
+        if settings["s3_dir"]:
+            path = self._path(Bucket, Key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with open(path, "xb" if exclusive else "wb") as f:
+                    f.write(data)
+            except FileExistsError:
+                raise LocalClientError("PreconditionFailed", "PutObject")
+            with open(path + ".metadata.json", "w") as f:
+                json.dump(metadata, f)
+        else:
+            with _objects_lock:
+                if exclusive and (Bucket, Key) in _objects:
+                    raise LocalClientError("PreconditionFailed", "PutObject")
+                _objects[(Bucket, Key)] = (data, metadata)
+        return {"ETag": '"%s"' % hashlib.md5(data).hexdigest()}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        time.sleep(sample_latency("s3"))
+        if settings["s3_dir"]:
+            for path in (self._path(Bucket, Key), self._path(Bucket, Key) + ".metadata.json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        else:
+            with _objects_lock:
+                _objects.pop((Bucket, Key), None)
+        return {}
+
+    def _load(self, Bucket, Key, operation):
+        if settings["s3_dir"]:
+            path = self._path(Bucket, Key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                with open(path + ".metadata.json") as f:
+                    return data, json.load(f)
+            except OSError:
+                pass
+        else:
+            with _objects_lock:
+                stored = _objects.get((Bucket, Key))
+            if stored is not None:
+                return stored
+        raise LocalClientError("404" if operation == "HeadObject" else "NoSuchKey", operation)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        time.sleep(sample_latency("s3"))
+        data, metadata = self._load(Bucket, Key, "HeadObject")
+        return {"ContentLength": len(data), "Metadata": metadata}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(sample_latency("s3"))
+        data, metadata = self._load(Bucket, Key, "GetObject")
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), "Metadata": metadata}
+
+# Lambda invocations received, for inspection by benchmarks
+invocations = []
+
+class Lambda:
+    def invoke(self, FunctionName, Payload=b"", InvocationType="RequestResponse", **kwargs):
+        time.sleep(sample_latency("lambda"))
+        invocations.append({"FunctionName": FunctionName, "InvocationType": InvocationType, "Payload": Payload})
+        status = 202 if InvocationType == "Event" else 200
+        return {"StatusCode": status, "Payload": io.BytesIO(b"null")}
+
+SERVICES = {
+    "bedrock-runtime": BedrockRuntime,
+    "s3": S3,
+    "lambda": Lambda
+}
+
+def client(service):
+    if not settings:
+        configure()
+    return SERVICES[service]()
@@ -0,0 +1,78 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Profiles from cheapest to most expensive; 'quality' is each handler's own settings
+PROFILE_ORDER = ("fast", "balanced", "quality")
+PROFILE_SCALES = {
+    "fast": {"max_tokens": 0.6, "steps": 0.5},
+    "balanced": {"max_tokens": 0.8, "steps": 0.75},
+    "quality": {"max_tokens": 1.0, "steps": 1.0}
+}
+MIN_STEPS = 10
+MIN_TOKENS = 100
+
+DEFAULT_PROFILE = os.environ.get("GENERATION_PROFILE", "quality")
+
+# Step down one profile when this many requests are already in flight in the container
+LOAD_THRESHOLD = int(os.environ.get("PROFILE_LOAD_THRESHOLD", "4"))
+# Time kept in reserve for upload and response serialization
+SAFETY_MARGIN_MS = int(os.environ.get("PROFILE_SAFETY_MARGIN_MS", "2000"))
+
+_in_flight = 0
+_lock = threading.Lock()
+
+def resolve(name, text_settings, image_settings):
+    """Scale a handler's quality settings to the named profile"""
+    scales = PROFILE_SCALES.get(name) or PROFILE_SCALES["quality"]
+    text = dict(text_settings)
+    image = dict(image_settings)
+    if "max_tokens" in text:
+        text["max_tokens"] = max(min(MIN_TOKENS, text["max_tokens"]), int(text["max_tokens"] * scales["max_tokens"]))
+    if "steps" in image:
+        image["steps"] = max(min(MIN_STEPS, image["steps"]), int(image["steps"] * scales["steps"]))
+    return {"name": name if name in PROFILE_SCALES else "quality", "text": text, "image": image}
+
+@contextmanager
+def track_request():
+    """Count a request as in flight for the load-based policy"""
+    global _in_flight
+    with _lock:
+        _in_flight += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_flight -= 1
+
+def in_flight():
+    return _in_flight
+
+def select(requested=None, context=None, estimates_ms=None, is_cached=None):
+    """Pick a profile name from the caller's request, container load and remaining Lambda time
+
+    The caller's choice (or DEFAULT_PROFILE) is the ceiling. When is_cached
+    reports that the ceiling's result is already cached, it is served as is.
+    Otherwise, under load the policy steps down one profile, and it keeps
+    stepping down until the estimated duration fits in the remaining time.
+    """
+    ceiling = requested if requested in PROFILE_SCALES else DEFAULT_PROFILE
+    if ceiling not in PROFILE_SCALES:
+        ceiling = "quality"
+    index = PROFILE_ORDER.index(ceiling)
+
+    # A hit costs no generation, so stepping down would only lower its quality
+    if index > 0 and is_cached is not None and is_cached(ceiling):
+        return ceiling
+
+    if _in_flight > LOAD_THRESHOLD and index > 0:
+        index -= 1
+
+    remaining_ms = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        remaining_ms = context.get_remaining_time_in_millis()
+    if remaining_ms is not None and estimates_ms:
+        while index > 0 and estimates_ms.get(PROFILE_ORDER[index], 0) + SAFETY_MARGIN_MS > remaining_ms:
+            index -= 1
+
+    return PROFILE_ORDER[index]
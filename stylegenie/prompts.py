@@ -0,0 +1,117 @@
+import re
+from string import Formatter
+
+# Sentence ends: terminal punctuation followed by whitespace
+_SENTENCE_END = re.compile(r'[.!?](?=\s)')
+# Markdown list markers and emphasis that carry no meaning in a prompt
+_LIST_MARKER = re.compile(r'^[ \t]*(?:[-*•]|\d+[.)])[ \t]+', re.MULTILINE)
+_EMPHASIS = str.maketrans('', '', '*_#`')
+
+# Extra characters of a partial slot value needed before its fitted form is final
+SETTLE_MARGIN = 8
+
+def clean_text(text, limit=None):
+    """Strip list markers and markdown emphasis and collapse whitespace
+
+    With a limit, only a prefix long enough to yield `limit` characters plus
+    a settle margin is cleaned, which is all fit_text ever looks at.
+    """
+    if limit is not None and len(text) > 2 * limit + 64:
+        cleaned = clean_text(text[:2 * limit + 64])
+        if len(cleaned) >= limit + SETTLE_MARGIN:
+            return cleaned
+    return " ".join(_LIST_MARKER.sub('', text).translate(_EMPHASIS).split())
+
+def fit_text(text, max_length, cleaned=False):
+    """Shorten text to max_length, keeping whole leading sentences where possible
+
+    Falls back to the last whole word when even the first sentence is too
+    long, and to "" when the first word is, so the result never ends mid-word.
+    """
+    if not cleaned:
+        text = clean_text(text, max(0, max_length))
+    if len(text) <= max_length:
+        return text
+    if max_length <= 0:
+        return ""
+
+    window = text[:max_length + 1]
+    sentence_ends = [match.end() for match in _SENTENCE_END.finditer(window + " ") if match.end() <= max_length]
+    if sentence_ends:
+        return text[:sentence_ends[-1]]
+
+    cut = window.rfind(' ')
+    if cut <= 0:
+        return ""
+    return text[:cut].rstrip(' ,;:-')
+
+class PromptTemplate:
+    """A prompt template parsed once, rendered by filling slots by position
+
+    Slots use str.format syntax ({name}). When the rendered prompt would
+    exceed max_length, the slots listed in `flexible` are shortened with
+    fit_text (in order) so that the fixed wording always survives intact.
+    """
+
+    def __init__(self, template, max_length=None, flexible=()):
+        self.max_length = max_length
+        self.flexible = tuple(flexible)
+        self.literals = []
+        self.slots = []
+        pending = ""
+        for literal, field, _, _ in Formatter().parse(template):
+            # Escaped braces ({{ and }}) arrive as separate literal chunks
+            pending += literal
+            if field is not None:
+                self.literals.append(pending)
+                self.slots.append(field)
+                pending = ""
+        self.literals.append(pending)
+        self.fixed_length = sum(len(literal) for literal in self.literals)
+
+    def _join(self, values):
+        parts = [self.literals[0]]
+        for index, slot in enumerate(self.slots):
+            parts.append(values[slot])
+            parts.append(self.literals[index + 1])
+        return "".join(parts)
+
+    def _budget(self, slot, values):
+        """Characters left for `slot` once every other slot has been filled"""
+        used = self.fixed_length
+        for name in self.slots:
+            if name != slot:
+                used += len(values[name])
+        return self.max_length - used
+
+    def render(self, **values):
+        values = {slot: str(values.get(slot, "")) for slot in self.slots}
+        if self.max_length is None:
+            return self._join(values)
+
+        for slot in self.flexible:
+            values[slot] = clean_text(values[slot], self.max_length)
+        for slot in self.flexible:
+            if self.fixed_length + sum(len(value) for value in values.values()) <= self.max_length:
+                break
+            values[slot] = fit_text(values[slot], max(0, self._budget(slot, values)), cleaned=True)
+
+        prompt = self._join(values)
+        if len(prompt) > self.max_length:
+            prompt = fit_text(prompt, self.max_length)
+        return prompt
+
+    def is_settled(self, slot, partial, **values):
+        """Return True once appending text to `slot` can no longer change the rendered prompt"""
+        if self.max_length is None:
+            return False
+        values = {name: str(values.get(name, "")) for name in self.slots}
+        values[slot] = ""
+        budget = self._budget(slot, values)
+        return len(clean_text(partial, max(0, budget))) >= budget + SETTLE_MARGIN
+
+def optional(template, value, skip=("",)):
+    """Render a conditional fragment, or return "" when value is empty or in skip"""
+    if not value or value in skip:
+        return ""
+    return template.format(value=value)
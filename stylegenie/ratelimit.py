@@ -0,0 +1,211 @@
+import json
+import os
+import random
+import threading
+import time
+
+from stylegenie import tracing
+
+# Adapt each model's rate to throttling (AIMD) and retry throttled calls within the deadline
+ADAPTIVE_RATE_LIMITS = os.environ.get('ADAPTIVE_RATE_LIMITS', 'true').lower() == 'true'
+# Starting and highest rate of models not listed in MODEL_RATE_LIMITS, in requests per second
+ADAPTIVE_MAX_RATE = float(os.environ.get('ADAPTIVE_MAX_RATE', '20'))
+ADAPTIVE_MIN_RATE = float(os.environ.get('ADAPTIVE_MIN_RATE', '0.1'))
+# Requests per second regained per second of throttle-free calls, and the factor applied on throttling
+ADAPTIVE_INCREASE = float(os.environ.get('ADAPTIVE_INCREASE', '0.5'))
+ADAPTIVE_DECREASE = float(os.environ.get('ADAPTIVE_DECREASE', '0.5'))
+# Throttles within this many seconds of a decrease report the same overload
+DECREASE_INTERVAL = 1.0
+
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', '4'))
+RETRY_BASE_DELAY = 0.25
+RETRY_MAX_DELAY = 8.0
+
+THROTTLING_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+RETRYABLE_CODES = THROTTLING_CODES | {'ServiceUnavailableException', 'ModelNotReadyException', 'InternalServerException'}
+
+class RateLimitExceeded(Exception):
+    """Raised instead of waiting for a token that would only arrive after the deadline
+
+    It carries a ThrottlingException error code, so callers treat it like
+    Bedrock's own throttling.
+    """
+
+    def __init__(self, model_id=None):
+        message = f"Rate limit of {model_id or 'the model'} leaves no time to call it before the deadline"
+        super().__init__(message)
+        self.response = {'Error': {'Code': 'ThrottlingException', 'Message': message}}
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` calls per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, budget=None):
+        """Block until a token is available and return the seconds spent waiting
+
+        Raises RateLimitExceeded without waiting when the token would only
+        arrive after budget (a deadline.Deadline) runs out.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            remaining = budget.remaining() if budget is not None else None
+            if remaining is not None and delay >= remaining:
+                raise RateLimitExceeded()
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self):
+        """Take a token without waiting; return False when none is available"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class AdaptiveBucket(TokenBucket):
+    """Token bucket whose rate grows additively on success and shrinks multiplicatively on throttling"""
+
+    def __init__(self, max_rate, min_rate=ADAPTIVE_MIN_RATE, increase=ADAPTIVE_INCREASE, decrease=ADAPTIVE_DECREASE):
+        super().__init__(max_rate)
+        self.max_rate = float(max_rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.decreased = 0.0
+
+    def _set_rate(self, rate, now):
+        self._refill(now)
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                # About +increase per second at the current rate, as TCP grows its window per round trip
+                self._set_rate(min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0)), time.monotonic())
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self.decreased < DECREASE_INTERVAL:
+                return
+            self.decreased = now
+            self._set_rate(max(self.min_rate, self.rate * self.decrease), now)
+            # Drop the burst allowance so the next calls are spaced at the new rate
+            self.tokens = min(self.tokens, 0.0)
+
+    def snapshot(self):
+        with self._lock:
+            return {'rate': round(self.rate, 3), 'max_rate': self.max_rate}
+
+def error_code(error):
+    """Return the AWS error code of a botocore ClientError (or the local stand-in's), else None"""
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
+
+class ModelRateLimits:
+    """Per-model token buckets; models without a configured rate are not limited unless adaptive"""
+
+    def __init__(self, rates=None, adaptive=False):
+        self.rates = {model_id: rate for model_id, rate in (rates or {}).items() if rate}
+        self.adaptive = adaptive
+        if adaptive:
+            self.buckets = {}
+        else:
+            self.buckets = {model_id: TokenBucket(rate) for model_id, rate in self.rates.items()}
+        self._lock = threading.Lock()
+
+    def bucket(self, model_id):
+        bucket = self.buckets.get(model_id)
+        if bucket is None and self.adaptive:
+            with self._lock:
+                bucket = self.buckets.get(model_id)
+                if bucket is None:
+                    bucket = AdaptiveBucket(self.rates.get(model_id, ADAPTIVE_MAX_RATE))
+                    self.buckets[model_id] = bucket
+        return bucket
+
+    def acquire(self, model_id, budget=None):
+        bucket = self.bucket(model_id)
+        if bucket is None:
+            return 0.0
+        with tracing.span('rate_wait'):
+            try:
+                return bucket.acquire(budget)
+            except RateLimitExceeded:
+                tracing.count('throttled')
+                raise RateLimitExceeded(model_id) from None
+
+    def call(self, model_id, fn, budget=None, max_attempts=BEDROCK_MAX_ATTEMPTS):
+        """Run fn() under the model's rate limit, retrying throttled and transient failures
+
+        Retries use full-jitter exponential backoff and stop after
+        max_attempts or when the backoff would outlast budget (a
+        deadline.Deadline). Throttling slows the model's adaptive bucket.
+        A call whose token would only arrive after the deadline raises
+        RateLimitExceeded at once.
+        """
+        bucket = self.bucket(model_id)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.acquire(model_id, budget)
+            try:
+                result = fn()
+            except Exception as e:
+                code = error_code(e)
+                if code not in RETRYABLE_CODES:
+                    raise
+                if code in THROTTLING_CODES:
+                    tracing.count('throttled')
+                    if isinstance(bucket, AdaptiveBucket):
+                        bucket.on_throttle()
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                remaining = budget.remaining() if budget is not None else None
+                if attempt >= max_attempts or (remaining is not None and delay >= remaining):
+                    raise
+                print(f"Retrying {model_id} after {code} in {delay:.2f}s")
+                tracing.count('retries')
+                with tracing.span('retry_backoff'):
+                    time.sleep(delay)
+                continue
+            if isinstance(bucket, AdaptiveBucket):
+                bucket.on_success()
+            return result
+
+    def snapshot(self):
+        return {model_id: bucket.snapshot() for model_id, bucket in self.buckets.items() if isinstance(bucket, AdaptiveBucket)}
+
+def limits_from_env():
+    """Read MODEL_RATE_LIMITS, a JSON object of model ID to requests per second
+
+    With ADAPTIVE_RATE_LIMITS these rates are the ceilings the adaptive
+    buckets start at and return to.
+    """
+    try:
+        rates = json.loads(os.environ.get('MODEL_RATE_LIMITS', '{}'))
+    except ValueError:
+        print("Ignoring invalid MODEL_RATE_LIMITS")
+        rates = {}
+    return ModelRateLimits(rates, adaptive=ADAPTIVE_RATE_LIMITS)
@@ -0,0 +1,248 @@
+"""Near-duplicate lookup for free-text request fields
+
+Free text such as extra_details rarely repeats exactly ("no heels" vs
+"without heels"), so exact cache keys miss. Each text is reduced to
+normalized tokens and token pairs, summarized by a MinHash signature, and
+kept in an index of previously served texts per scope (the rest of the
+request). A new text whose estimated Jaccard similarity to an indexed one
+reaches the threshold is replaced by that text, so the request hits the
+existing cache entries. A match must also have exactly the same content
+words, so texts that differ by one meaningful word are never merged.
+
+The index is a file of fixed-width records read through mmap, so a cold
+container only maps it; with an S3 cache store it is also merged into a
+shared copy every few additions and downloaded on first use.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+
+from stylegenie import tracing
+
+SIMILARITY_ENABLED = os.environ.get("SIMILARITY_ENABLED", "true").lower() == "true"
+# Jaccard similarity of the token and token-pair sets needed to reuse a result
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", "0.8"))
+SIMILARITY_PERMUTATIONS = int(os.environ.get("SIMILARITY_PERMUTATIONS", "64"))
+SIMILARITY_MAX_ENTRIES = int(os.environ.get("SIMILARITY_MAX_ENTRIES", "5000"))
+SIMILARITY_SYNC_EVERY = int(os.environ.get("SIMILARITY_SYNC_EVERY", "25"))
+SIMILARITY_KEY = "similar/index.bin"
+# Longer texts are not indexed; they are effectively unique
+TEXT_BYTES = 256
+
+MAGIC = b"SGSIM1"
+HEADER = struct.Struct("<6sHH")
+PRIME = (1 << 61) - 1
+
+# Words that do not change the meaning of a styling preference
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "please", "i", "im", "i'm", "id", "i'd", "me", "my", "would", "like", "want", "wants",
+    "prefer", "prefers", "preferably", "something", "some", "to", "of", "for", "be", "is", "are", "very",
+    "really", "just", "also", "that", "it"
+}
+SYNONYMS = {
+    "without": "no", "w/o": "no", "not": "no", "avoid": "no", "dont": "no", "don't": "no", "none": "no",
+    "colour": "color", "colours": "color", "grey": "gray"
+}
+TOKEN = re.compile(r"[a-z0-9/']+")
+
+def tokens(text):
+    words = []
+    for word in TOKEN.findall(text.lower()):
+        word = SYNONYMS.get(word, word)
+        if word in STOP_WORDS:
+            continue
+        # Crude plural folding; both sides of a comparison are folded alike
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def shingles(text):
+    """Tokens and adjacent token pairs, so word order counts a little"""
+    words = tokens(text)
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+def equivalent(text, other, threshold=SIMILARITY_THRESHOLD):
+    """Jaccard similarity of the shingles of two texts with the same content words, else None
+
+    A single differing word ("hot" vs "cold", a "not") changes the request
+    however long the rest of the text is, so the normalized token sets must
+    be equal; the threshold only limits how far the word order may differ.
+    """
+    if set(tokens(text)) != set(tokens(other)):
+        return None
+    mine, theirs = shingles(text), shingles(other)
+    score = len(mine & theirs) / len(mine | theirs)
+    return score if score >= threshold else None
+
+class MinHasher:
+    def __init__(self, permutations=SIMILARITY_PERMUTATIONS, seed=1):
+        self.coefficients = []
+        for index in range(permutations):
+            # Fixed pseudo-random (a, b) pairs so signatures are stable across processes
+            state = int.from_bytes(hashlib.blake2b(f"{seed}:{index}".encode("ascii"), digest_size=16).digest(), "little")
+            self.coefficients.append((state % (PRIME - 1) + 1, (state >> 64) % PRIME))
+
+    def signature(self, text):
+        values = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+                  for shingle in shingles(text)]
+        if not values:
+            return None
+        return tuple(min((a * value + b) % PRIME for value in values) & 0xFFFFFFFF for a, b in self.coefficients)
+
+def scope_hash(scope):
+    return hashlib.blake2b(scope.encode("utf-8"), digest_size=8).digest()
+
+class SimilarityIndex:
+    """Fixed-width records of (scope hash, MinHash signature, text) in a memory-mapped file"""
+
+    def __init__(self, path, threshold=SIMILARITY_THRESHOLD, permutations=SIMILARITY_PERMUTATIONS,
+                 max_entries=SIMILARITY_MAX_ENTRIES, remote=None, sync_every=SIMILARITY_SYNC_EVERY):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(permutations)
+        self.record = struct.Struct(f"<8s{permutations}IH{TEXT_BYTES}s")
+        self.max_entries = max_entries
+        # (get_s3_client, bucket, key) of the shared copy, or None
+        self.remote = remote
+        self.sync_every = sync_every
+        self._added = 0
+        self._lock = threading.Lock()
+        self._map = None
+        self._scopes = None
+
+    def _header(self):
+        return HEADER.pack(MAGIC, len(self.hasher.coefficients), TEXT_BYTES)
+
+    def _open(self):
+        """Map the index file, downloading the shared copy or creating it when missing"""
+        if self._scopes is not None:
+            return
+        if not os.path.exists(self.path) and self.remote is not None:
+            data = self._download()
+            if data is not None:
+                self._write(self._records(data))
+        if not os.path.exists(self.path):
+            self._write([])
+        self._map_file()
+
+    def _map_file(self):
+        if self._map is not None:
+            self._map.close()
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:HEADER.size] != self._header():
+            # Written with other settings; start over rather than misread it
+            self._map.close()
+            self._map = None
+            self._write([])
+            return self._map_file()
+        self._scopes = {}
+        for offset in range(HEADER.size, len(self._map) - self.record.size + 1, self.record.size):
+            self._scopes.setdefault(self._map[offset:offset + 8], []).append(offset)
+
+    def _records(self, data):
+        """Raw records of an index file's bytes, or [] when its settings differ"""
+        if data[:HEADER.size] != self._header():
+            return []
+        size = self.record.size
+        return [data[offset:offset + size] for offset in range(HEADER.size, len(data) - size + 1, size)]
+
+    def _write(self, records):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._header())
+            f.writelines(records[-self.max_entries:])
+        os.replace(tmp_path, self.path)
+
+    def _text(self, offset):
+        fields = self.record.unpack_from(self._map, offset)
+        return fields[-1][:fields[-2]].decode("utf-8")
+
+    def lookup(self, scope, text):
+        """Return (indexed text, similarity) of the closest equivalent text in scope, else None
+
+        The signatures shortlist texts whose estimated similarity reaches the
+        threshold; each is then checked against the text itself with equivalent().
+        """
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return None
+        with tracing.span("similar_lookup"), self._lock:
+            self._open()
+            candidates = []
+            for offset in self._scopes.get(scope_hash(scope), ()):
+                fields = self.record.unpack_from(self._map, offset)
+                estimate = sum(1 for mine, theirs in zip(signature, fields[1:-2]) if mine == theirs) / len(signature)
+                if estimate >= self.threshold:
+                    candidates.append((estimate, offset))
+            for _, offset in sorted(candidates, reverse=True):
+                indexed = self._text(offset)
+                score = equivalent(text, indexed, self.threshold)
+                if score is not None:
+                    tracing.count("similar_hits")
+                    return indexed, score
+            tracing.count("similar_misses")
+            return None
+
+    def add(self, scope, text):
+        """Index a text whose result is now cached"""
+        encoded = text.encode("utf-8")
+        signature = self.hasher.signature(text)
+        if signature is None or len(encoded) > TEXT_BYTES:
+            return
+        record = self.record.pack(scope_hash(scope), *signature, len(encoded), encoded)
+        with self._lock:
+            self._open()
+            if any(self._map[offset:offset + self.record.size] == record for offset in self._scopes.get(record[:8], ())):
+                return
+            if sum(len(offsets) for offsets in self._scopes.values()) >= self.max_entries:
+                # Keep the newest three quarters
+                records = self._records(self._map[:])
+                self._write(records[len(records) - self.max_entries * 3 // 4:] + [record])
+            else:
+                with open(self.path, "ab") as f:
+                    f.write(record)
+            self._map_file()
+            self._added += 1
+            if self.remote is not None and self._added % self.sync_every == 0:
+                self._sync()
+
+    def _download(self):
+        get_s3_client, bucket, key = self.remote
+        try:
+            return get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
+        except Exception:
+            return None
+
+    def _sync(self):
+        """Merge the shared copy with this container's records and upload the result"""
+        get_s3_client, bucket, key = self.remote
+        try:
+            with tracing.span("similar_sync"):
+                local = self._records(self._map[:])
+                merged = self._records(self._download() or b"")
+                seen = set(merged)
+                merged += [record for record in local if record not in seen]
+                self._write(merged)
+                self._map_file()
+                with open(self.path, "rb") as f:
+                    get_s3_client().put_object(Bucket=bucket, Key=key, Body=f, ContentType="application/octet-stream")
+        except Exception as e:
+            print(f"Error syncing similarity index: {str(e)}")
+
+def build_index(get_s3_client=None, bucket=None):
+    """Build the index described by SIMILARITY_ENABLED and CACHE_STORE, or None"""
+    if not SIMILARITY_ENABLED:
+        return None
+    store_type = os.environ.get("CACHE_STORE", "s3").lower()
+    directory = os.environ.get("CACHE_DIR", "/tmp/stylegenie-cache")
+    path = os.environ.get("SIMILARITY_INDEX_PATH", os.path.join(directory, "similar.idx"))
+    remote = (get_s3_client, bucket, SIMILARITY_KEY) if store_type == "s3" and get_s3_client is not None and bucket else None
+    return SimilarityIndex(path, remote=remote)
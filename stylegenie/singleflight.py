@@ -0,0 +1,72 @@
+"""Coalescing of identical generations that are in flight at the same time
+
+When many identical requests arrive together, the first one for a key
+produces the value and the others wait for it instead of calling Bedrock
+themselves. Group does this between threads of one process; the cache
+stores add an in-progress marker so that callers in other containers wait
+for the value to appear in the store. A caller that waits longer than its
+limit, or whose producer failed, produces the value on its own.
+"""
+import os
+import threading
+
+from stylegenie import tracing
+
+COALESCE_ENABLED = os.environ.get("COALESCE_ENABLED", "true").lower() == "true"
+# Longest wait for another caller's value before producing it independently
+COALESCE_WAIT_SECONDS = float(os.environ.get("COALESCE_WAIT_SECONDS", "20"))
+# In-progress markers older than this belong to a producer that died
+COALESCE_MARKER_TTL_SECONDS = int(os.environ.get("COALESCE_MARKER_TTL_SECONDS", "60"))
+# First and longest interval between store polls while waiting
+POLL_SECONDS = 0.25
+MAX_POLL_SECONDS = 2.0
+
+def wait_seconds(budget=None):
+    """How long a caller may wait for another producer, leaving it time to produce the value itself"""
+    remaining = budget.remaining() if budget is not None else None
+    if remaining is None:
+        return COALESCE_WAIT_SECONDS
+    return min(COALESCE_WAIT_SECONDS, remaining / 2)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+class Group:
+    """One producer call per key at a time in this process; concurrent callers share its value"""
+
+    def __init__(self, name="flight"):
+        self.name = name
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, producer, wait=COALESCE_WAIT_SECONDS):
+        if not COALESCE_ENABLED:
+            return producer()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            try:
+                flight.value = producer()
+                return flight.value
+            except Exception:
+                flight.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+
+        if flight.done.wait(wait) and not flight.failed:
+            with self._lock:
+                self.coalesced += 1
+            tracing.count(f"{self.name}_coalesced")
+            return flight.value
+        print(f"Coalesced {self.name} call {key} did not finish in time; producing it independently")
+        return producer()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# 'content' keys objects by the SHA-256 of their bytes, 'timestamp' keeps prefix-timestamp names
+STORAGE_MODE = os.environ.get('STORAGE_MODE', 'content').lower()
+CONTENT_PREFIX = "images/"
+KNOWN_OBJECTS_MAX = 4096
+
+# Content-addressed objects never change, so browsers and the CDN may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class KnownObjects:
+    """Bounded LRU of keys known to exist in the bucket, to skip repeated HEAD requests"""
+
+    def __init__(self, max_entries=KNOWN_OBJECTS_MAX):
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._keys[key] = True
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+
+known_objects = KnownObjects()
+
+def content_key(image_bytes, extension="png"):
+    return digest_key(hashlib.sha256(image_bytes).hexdigest(), extension)
+
+def digest_key(sha256, extension="png"):
+    return f"{CONTENT_PREFIX}{sha256}.{extension}"
+
+def timestamp_key(prefix="fashion", extension="png"):
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{prefix}-{timestamp}.{extension}"
+
+def object_exists(s3_client, bucket, key):
+    if key in known_objects:
+        return True
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+    except Exception:
+        return False
+    known_objects.add(key)
+    return True
+
+def object_metadata(s3_client, bucket, key):
+    """Return the user metadata of an object, or None when it does not exist"""
+    try:
+        metadata = s3_client.head_object(Bucket=bucket, Key=key).get('Metadata') or {}
+    except Exception:
+        return None
+    known_objects.add(key)
+    return metadata
+
+def s3_url(bucket, key):
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+def store_image(s3_client, bucket, image_bytes, prefix="fashion", key=None, content_type='image/png', **put_args):
+    """Upload image bytes (or a streamed artifacts.DecodedImage) and return the object URL
+
+    In content mode the key is derived from the bytes and the PUT is skipped
+    when an identical object is already stored. An explicit key (e.g. one
+    handed out before the image existed) is always written as given.
+    """
+    extension = content_type.split('/')[-1]
+    streamed = hasattr(image_bytes, 'sha256')
+    if streamed:
+        # Upload straight from the spooled file, which already knows its digest
+        put_args['ContentLength'] = image_bytes.size
+        image_bytes.file.seek(0)
+    if key is None and STORAGE_MODE == 'content':
+        key = digest_key(image_bytes.sha256, extension) if streamed else content_key(image_bytes, extension)
+        if object_exists(s3_client, bucket, key):
+            return s3_url(bucket, key)
+        put_args.setdefault('CacheControl', IMMUTABLE_CACHE_CONTROL)
+    elif key is None:
+        key = timestamp_key(prefix, extension)
+
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=image_bytes.file if streamed else image_bytes,
+        ContentType=content_type,
+        **put_args
+    )
+    if put_args.get('CacheControl') == IMMUTABLE_CACHE_CONTROL:
+        known_objects.add(key)
+    return s3_url(bucket, key)
@@ -0,0 +1,191 @@
+"""Per-request phase timings logged as one CloudWatch Embedded Metric Format line
+
+Spans opened outside a traced request are free no-ops. Work handed to other
+threads must be wrapped with bind() to be attributed to the request.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+# Set TRACING_ENABLED=false to skip the per-request metrics line
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "true").lower() == "true"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "StyleGenie")
+
+_current = contextvars.ContextVar("stylegenie_trace", default=None)
+
+# Code flag of generator functions (inspect.CO_GENERATOR, without importing inspect at init)
+CO_GENERATOR = 0x20
+
+class Trace:
+    """Phase durations (summed over calls and threads), payload sizes and counters of one request"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.started = time.monotonic()
+        self.phases = {}
+        self.sizes = {}
+        self.counters = {}
+        self.models = set()
+        self._lock = threading.Lock()
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            total, calls = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (total + seconds, calls + 1)
+
+    def add_size(self, name, size):
+        with self._lock:
+            self.sizes[name] = self.sizes.get(name, 0) + size
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_model(self, model_id):
+        with self._lock:
+            self.models.add(model_id)
+
+    def to_emf(self, status=None):
+        """Return the request as a CloudWatch Embedded Metric Format document"""
+        with self._lock:
+            phases = dict(self.phases)
+            sizes = dict(self.sizes)
+            counters = dict(self.counters)
+            models = sorted(self.models)
+        record = {"Handler": self.handler, "total_ms": round((time.monotonic() - self.started) * 1000, 3)}
+        metrics = [{"Name": "total_ms", "Unit": "Milliseconds"}]
+        for name, (seconds, calls) in sorted(phases.items()):
+            record[f"{name}_ms"] = round(seconds * 1000, 3)
+            record[f"{name}_calls"] = calls
+            metrics.append({"Name": f"{name}_ms", "Unit": "Milliseconds"})
+        for name, size in sorted(sizes.items()):
+            record[f"{name}_bytes"] = size
+            metrics.append({"Name": f"{name}_bytes", "Unit": "Bytes"})
+        for name, value in sorted(counters.items()):
+            record[name] = value
+            metrics.append({"Name": name, "Unit": "Count"})
+        record["models"] = models
+        if status is not None:
+            record["status"] = status
+        record["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{"Namespace": METRICS_NAMESPACE, "Dimensions": [["Handler"]], "Metrics": metrics}]
+        }
+        return record
+
+def current():
+    return _current.get()
+
+class span:
+    """Time the enclosed block (or decorated function) as phase name of the current request"""
+
+    __slots__ = ("name", "model", "trace", "start")
+
+    def __init__(self, name, model=None):
+        self.name = name
+        self.model = model
+
+    def __enter__(self):
+        self.trace = _current.get()
+        if self.trace is not None:
+            if self.model:
+                self.trace.add_model(self.model)
+            self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add_phase(self.name, time.monotonic() - self.start)
+        return False
+
+def traced(name):
+    """Decorator form of span"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def add_size(name, size):
+    trace = _current.get()
+    if trace is not None:
+        trace.add_size(name, size)
+
+def count(name, amount=1):
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, amount)
+
+def loads_body(body, name):
+    """Read a streaming JSON body, recording its size and parse time"""
+    raw = body.read()
+    add_size(name, len(raw))
+    with span("deserialize"):
+        return json.loads(raw)
+
+def dumps(value, name="response"):
+    """Serialize a response body, recording its size and serialization time"""
+    with span("serialize"):
+        text = json.dumps(value)
+    add_size(name, len(text))
+    return text
+
+def bind(function):
+    """Wrap function so it runs in the caller's request when called on another thread"""
+    trace = _current.get()
+    if trace is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        token = _current.set(trace)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return wrapper
+
+def emit(trace, status=None):
+    print(json.dumps(trace.to_emf(status)))
+
+def _status(response):
+    return response.get("statusCode") if isinstance(response, dict) else None
+
+def handler(name):
+    """Decorate a Lambda handler (or NDJSON generator) to trace each invocation"""
+    def decorate(function):
+        if function.__code__.co_flags & CO_GENERATOR:
+            @functools.wraps(function)
+            def stream_wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    yield from function(*args, **kwargs)
+                    return
+                trace = Trace(name)
+                token = _current.set(trace)
+                try:
+                    yield from function(*args, **kwargs)
+                finally:
+                    _current.reset(token)
+                    emit(trace)
+            return stream_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED:
+                return function(*args, **kwargs)
+            trace = Trace(name)
+            token = _current.set(trace)
+            response = None
+            try:
+                response = function(*args, **kwargs)
+                return response
+            finally:
+                _current.reset(token)
+                emit(trace, _status(response))
+        return wrapper
+    return decorate
@@ -0,0 +1,193 @@
+"""Responsive, compressed variants of generated images
+
+After an image is stored, it is re-encoded (WebP by default, optionally AVIF
+and JPEG) at a few widths on a background thread and uploaded next to the
+original under derived keys. A tiny inline placeholder for blur-up loading is
+kept in the metadata of the variants. Pillow is optional: without it, or with
+IMAGE_VARIANTS=false, only the original is served.
+"""
+import base64
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from stylegenie import storage, tracing
+from stylegenie.cache import LRUCache
+
+IMAGE_VARIANTS = os.environ.get("IMAGE_VARIANTS", "true").lower() == "true"
+VARIANT_WIDTHS = [int(width) for width in os.environ.get("IMAGE_VARIANT_WIDTHS", "320,640,1024").split(",") if width.strip()]
+# Listed best first; browsers pick the first <source> type they support
+VARIANT_FORMATS = [name.strip().lower() for name in os.environ.get("IMAGE_VARIANT_FORMATS", "webp").split(",") if name.strip()]
+VARIANT_UPLOAD_CONCURRENCY = int(os.environ.get("IMAGE_VARIANT_UPLOAD_CONCURRENCY", "4"))
+# Images whose variants are rendered at once, after the response that generated them
+VARIANT_RENDER_WORKERS = int(os.environ.get("IMAGE_VARIANT_RENDER_WORKERS", "1"))
+PLACEHOLDER_WIDTH = 16
+
+# Pillow format name, file extension, MIME type and encoder options per variant format
+FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 78, "method": 4}),
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 55, "speed": 8}),
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True})
+}
+
+# Placeholders of images whose variants are known to exist, keyed by original object key
+placeholders = LRUCache(max_entries=1024)
+
+_pillow = None
+_renderer = None
+# Futures of the renders still running, keyed by original object key
+_pending = {}
+_pending_lock = threading.Lock()
+
+def pillow():
+    """Return PIL.Image, or None when Pillow is not installed"""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image
+            _pillow = Image
+        except ImportError:
+            print("Pillow is not installed; image variants are disabled")
+            _pillow = False
+    return _pillow or None
+
+def enabled():
+    return IMAGE_VARIANTS and bool(VARIANT_WIDTHS) and bool(VARIANT_FORMATS)
+
+def key_from_url(bucket, image_url):
+    prefix = storage.s3_url(bucket, "")
+    return image_url[len(prefix):] if image_url and image_url.startswith(prefix) else None
+
+def variant_key(key, width, name):
+    return f"{key.rsplit('.', 1)[0]}-{width}w.{FORMATS[name][1]}"
+
+def render(source, encode=True):
+    """Return (placeholder data URI, [(width, format name, bytes), ...]) for an image file or bytes
+
+    With encode=False only the placeholder is made and the list is empty.
+    """
+    Image = pillow()
+    with Image.open(source if hasattr(source, "read") else io.BytesIO(source)) as original:
+        original = original.convert("RGB")
+    variants = []
+    for width in VARIANT_WIDTHS if encode else []:
+        # Exactly width pixels wide so srcset descriptors hold; SDXL output (1024px) is never upscaled by the defaults
+        size = (width, max(1, round(original.height * width / original.width)))
+        resized = original if size == original.size else original.resize(size, Image.LANCZOS)
+        for name in VARIANT_FORMATS:
+            pil_format, _, _, options = FORMATS[name]
+            buffer = io.BytesIO()
+            resized.save(buffer, format=pil_format, **options)
+            variants.append((width, name, buffer.getvalue()))
+
+    tiny = original.resize((PLACEHOLDER_WIDTH, max(1, round(original.height * PLACEHOLDER_WIDTH / original.width))), Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.save(buffer, format="WEBP", quality=30)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    return placeholder, variants
+
+def store_variants(s3_client, bucket, image_url, image, **put_args):
+    """Render and upload the variants of a stored image and return its description, or None
+
+    put_args (e.g. ACL) are passed to every variant upload, and the
+    placeholder is stored in the metadata of every variant. Variants of a
+    content-addressed original are immutable like the original, and are
+    not encoded again when they already exist.
+    """
+    key = key_from_url(bucket, image_url)
+    if key is None or not enabled() or pillow() is None:
+        return None
+    source = image.file if hasattr(image, "file") else image
+    content_addressed = key.startswith(storage.CONTENT_PREFIX)
+    if content_addressed:
+        put_args.setdefault("CacheControl", storage.IMMUTABLE_CACHE_CONTROL)
+    try:
+        with tracing.span("variants"):
+            existing = describe(s3_client, bucket, image_url) if content_addressed else None
+            # Variants stored before placeholders moved into their metadata are encoded again
+            if existing is not None and existing["placeholder"]:
+                tracing.count("variants_reused")
+                return existing
+            if hasattr(source, "seek"):
+                source.seek(0)
+            placeholder, variants = render(source)
+            put_args["Metadata"] = dict(put_args.get("Metadata") or {}, placeholder=placeholder)
+
+            def upload(variant):
+                width, name, data = variant
+                tracing.add_size("variant", len(data))
+                return storage.store_image(
+                    s3_client, bucket, data,
+                    key=variant_key(key, width, name),
+                    content_type=FORMATS[name][2],
+                    **put_args
+                )
+
+            with ThreadPoolExecutor(max_workers=max(1, min(VARIANT_UPLOAD_CONCURRENCY, len(variants)))) as executor:
+                list(executor.map(tracing.bind(upload), variants))
+            placeholders.set(key, placeholder)
+    except Exception as e:
+        print(f"Error creating image variants: {str(e)}")
+        return None
+    return describe(s3_client, bucket, image_url)
+
+def renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = ThreadPoolExecutor(max_workers=max(1, VARIANT_RENDER_WORKERS), thread_name_prefix="variants")
+    return _renderer
+
+def store_variants_later(s3_client, bucket, image_url, image, **put_args):
+    """Run store_variants on a background thread and return its future, or None when there is nothing to render
+
+    The image is read into memory first, since the caller closes it when
+    it returns. An image whose variants are already being rendered in this
+    container is not queued again.
+    """
+    key = key_from_url(bucket, image_url)
+    if key is None or not enabled() or pillow() is None:
+        return None
+    source = image.file if hasattr(image, "file") else image
+    if hasattr(source, "read"):
+        source.seek(0)
+        source = source.read()
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        future = _pending[key] = renderer().submit(store_variants, s3_client, bucket, image_url, source, **put_args)
+
+    def done(finished):
+        with _pending_lock:
+            if _pending.get(key) is finished:
+                del _pending[key]
+    future.add_done_callback(done)
+    return future
+
+def wait(bucket, image_url, timeout=None):
+    """Block until the variants of image_url queued in this container are uploaded"""
+    key = key_from_url(bucket, image_url)
+    with _pending_lock:
+        future = _pending.get(key)
+    if future is not None:
+        future.result(timeout)
+
+def describe(s3_client, bucket, image_url):
+    """Return {"sources": [{"type", "srcset"}], "placeholder"} for an image whose variants exist, else None"""
+    key = key_from_url(bucket, image_url)
+    if key is None or not enabled():
+        return None
+    placeholder = placeholders.get(key)
+    if placeholder is None:
+        # Variants are uploaded together, so the last one stands for the whole set and carries the placeholder
+        metadata = storage.object_metadata(s3_client, bucket, variant_key(key, VARIANT_WIDTHS[-1], VARIANT_FORMATS[-1]))
+        if metadata is None:
+            return None
+        placeholder = metadata.get("placeholder", "")
+        placeholders.set(key, placeholder)
+    sources = []
+    for name in VARIANT_FORMATS:
+        srcset = ", ".join(f"{storage.s3_url(bucket, variant_key(key, width, name))} {width}w" for width in VARIANT_WIDTHS)
+        sources.append({"type": FORMATS[name][2], "srcset": srcset})
+    return {"sources": sources, "placeholder": placeholder or None}
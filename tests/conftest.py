@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+
+# Handlers read these at import: in-process AWS stand-in, caches in memory only
+os.environ.setdefault("AWS_BACKEND", "local")
+os.environ.setdefault("CACHE_STORE", "memory")
+os.environ.setdefault("TRACING_ENABLED", "false")
+
+@pytest.fixture(autouse=True)
+def local_aws():
+    """Fresh stand-in without latency for every test; yields the module for configure() and inspection"""
+    from stylegenie import local_backend, variants
+    local_backend.configure(latency_scale=0, image_size=64)
+    yield local_backend
+    # Variants are rendered after the response; finish them before the next test (and interpreter exit)
+    for future in list(variants._pending.values()):
+        future.result()
@@ -0,0 +1,43 @@
+import base64
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+from stylegenie.artifacts import read_images
+
+def sdxl_body(*images, escape_slashes=False):
+    text = json.dumps({
+        "result": "success",
+        "artifacts": [{"base64": base64.b64encode(image).decode("ascii"), "seed": 0} for image in images]
+    })
+    if escape_slashes:
+        text = text.replace("/", "\\/")
+    return io.BytesIO(text.encode("ascii"))
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 8, 64, 4096])
+def test_decodes_across_any_chunk_boundary(chunk_size):
+    image = os.urandom(1001)
+    images = read_images(sdxl_body(image), chunk_size=chunk_size)
+    assert len(images) == 1
+    assert images[0].read() == image
+    assert images[0].size == len(image)
+    assert images[0].sha256 == hashlib.sha256(image).hexdigest()
+
+@pytest.mark.parametrize("chunk_size", [3, 5, 4096])
+def test_decodes_every_artifact_with_escaped_slashes(chunk_size):
+    first, second = bytes(range(256)) * 3, os.urandom(500)
+    images = read_images(sdxl_body(first, second, escape_slashes=True), chunk_size=chunk_size)
+    assert [image.read() for image in images] == [first, second]
+
+def test_large_images_spool_to_disk():
+    image = os.urandom(5000)
+    images = read_images(sdxl_body(image), chunk_size=512, spool_max=1024)
+    assert images[0].file._rolled
+    assert images[0].read() == image
+
+def test_base64_as_a_value_is_not_an_image():
+    body = io.BytesIO(b'{"encoding": "base64", "note": "no artifacts"}')
+    assert read_images(body, chunk_size=4) == []
@@ -0,0 +1,63 @@
+import json
+import time
+
+import lambda_function
+from stylegenie import batch
+
+def test_dedupe_maps_every_item_to_its_first_occurrence():
+    unique, positions = batch.dedupe(["a", "B", "b", "c", "a"], str.lower)
+    assert unique == ["a", "B", "c"]
+    assert positions == [0, 1, 1, 2, 0]
+
+def test_run_in_order_yields_in_input_order_with_errors():
+    def worker(item):
+        # Later items finish first
+        time.sleep(0.01 * (4 - item))
+        if item == 2:
+            raise ValueError("bad item")
+        return item * 10
+
+    assert list(batch.run_in_order([0, 1, 2, 3], worker, 4)) == [
+        (0, 0, None), (1, 10, None), (2, None, "bad item"), (3, 30, None)
+    ]
+
+def test_run_in_order_of_nothing_yields_nothing():
+    assert list(batch.run_in_order([], lambda item: item, 4)) == []
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+def batch_call(requests, context=None):
+    result = lambda_function.batch_handler({"body": json.dumps({"requests": requests})}, context)
+    return json.loads(result["body"])
+
+def test_batch_results_follow_the_input_with_duplicates_generated_once():
+    requests = [
+        {"occasion": "wedding", "extra_details": "batch test"},
+        "not an object",
+        {"occasion": "Wedding ", "extra_details": "batch test"},
+        {"occasion": "beach", "extra_details": "batch test"}
+    ]
+    body = batch_call(requests)
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[1]["error"] == "Each request must be a JSON object"
+    assert results[0]["outfit_description"] == results[2]["outfit_description"]
+    assert results[0]["image_url"] == results[2]["image_url"]
+    assert "error" not in results[3]
+    assert body["summary"] == {"type": "summary", "count": 4, "unique": 3, "skipped": 0}
+
+def test_items_that_do_not_fit_in_the_remaining_time_are_skipped():
+    requests = [{"occasion": occasion, "extra_details": "batch deadline"} for occasion in ("gym", "party")]
+    body = batch_call(requests, Context(remaining_ms=3000))
+    assert [result.get("error") for result in body["results"]] == ["skipped", "skipped"]
+    assert body["summary"]["skipped"] == 2
+
+def test_oversized_batches_are_refused(monkeypatch):
+    monkeypatch.setattr(lambda_function, "BATCH_MAX_ITEMS", 2)
+    lines = list(lambda_function.batch_stream_handler({"requests": [{}, {}, {}]}, None))
+    assert json.loads(lines[0]) == {"type": "error", "error": "At most 2 requests per batch"}
@@ -0,0 +1,97 @@
+import pytest
+
+from stylegenie import cache
+from stylegenie.cache import LRUCache, LocalStore, ResponseCache, cache_key, normalize_value
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+def test_normalize_value_folds_case_and_whitespace():
+    assert normalize_value("  Business\tCasual \n") == "business casual"
+    assert normalize_value(42) == 42
+
+def test_cache_key_ignores_case_and_spacing():
+    assert cache_key("text", {"occasion": "Wedding  Guest"}) == cache_key("text", {"occasion": "wedding guest"})
+
+def test_cache_key_depends_on_model_and_settings():
+    params = {"occasion": "wedding"}
+    key = cache_key("text", params, "model-a", {"max_tokens": 300})
+    assert key.startswith("text-")
+    assert key != cache_key("text", params, "model-b", {"max_tokens": 300})
+    assert key != cache_key("text", params, "model-a", {"max_tokens": 200})
+    assert key != cache_key("image", params, "model-a", {"max_tokens": 300})
+
+def test_lru_entries_expire_after_ttl(clock):
+    memory = LRUCache(ttl=10)
+    memory.set("key", "value")
+    clock.now += 9
+    assert memory.get("key") == "value"
+    clock.now += 2
+    assert memory.get("key") is None
+    assert len(memory) == 0
+
+def test_lru_evicts_least_recently_used():
+    memory = LRUCache(max_entries=2)
+    memory.set("a", 1)
+    memory.set("b", 2)
+    memory.get("a")
+    memory.set("c", 3)
+    assert memory.get("b") is None
+    assert memory.get("a") == 1 and memory.get("c") == 3
+
+def test_local_store_entries_expire_after_ttl(tmp_path, clock):
+    store = LocalStore(str(tmp_path), ttl=10)
+    store.set("key", {"url": "x"})
+    assert store.get("key") == (1010.0, {"url": "x"})
+    clock.now += 11
+    assert store.get("key") is None
+
+def test_store_hit_fills_memory_with_the_store_expiry(tmp_path, clock):
+    store = LocalStore(str(tmp_path), ttl=10)
+    store.set("key", "value")
+    responses = ResponseCache(LRUCache(ttl=1000), store)
+    assert responses.get("key") == "value"
+    assert responses.stats()["store_hits"] == 1
+    clock.now += 11
+    assert responses.get("key") is None
+
+def test_store_misses_are_remembered_for_miss_ttl(tmp_path, clock):
+    store = LocalStore(str(tmp_path))
+    reads = []
+    get = store.get
+    store.get = lambda key: reads.append(key) or get(key)
+    responses = ResponseCache(store=store, miss_ttl=60)
+    assert responses.get("key") is None
+    assert responses.get("key") is None
+    assert len(reads) == 1
+    clock.now += 61
+    assert responses.get("key") is None
+    assert len(reads) == 2
+    responses.set("key", "value")
+    assert responses.get("key") == "value"
+
+def test_misses_do_not_evict_cached_values(tmp_path, clock):
+    store = LocalStore(str(tmp_path))
+    responses = ResponseCache(LRUCache(max_entries=2), store, miss_ttl=60, miss_max_entries=3)
+    responses.set("hit", "value")
+    reads = []
+    get = store.get
+    store.get = lambda key: reads.append(key) or get(key)
+    for index in range(10):
+        assert responses.get(f"absent-{index}") is None
+    assert responses.get("hit") == "value"
+    assert reads == [f"absent-{index}" for index in range(10)]
+    # Only the most recent misses are remembered
+    assert len(responses.misses) == 3
+    assert responses.get("absent-9") is None
+    assert len(reads) == 10
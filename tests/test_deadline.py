@@ -0,0 +1,53 @@
+import pytest
+
+from stylegenie import deadline
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+@pytest.fixture
+def latency(monkeypatch):
+    stats = deadline.LatencyStats(window=4)
+    monkeypatch.setattr(deadline, "latency", stats)
+    return stats
+
+def test_without_a_context_there_is_no_deadline(latency):
+    budget = deadline.Deadline()
+    assert budget.remaining() is None
+    assert budget.can_run("model", 3600)
+
+def test_remaining_subtracts_the_reserve():
+    remaining = deadline.Deadline(Context(10000), reserve_ms=1500).remaining()
+    assert 8.4 < remaining <= 8.5
+
+def test_remaining_never_goes_below_zero():
+    assert deadline.Deadline(Context(1000), reserve_ms=1500).remaining() == 0.0
+
+def test_can_run_uses_the_default_before_any_sample(latency):
+    budget = deadline.Deadline(Context(10000), reserve_ms=0)
+    assert budget.can_run("model", 9)
+    assert not budget.can_run("model", 11)
+
+def test_can_run_uses_recent_latencies(latency):
+    for seconds in (2, 3, 4, 12):
+        latency.record("model", seconds)
+    budget = deadline.Deadline(Context(10000), reserve_ms=0)
+    # The 90th percentile of the window is the slowest recent call
+    assert latency.estimate("model", 1) == 12
+    assert not budget.can_run("model", 1)
+    for seconds in (2, 3, 4, 5):
+        latency.record("model", seconds)
+    assert latency.count("model") == 4
+    assert budget.can_run("model", 60)
+
+def test_timed_records_under_the_key(latency):
+    with deadline.timed("model"):
+        pass
+    with pytest.raises(ValueError):
+        with deadline.timed("model"):
+            raise ValueError("failed")
+    assert latency.count("model") == 2
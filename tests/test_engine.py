@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from stylegenie import profiles
+from stylegenie.engine import Engine, error_response, parse, parse_body, pipeline, response
+
+ENGINE = Engine(
+    "test_engine",
+    text_model_id="text-model",
+    image_model_id="image-model",
+    text_settings={"max_tokens": 1000, "temperature": 0.7},
+    image_settings={"steps": 30},
+    params={"occasion": "casual", "body_type": "average"}
+)
+
+def run(steps, body):
+    result = pipeline(ENGINE, steps)({"body": json.dumps(body)}, None)
+    return result["statusCode"], json.loads(result["body"])
+
+def test_steps_run_in_order_and_share_the_request():
+    seen = []
+
+    def first(engine, request):
+        seen.append("first")
+        request.text = "from first"
+
+    def second(engine, request):
+        seen.append("second")
+        request.result = {"text": request.text, "occasion": request.params["occasion"], "profile": request.profile["name"]}
+
+    status, body = run([parse, first, second], {"body_type": "pear", "profile": "fast"})
+    assert status == 200
+    assert seen == ["first", "second"]
+    assert body == {"text": "from first", "occasion": "casual", "profile": "fast"}
+
+def test_a_step_returning_a_value_ends_the_request():
+    def stop(engine, request):
+        return error_response(404, "not here")
+
+    def never(engine, request):
+        pytest.fail("ran after the response")
+
+    assert run([parse, stop, never], {}) == (404, {"error": "not here"})
+
+def test_an_exception_becomes_a_500():
+    def broken(engine, request):
+        raise ValueError("broken step")
+
+    assert run([parse, broken], {}) == (500, {"error": "broken step"})
+
+def test_requests_are_counted_in_flight_while_the_steps_run():
+    before = profiles.in_flight()
+    counted = []
+    run([lambda engine, request: counted.append(profiles.in_flight())], {})
+    assert counted == [before + 1]
+    assert profiles.in_flight() == before
+
+def test_responses_carry_cors_headers_and_serialize_the_body():
+    result = response(200, {"ok": True})
+    assert result["headers"]["Access-Control-Allow-Origin"] == "*"
+    assert json.loads(result["body"]) == {"ok": True}
+    assert response(200, "a\nb", content_type="application/x-ndjson")["body"] == "a\nb"
+
+def test_parse_body_reads_api_gateway_and_direct_events():
+    assert parse_body({"body": json.dumps({"occasion": "gala"})}) == {"occasion": "gala"}
+    assert parse_body({"occasion": "gala"}) == {"occasion": "gala"}
+
+def test_profiles_scale_the_engine_settings():
+    assert ENGINE.profile("fast")["text"]["max_tokens"] == 600
+    assert ENGINE.profile("quality")["image"]["steps"] == 30
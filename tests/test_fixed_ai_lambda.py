@@ -0,0 +1,92 @@
+import json
+import time
+
+import fixed_ai_lambda
+
+def call(body):
+    result = fixed_ai_lambda.lambda_handler({"body": json.dumps(body)}, None)
+    return result["statusCode"], json.loads(result["body"])
+
+def test_fan_out_keeps_job_order(monkeypatch):
+    def generate(prompt, prefix, profile=None, budget=None):
+        # Later jobs finish first
+        time.sleep(0.02 * (5 - int(prompt)))
+        return f"https://images/{prompt}.png"
+
+    monkeypatch.setattr(fixed_ai_lambda, "generate_and_upload_image", generate)
+    jobs = [(str(index), f"outfit-{index}") for index in range(5)]
+    assert fixed_ai_lambda.generate_images(jobs) == [f"https://images/{index}.png" for index in range(5)]
+
+def test_fan_out_reports_failed_jobs_as_none(monkeypatch):
+    def generate(prompt, prefix, profile=None, budget=None):
+        if prompt == "1":
+            raise RuntimeError("model error")
+        return None if prompt == "2" else f"https://images/{prompt}.png"
+
+    monkeypatch.setattr(fixed_ai_lambda, "generate_and_upload_image", generate)
+    jobs = [(str(index), f"outfit-{index}") for index in range(4)]
+    assert fixed_ai_lambda.generate_images(jobs) == ["https://images/0.png", None, None, "https://images/3.png"]
+
+def test_failed_images_get_placeholders_in_place(monkeypatch):
+    generate_image = fixed_ai_lambda.engine.generate_image
+
+    def flaky(prompt, prefix, profile, budget=None, key=None):
+        return None if prefix == "outfit-2" else generate_image(prompt, prefix, profile, budget, key)
+
+    monkeypatch.setattr(fixed_ai_lambda.engine, "generate_image", flaky)
+    status, body = call({"occasion": "wedding", "body_type": "pear"})
+    assert status == 200
+    outfits = body["outfit_suggestions"]
+    assert len(outfits) == 3
+    assert outfits[1]["image_url"] == "https://placehold.co/600x400/png?text=Outfit+Suggestion+2"
+    assert all(outfit["image_url"].startswith("https://stylegenie-uploads") for i, outfit in enumerate(outfits) if i != 1)
+    assert all(item["image_url"] for item in body["historical_fashion"])
+    assert body["failed"] == ["outfit_suggestions/1"]
+
+def failed_result(monkeypatch, occasion, failing=("outfit-1", "outfit-3")):
+    """Generate advice whose images with the given prefixes fail; returns the response body"""
+    generate_image = fixed_ai_lambda.engine.generate_image
+    calls = []
+
+    def flaky(prompt, prefix, profile, budget=None, key=None):
+        calls.append(prefix)
+        return None if prefix in failing else generate_image(prompt, prefix, profile, budget, key)
+
+    monkeypatch.setattr(fixed_ai_lambda.engine, "generate_image", flaky)
+    status, body = call({"occasion": occasion, "body_type": "pear"})
+    assert status == 200 and body["partial"] and body["request_id"]
+    monkeypatch.setattr(fixed_ai_lambda.engine, "generate_image", generate_image)
+    return body
+
+def test_retry_regenerates_only_the_failed_images(monkeypatch):
+    body = failed_result(monkeypatch, "retry all")
+    assert body["failed"] == ["outfit_suggestions/0", "outfit_suggestions/2"]
+    calls = []
+    generate_image = fixed_ai_lambda.engine.generate_image
+    monkeypatch.setattr(fixed_ai_lambda.engine, "generate_image", lambda prompt, prefix, *args, **kwargs: calls.append(prefix) or generate_image(prompt, prefix, *args, **kwargs))
+
+    status, retried = call({"request_id": body["request_id"]})
+    assert status == 200
+    assert sorted(calls) == ["outfit-1", "outfit-3"]
+    assert retried["failed"] == [] and not retried["partial"]
+    assert retried["outfit_suggestions"][1] == body["outfit_suggestions"][1]
+    assert all(outfit["image_url"].startswith("https://stylegenie-uploads") for outfit in retried["outfit_suggestions"])
+
+def test_retry_of_listed_items(monkeypatch):
+    body = failed_result(monkeypatch, "retry one")
+    status, retried = call({"request_id": body["request_id"], "retry": "outfit_suggestions/2"})
+    assert status == 200 and retried["failed"] == ["outfit_suggestions/0"]
+    # Items that are no longer failed are left as they are
+    status, retried = call({"request_id": body["request_id"], "retry": ["outfit_suggestions/2", "historical_fashion/0"]})
+    assert status == 200 and retried["failed"] == ["outfit_suggestions/0"]
+
+def test_retry_rejects_malformed_and_unknown_items(monkeypatch):
+    body = failed_result(monkeypatch, "retry invalid")
+    for retry in (3, {"outfit_suggestions": 0}, ["outfit_suggestions/0", 1]):
+        status, error = call({"request_id": body["request_id"], "retry": retry})
+        assert status == 400, retry
+    for retry in ("outfit_suggestions/9", "bogus/0", "outfit_suggestions"):
+        status, error = call({"request_id": body["request_id"], "retry": [retry]})
+        assert status == 400 and retry in error["error"]
+    status, _ = call({"request_id": "0" * 32})
+    assert status == 404
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from stylegenie import deadline, hedging
+
+class Result:
+    def __init__(self, name):
+        self.name = name
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Fast calls on record for the key and an unlimited hedge budget"""
+    stats = deadline.LatencyStats()
+    for _ in range(hedging.HEDGE_MIN_SAMPLES):
+        stats.record("model", 0.01)
+    monkeypatch.setattr(deadline, "latency", stats)
+    monkeypatch.setattr(hedging, "budget", hedging.HedgeBudget(max_ratio=1.0))
+
+def slow_then_fast(primary, hedge, primary_error=None):
+    """fn whose first call waits until released and whose second returns at once"""
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)
+            if primary_error:
+                raise primary_error
+            return primary
+        return hedge
+    return fn, release
+
+def test_budget_caps_hedges_at_the_ratio():
+    budget = hedging.HedgeBudget(max_ratio=0.1)
+    for _ in range(30):
+        budget.record_call()
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+    assert budget.stats() == {"calls": 30, "hedges": 3, "hedge_wins": 0}
+
+def test_no_hedge_before_enough_samples(monkeypatch):
+    monkeypatch.setattr(deadline, "latency", deadline.LatencyStats())
+    assert hedging.hedge_delay("model") is None
+    assert hedging.call("model", lambda: "answer", enabled=True) == "answer"
+    assert hedging.budget.stats()["hedges"] == 0
+
+def test_slow_call_is_hedged_and_the_loser_closed():
+    primary, hedge = Result("primary"), Result("hedge")
+    fn, release = slow_then_fast(primary, hedge)
+    assert hedging.call("model", fn, enabled=True) is hedge
+    assert hedging.budget.stats() == {"calls": 1, "hedges": 1, "hedge_wins": 1}
+    release.set()
+    assert primary.closed.wait(5)
+    assert not hedge.closed.is_set()
+
+def test_lists_of_results_are_closed_item_by_item():
+    primary, hedge = [Result("a"), Result("b")], [Result("c")]
+    fn, release = slow_then_fast(primary, hedge)
+    assert hedging.call("model", fn, enabled=True) is hedge
+    release.set()
+    assert all(item.closed.wait(5) for item in primary)
+
+def test_failed_attempt_falls_back_to_the_other():
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) == 1:
+            threading.Event().wait(0.05)
+            raise RuntimeError("throttled")
+        threading.Event().wait(0.1)
+        return "hedge"
+    assert hedging.call("model", fn, enabled=True) == "hedge"
+
+def test_exhausted_budget_waits_for_the_primary(monkeypatch):
+    monkeypatch.setattr(hedging, "budget", hedging.HedgeBudget(max_ratio=0))
+    primary = Result("primary")
+    fn, release = slow_then_fast(primary, Result("hedge"))
+    threading.Timer(0.1, release.set).start()
+    assert hedging.call("model", fn, enabled=True) is primary
+    assert not primary.closed.is_set()
@@ -0,0 +1,23 @@
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# deployment/import-budget.py also prints the slowest imports when run by hand
+spec = importlib.util.spec_from_file_location("import_budget", os.path.join(ROOT, "deployment", "import-budget.py"))
+import_budget = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_budget)
+
+MAX_MS = float(os.environ.get("IMPORT_BUDGET_MS", "100"))
+MAX_MODULES = int(os.environ.get("IMPORT_BUDGET_MODULES", "85"))
+
+@pytest.fixture(scope="module")
+def baseline():
+    return import_budget.baseline_modules()
+
+@pytest.mark.parametrize("handler", list(import_budget.HANDLERS))
+def test_handler_import_is_within_budget(handler, baseline):
+    failures = import_budget.check_handler(handler, import_budget.HANDLERS[handler], baseline, MAX_MS, MAX_MODULES)
+    assert failures == []
@@ -0,0 +1,20 @@
+import pytest
+
+import fixed_ai_lambda
+
+@pytest.mark.parametrize("url", ["https://hooks.example.com/done", "http://hooks.example.com/done", "https://169.254.169.254/"])
+def test_callbacks_are_refused_without_an_allowlist(monkeypatch, url):
+    monkeypatch.setattr(fixed_ai_lambda, "JOB_CALLBACK_HOSTS", [])
+    assert not fixed_ai_lambda.callback_allowed(url)
+
+def test_callbacks_need_https_and_an_allowed_host(monkeypatch):
+    monkeypatch.setattr(fixed_ai_lambda, "JOB_CALLBACK_HOSTS", ["hooks.example.com"])
+    assert fixed_ai_lambda.callback_allowed("https://hooks.example.com/done")
+    assert fixed_ai_lambda.callback_allowed("https://HOOKS.example.com/done")
+    assert not fixed_ai_lambda.callback_allowed("http://hooks.example.com/done")
+    assert not fixed_ai_lambda.callback_allowed("https://hooks.example.com.evil.net/done")
+    assert not fixed_ai_lambda.callback_allowed("https://evil.net/?hooks.example.com")
+
+def test_job_view_hides_the_request_and_callback():
+    job = {"job_id": "a", "status": "done", "occasion": "wedding", "body_type": "pear", "callback_url": "https://x/"}
+    assert fixed_ai_lambda.job_view(job) == {"job_id": "a", "status": "done"}
@@ -0,0 +1,47 @@
+import json
+
+from stylegenie.jsonstream import JSONExtractor, extract
+
+ADVICE = {
+    "outfit_suggestions": [
+        {"description": "Navy suit", "items": ["blazer", "trousers"]},
+        {"description": "Linen \"summer\" look", "items": ["shirt"]}
+    ],
+    "historical_fashion": [{"era": "1920s", "description": "Drop waist"}]
+}
+
+def test_extracts_object_wrapped_in_prose_and_fences():
+    text = "Here is your advice:\n```json\n" + json.dumps(ADVICE) + "\n```\nEnjoy!"
+    assert extract(text) == ADVICE
+
+def test_truncated_inside_string_value_is_closed():
+    text = '{"outfit_suggestions": [{"description": "A flowing midi dr'
+    assert extract(text) == {"outfit_suggestions": [{"description": "A flowing midi dr"}]}
+
+def test_truncated_after_comma_drops_the_dangling_separator():
+    text = '{"outfit_suggestions": [{"description": "Navy suit"}, '
+    assert extract(text) == {"outfit_suggestions": [{"description": "Navy suit"}]}
+
+def test_truncated_inside_key_falls_back_to_last_complete_value():
+    text = '{"outfit_suggestions": [{"description": "Navy suit", "ite'
+    assert extract(text) == {"outfit_suggestions": [{"description": "Navy suit"}]}
+
+def test_truncated_after_escape_drops_it():
+    text = '{"description": "Linen \\'
+    assert extract(text) == {"description": "Linen "}
+
+def test_no_object_returns_none():
+    assert extract("Sorry, I cannot help with that.") is None
+
+def test_array_elements_are_reported_as_they_complete_across_chunks():
+    text = json.dumps(ADVICE)
+    extractor = JSONExtractor(("outfit_suggestions", "historical_fashion"))
+    completed = []
+    for start in range(0, len(text), 7):
+        completed.extend(extractor.feed(text[start:start + 7]))
+    assert completed == [
+        ("outfit_suggestions", 0, ADVICE["outfit_suggestions"][0]),
+        ("outfit_suggestions", 1, ADVICE["outfit_suggestions"][1]),
+        ("historical_fashion", 0, ADVICE["historical_fashion"][0])
+    ]
+    assert extractor.result() == ADVICE
@@ -0,0 +1,118 @@
+import json
+import threading
+
+import lambda_function
+from stylegenie import clients
+
+LONG_DESCRIPTION = " ".join(
+    f"Sentence {index} describes a tailored piece in soft wool with careful detail and a matching accessory."
+    for index in range(12)
+)
+
+class Context:
+    function_name = "StyleGenieAI"
+
+    def get_remaining_time_in_millis(self):
+        return 60000
+
+def call(body, context=None):
+    result = lambda_function.lambda_handler({"body": json.dumps(body)}, context)
+    return result["statusCode"], json.loads(result["body"])
+
+def params(extra_details):
+    # Distinct extra_details keep tests apart in the module-level caches
+    return ("pear", "wedding", "female", "global", "adult", extra_details)
+
+def test_pipelined_image_starts_before_the_description_ends(monkeypatch):
+    pieces = [LONG_DESCRIPTION[start:start + 40] for start in range(0, len(LONG_DESCRIPTION), 40)]
+    streamed = threading.Event()
+    images = []
+
+    def stream_text(prompt, profile, on_delta=None, budget=None):
+        for piece in pieces:
+            on_delta(piece)
+        streamed.set()
+        return "".join(pieces)
+
+    def invoke_image_model(image_prompt, prefix="fashion", key=None, profile=None, budget=None):
+        images.append((image_prompt, streamed.is_set()))
+        return "https://stylegenie-uploads.s3.amazonaws.com/images/x.png"
+
+    monkeypatch.setattr(lambda_function.engine, "stream_text", stream_text)
+    monkeypatch.setattr(lambda_function, "invoke_image_model", invoke_image_model)
+    outfit_params = params("pipelined long")
+    description, image_url = lambda_function.generate_outfit_pipelined(*outfit_params)
+    assert description == LONG_DESCRIPTION
+    assert image_url.endswith("/images/x.png")
+    # One image, started while text was still arriving, with the prompt the full text gives
+    assert images == [(lambda_function.build_image_prompt(LONG_DESCRIPTION, *outfit_params), False)]
+
+def test_pipelined_short_description_starts_the_image_at_the_end(monkeypatch):
+    images = []
+    monkeypatch.setattr(lambda_function.engine, "stream_text", lambda prompt, profile, on_delta=None, budget=None: on_delta("Navy suit.") or "Navy suit.")
+    monkeypatch.setattr(lambda_function, "invoke_image_model", lambda image_prompt, *args, **kwargs: images.append(image_prompt) or "https://x/y.png")
+    outfit_params = params("pipelined short")
+    assert lambda_function.generate_outfit_pipelined(*outfit_params) == ("Navy suit.", "https://x/y.png")
+    assert images == [lambda_function.build_image_prompt("Navy suit.", *outfit_params)]
+
+def test_respond_early_returns_the_reserved_url_and_self_invokes(local_aws):
+    status, body = call({"body_type": "pear", "occasion": "wedding", "extra_details": "respond early", "respond_early": True}, Context())
+    assert status == 200
+    assert body["image_status"] == "pending"
+    assert body["outfit_description"]
+    [invocation] = local_aws.invocations
+    assert invocation["FunctionName"] == "StyleGenieAI"
+    assert invocation["InvocationType"] == "Event"
+    job = json.loads(invocation["Payload"])["image_job"]
+    assert lambda_function.s3_url(job["key"]) == body["image_url"]
+
+    # The asynchronous invocation fills the reserved key
+    filled = lambda_function.lambda_handler(json.loads(invocation["Payload"]), Context())
+    assert filled["image_url"] == body["image_url"]
+    assert clients.s3().head_object(Bucket=lambda_function.S3_BUCKET, Key=job["key"])["ContentLength"] > 0
+
+def test_respond_early_without_lambda_fills_the_image_in_a_thread(monkeypatch):
+    started = threading.Event()
+    monkeypatch.setattr(lambda_function, "generate_image_from_prompt", lambda *args, **kwargs: started.set())
+    status, body = call({"body_type": "pear", "occasion": "wedding", "extra_details": "respond early thread", "respond_early": True})
+    assert status == 200 and body["image_status"] == "pending"
+    assert started.wait(5)
+
+def test_cached_result_is_served_with_the_requested_profile_under_load(monkeypatch):
+    from stylegenie import profiles
+    body = dict(zip(("body_type", "occasion", "gender", "country", "age_range", "extra_details"), params("cached under load")))
+    status, first = call(body)
+    assert status == 200 and first["profile"] == "quality"
+
+    calls = []
+    monkeypatch.setattr(profiles, "_in_flight", profiles.LOAD_THRESHOLD + 1)
+    monkeypatch.setattr(lambda_function, "invoke_description_model", lambda *args, **kwargs: calls.append(args) or "new")
+    status, second = call(body)
+    assert status == 200 and calls == []
+    assert second["profile"] == "quality"
+    assert (second["outfit_description"], second["image_url"]) == (first["outfit_description"], first["image_url"])
+
+    # A miss is still stepped down
+    status, third = call(dict(body, extra_details="not cached under load"))
+    assert third["profile"] == "balanced"
+
+def test_image_is_downgraded_or_skipped_when_time_runs_short(monkeypatch):
+    from stylegenie import deadline
+    monkeypatch.setattr(deadline, "latency", deadline.LatencyStats())
+    rendered = []
+    monkeypatch.setattr(lambda_function, "generate_image_from_prompt", lambda image_prompt, prefix="fashion", profile=None, budget=None: rendered.append(profile) or "https://example.com/x.png")
+    quality_seconds = lambda_function.profile_settings("quality")["image"]["steps"] * lambda_function.IMAGE_SECONDS_PER_STEP
+    fast_seconds = lambda_function.profile_settings("fast")["image"]["steps"] * lambda_function.IMAGE_SECONDS_PER_STEP
+
+    class Short:
+        def __init__(self, seconds):
+            self.seconds = seconds
+
+        def get_remaining_time_in_millis(self):
+            return self.seconds * 1000
+
+    assert lambda_function.generate_image_within(deadline.Deadline(Short(quality_seconds + 1), reserve_ms=0), "prompt", profile="quality") == "https://example.com/x.png"
+    lambda_function.generate_image_within(deadline.Deadline(Short((quality_seconds + fast_seconds) / 2), reserve_ms=0), "prompt", profile="quality")
+    assert rendered == ["quality", "fast"]
+    skipped = lambda_function.generate_image_within(deadline.Deadline(Short(fast_seconds / 2), reserve_ms=0), "prompt", profile="quality")
+    assert skipped == lambda_function.SKIPPED_IMAGE_URL and len(rendered) == 2
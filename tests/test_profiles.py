@@ -0,0 +1,52 @@
+from stylegenie import profiles
+
+ESTIMATES_MS = {"fast": 4000, "balanced": 8000, "quality": 12000}
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+def test_resolve_scales_the_quality_settings():
+    fast = profiles.resolve("fast", {"max_tokens": 1000, "temperature": 0.7}, {"steps": 50})
+    assert fast == {"name": "fast", "text": {"max_tokens": 600, "temperature": 0.7}, "image": {"steps": 25}}
+    assert profiles.resolve("unknown", {"max_tokens": 1000}, {})["name"] == "quality"
+
+def test_resolve_keeps_the_minimums():
+    assert profiles.resolve("fast", {"max_tokens": 120}, {"steps": 12}) == {
+        "name": "fast", "text": {"max_tokens": 100}, "image": {"steps": 10}
+    }
+
+def test_select_uses_the_request_as_the_ceiling():
+    assert profiles.select("balanced") == "balanced"
+    assert profiles.select("bogus") == profiles.DEFAULT_PROFILE
+
+def test_select_steps_down_under_load(monkeypatch):
+    monkeypatch.setattr(profiles, "_in_flight", profiles.LOAD_THRESHOLD + 1)
+    assert profiles.select("quality") == "balanced"
+    assert profiles.select("fast") == "fast"
+
+def test_select_steps_down_until_the_estimate_fits():
+    assert profiles.select("quality", Context(60000), ESTIMATES_MS) == "quality"
+    assert profiles.select("quality", Context(11000), ESTIMATES_MS) == "balanced"
+    assert profiles.select("quality", Context(1000), ESTIMATES_MS) == "fast"
+
+def test_select_keeps_a_cached_ceiling(monkeypatch):
+    monkeypatch.setattr(profiles, "_in_flight", profiles.LOAD_THRESHOLD + 1)
+    probed = []
+
+    def is_cached(name):
+        probed.append(name)
+        return name == "quality"
+
+    assert profiles.select("quality", Context(1000), ESTIMATES_MS, is_cached) == "quality"
+    assert profiles.select("balanced", Context(1000), ESTIMATES_MS, is_cached) == "fast"
+    assert probed == ["quality", "balanced"]
+
+def test_track_request_counts_requests_in_flight():
+    before = profiles.in_flight()
+    with profiles.track_request():
+        assert profiles.in_flight() == before + 1
+    assert profiles.in_flight() == before
@@ -0,0 +1,70 @@
+import importlib.util
+import os
+
+import pytest
+
+from stylegenie.prompts import PromptTemplate, clean_text, fit_text, optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The prompt cases of deployment/prompt-benchmark.py, which also times them
+spec = importlib.util.spec_from_file_location("prompt_benchmark", os.path.join(ROOT, "deployment", "prompt-benchmark.py"))
+prompt_benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(prompt_benchmark)
+
+TEXT = clean_text(prompt_benchmark.LONG_DESCRIPTION)
+TEMPLATE = PromptTemplate(
+    "Fashion outfit: {description}. Style for {occasion} occasion. Professional fashion photography, high quality.",
+    max_length=200,
+    flexible=("description",)
+)
+
+@pytest.mark.parametrize("max_length", range(0, 260))
+def test_fit_text_never_cuts_mid_word(max_length):
+    fitted = fit_text(TEXT, max_length)
+    assert len(fitted) <= max_length
+    assert TEXT.startswith(fitted)
+    # Whatever follows the cut is not a letter or digit of the same word
+    assert len(fitted) == len(TEXT) or not fitted or not TEXT[len(fitted)].isalnum()
+
+def test_fit_text_keeps_whole_sentences_when_one_fits():
+    text = "A navy blazer. White shirt and chinos. Brown loafers."
+    assert fit_text(text, 40) == "A navy blazer. White shirt and chinos."
+    assert fit_text(text, 20) == "A navy blazer."
+
+def test_fit_text_falls_back_to_whole_words():
+    assert fit_text("A tailored navy blazer over a crisp white shirt", 20) == "A tailored navy"
+    assert fit_text("Houndstooth", 5) == ""
+
+def test_clean_text_strips_markdown():
+    assert clean_text("1. **Top**: a blazer\n- *Shoes*: loafers") == "Top: a blazer Shoes: loafers"
+
+def test_render_shortens_the_flexible_slot_and_keeps_the_fixed_wording():
+    prompt = TEMPLATE.render(description=TEXT, occasion="wedding")
+    assert len(prompt) <= 200
+    assert prompt.endswith(". Style for wedding occasion. Professional fashion photography, high quality.")
+
+def test_settled_prefix_renders_like_the_whole_text():
+    full = TEMPLATE.render(description=TEXT, occasion="wedding")
+    settled = [end for end in range(len(TEXT) + 1) if TEMPLATE.is_settled("description", TEXT[:end], occasion="wedding")]
+    # The prompt is fixed well before the text ends, and stays fixed from then on
+    assert settled and settled[0] < len(TEXT) // 2
+    assert settled == list(range(settled[0], len(TEXT) + 1))
+    for end in settled:
+        assert TEMPLATE.render(description=TEXT[:end], occasion="wedding") == full
+
+def test_templates_without_a_limit_never_settle():
+    assert not PromptTemplate("{a}").is_settled("a", TEXT)
+
+def test_optional_skips_empty_and_listed_values():
+    assert optional(" in {value}", "india") == " in india"
+    assert optional(" in {value}", "") == ""
+    assert optional(" in {value}", "global", skip=("global",)) == ""
+
+@pytest.mark.parametrize("name, build, max_length, tail", prompt_benchmark.cases(), ids=[case[0] for case in prompt_benchmark.cases()])
+def test_handler_prompts_fit_their_limit_and_keep_their_ending(name, build, max_length, tail):
+    prompt = build()
+    if max_length is not None:
+        assert len(prompt) <= max_length
+    if tail is not None:
+        assert prompt.endswith(tail)
@@ -0,0 +1,138 @@
+import pytest
+
+from stylegenie import ratelimit
+from stylegenie.ratelimit import AdaptiveBucket, ModelRateLimits
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+class Throttled(Exception):
+    def __init__(self, code="ThrottlingException"):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+def test_throttling_decreases_the_rate_multiplicatively(clock):
+    bucket = AdaptiveBucket(8, min_rate=1, decrease=0.5)
+    bucket.on_throttle()
+    assert bucket.rate == 4
+    assert bucket.tokens <= 0
+    clock.now += ratelimit.DECREASE_INTERVAL
+    bucket.on_throttle()
+    assert bucket.rate == 2
+    clock.now += ratelimit.DECREASE_INTERVAL
+    bucket.on_throttle()
+    clock.now += ratelimit.DECREASE_INTERVAL
+    bucket.on_throttle()
+    assert bucket.rate == 1
+
+def test_throttles_of_one_overload_decrease_once(clock):
+    bucket = AdaptiveBucket(8, decrease=0.5)
+    bucket.on_throttle()
+    clock.now += ratelimit.DECREASE_INTERVAL / 2
+    bucket.on_throttle()
+    assert bucket.rate == 4
+
+def test_success_increases_the_rate_additively_up_to_the_ceiling(clock):
+    bucket = AdaptiveBucket(8, decrease=0.5, increase=0.5)
+    bucket.on_throttle()
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(4 + 0.5 / 4)
+    for _ in range(1000):
+        bucket.on_success()
+    assert bucket.rate == 8
+
+def test_call_retries_throttling_and_slows_the_model(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+    limits = ModelRateLimits({"model": 1000}, adaptive=True)
+    failures = [Throttled(), Throttled()]
+
+    def invoke():
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    assert limits.call("model", invoke) == "ok"
+    assert limits.bucket("model").rate < 1000
+
+def test_call_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+    limits = ModelRateLimits(adaptive=True)
+    attempts = []
+
+    def invoke():
+        attempts.append(1)
+        raise Throttled()
+
+    with pytest.raises(Throttled):
+        limits.call("model", invoke, max_attempts=3)
+    assert len(attempts) == 3
+
+def test_call_does_not_retry_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: pytest.fail("slept past the deadline"))
+
+    class Budget:
+        def remaining(self):
+            return 0.0
+
+    with pytest.raises(Throttled):
+        ModelRateLimits(adaptive=True).call("model", lambda: (_ for _ in ()).throw(Throttled()), Budget())
+
+def test_other_errors_are_not_retried():
+    attempts = []
+
+    def invoke():
+        attempts.append(1)
+        raise Throttled("ValidationException")
+
+    with pytest.raises(Throttled):
+        ModelRateLimits(adaptive=True).call("model", invoke)
+    assert len(attempts) == 1
+
+class Budget:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def remaining(self):
+        return self.seconds
+
+def test_acquire_waits_for_a_token_that_arrives_in_time(monkeypatch, clock):
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+    monkeypatch.setattr(ratelimit.time, "sleep", sleep)
+    bucket = ratelimit.TokenBucket(2)
+    assert bucket.acquire(Budget(5)) == 0
+    assert bucket.acquire(Budget(5)) == 0
+    assert bucket.acquire(Budget(5)) == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert slept == [pytest.approx(0.5), pytest.approx(0.5)]
+
+def test_acquire_fails_fast_when_the_token_comes_after_the_deadline(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: pytest.fail("waited past the deadline"))
+    bucket = ratelimit.TokenBucket(1)
+    bucket.acquire(Budget(0))
+    with pytest.raises(ratelimit.RateLimitExceeded) as raised:
+        bucket.acquire(Budget(0.5))
+    assert ratelimit.error_code(raised.value) == "ThrottlingException"
+    # No token was taken by the refusal
+    clock.now += 1
+    assert bucket.try_acquire()
+
+def test_call_is_refused_before_invoking_when_no_token_fits(monkeypatch, clock):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: pytest.fail("waited past the deadline"))
+    limits = ModelRateLimits({"model": 1})
+    assert limits.call("model", lambda: "ok", Budget(10)) == "ok"
+    with pytest.raises(ratelimit.RateLimitExceeded, match="model"):
+        limits.call("model", lambda: pytest.fail("invoked"), Budget(0.5))
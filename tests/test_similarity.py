@@ -0,0 +1,49 @@
+import pytest
+
+from stylegenie.similarity import SimilarityIndex, equivalent, tokens
+
+LONG = ("I'd like breathable fabric for hot weather, light colours and comfortable shoes "
+        "for walking all day at the outdoor festival")
+PREGNANT = "I'm pregnant, comfortable and loose outfits with flat shoes and soft fabrics for a long day"
+
+@pytest.fixture
+def index(tmp_path):
+    return SimilarityIndex(str(tmp_path / "similar.idx"))
+
+def test_tokens_fold_filler_synonyms_and_plurals():
+    assert tokens("Please, I would prefer something WITHOUT heels") == ["no", "heel"]
+    assert tokens("avoid grey colours") == ["no", "gray", "color"]
+
+def test_rewording_matches(index):
+    index.add("scope", "no heels")
+    assert index.lookup("scope", "Without heels please") == ("no heels", 1.0)
+
+def test_rewording_of_a_long_text_matches(index):
+    index.add("scope", LONG)
+    reworded = LONG.replace("I'd like", "Please,").replace("colours", "colors")
+    assert index.lookup("scope", reworded) == (LONG, 1.0)
+
+def test_one_changed_word_in_a_long_text_is_a_miss(index):
+    index.add("scope", LONG)
+    assert index.lookup("scope", LONG.replace("hot", "cold")) is None
+
+def test_negation_is_a_miss(index):
+    index.add("scope", PREGNANT)
+    assert index.lookup("scope", PREGNANT.replace("I'm pregnant", "I'm not pregnant")) is None
+    index.add("scope", "heels")
+    assert index.lookup("scope", "no heels") is None
+
+def test_other_scopes_do_not_match(index):
+    index.add("wedding", "no heels")
+    assert index.lookup("funeral", "no heels") is None
+
+def test_threshold_limits_reordering():
+    assert equivalent("red shirt, blue trousers", "red shirt, blue trousers") == 1.0
+    assert equivalent("red shirt, blue trousers", "blue shirt, red trousers") is None
+    assert equivalent("flats, no heels", "no heels, flats", threshold=0.5) is not None
+    assert equivalent("flats, no heels", "no heels, flats", threshold=0.8) is None
+
+def test_index_survives_reopening(tmp_path):
+    path = str(tmp_path / "similar.idx")
+    SimilarityIndex(path).add("scope", "no heels")
+    assert SimilarityIndex(path).lookup("scope", "without heels") == ("no heels", 1.0)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+
+import pytest
+
+from stylegenie import singleflight
+from stylegenie.cache import LocalStore, ResponseCache
+from stylegenie.singleflight import Group
+
+def start(target, count):
+    results = [None] * count
+
+    def run(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_waiters_share_the_leader_value():
+    group = Group("test")
+    release = threading.Event()
+    calls = []
+
+    def producer():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    threads, results = start(lambda: group.do("key", producer, wait=5), 5)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert group.coalesced == 4
+
+def test_waiter_produces_itself_when_the_leader_fails():
+    group = Group("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("model error")
+
+    errors = []
+
+    def lead():
+        try:
+            group.do("key", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    waiter, results = start(lambda: group.do("key", lambda: "own value", wait=5), 1)
+    time.sleep(0.1)
+    release.set()
+    leader.join()
+    waiter[0].join()
+    assert len(errors) == 1
+    assert results == ["own value"]
+
+def test_waiter_gives_up_after_wait():
+    group = Group("test")
+    release = threading.Event()
+    threads, _ = start(lambda: group.do("key", lambda: release.wait(5) and "slow"), 1)
+    time.sleep(0.05)
+    assert group.do("key", lambda: "fast", wait=0.05) == "fast"
+    release.set()
+    threads[0].join()
+
+def test_wait_seconds_leaves_time_to_produce():
+    class Budget:
+        def __init__(self, remaining):
+            self.value = remaining
+
+        def remaining(self):
+            return self.value
+
+    assert singleflight.wait_seconds() == singleflight.COALESCE_WAIT_SECONDS
+    assert singleflight.wait_seconds(Budget(None)) == singleflight.COALESCE_WAIT_SECONDS
+    assert singleflight.wait_seconds(Budget(4)) == 2
+
+def test_local_marker_is_exclusive_until_released(tmp_path):
+    store = LocalStore(str(tmp_path))
+    assert store.claim("key") is True
+    assert store.claim("key") is False
+    assert store.claimed("key")
+    store.release("key")
+    assert not store.claimed("key")
+    assert store.claim("key") is True
+
+def test_stale_marker_is_taken_over(tmp_path):
+    store = LocalStore(str(tmp_path))
+    assert store.claim("key", ttl=60)
+    # Left behind by a producer that died two minutes ago
+    stale = time.time() - 120
+    os.utime(store._path("key") + ".lock", (stale, stale))
+    assert not store.claimed("key", ttl=60)
+    assert store.claim("key", ttl=60) is True
+
+@pytest.fixture
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(singleflight, "POLL_SECONDS", 0.01)
+    monkeypatch.setattr(singleflight, "MAX_POLL_SECONDS", 0.02)
+
+def test_other_instance_waits_for_the_marker_holder(tmp_path, fast_polls):
+    # Two caches over one store stand for two Lambda instances
+    store = LocalStore(str(tmp_path))
+    leader, follower = ResponseCache(store=store), ResponseCache(store=store)
+    assert store.claim("key")
+    calls = []
+    threads, results = start(lambda: follower.get_or_create("key", lambda: calls.append(1) or "own", wait=5), 1)
+    time.sleep(0.05)
+    leader.set("key", "shared")
+    store.release("key")
+    threads[0].join()
+    assert results == ["shared"]
+    assert calls == []
+    assert follower.stats()["coalesced"] == 1
+
+def test_waiter_produces_when_the_marker_is_released_without_a_value(tmp_path, fast_polls):
+    store = LocalStore(str(tmp_path))
+    follower = ResponseCache(store=store)
+    assert store.claim("key")
+    threads, results = start(lambda: follower.get_or_create("key", lambda: "own", wait=5), 1)
+    time.sleep(0.05)
+    store.release("key")
+    threads[0].join()
+    assert results == ["own"]
+    assert store.get("key")[1] == "own"
+    assert not store.claimed("key")
+
+def test_burst_of_identical_requests_makes_one_call_of_each(monkeypatch):
+    import json
+    import lambda_function
+
+    calls = {"text": 0, "image": 0}
+    invoke_text, generate_image = lambda_function.engine.invoke_text, lambda_function.engine.generate_image
+
+    def slow_text(*args, **kwargs):
+        calls["text"] += 1
+        time.sleep(0.1)
+        return invoke_text(*args, **kwargs)
+
+    def slow_image(*args, **kwargs):
+        calls["image"] += 1
+        time.sleep(0.1)
+        return generate_image(*args, **kwargs)
+
+    monkeypatch.setattr(lambda_function.engine, "invoke_text", slow_text)
+    monkeypatch.setattr(lambda_function.engine, "generate_image", slow_image)
+    # The fast profile cannot be stepped down under load, so every request shares its keys
+    event = {"body": json.dumps({"occasion": "promotion", "profile": "fast", "extra_details": "singleflight burst"})}
+    threads, results = start(lambda: lambda_function.lambda_handler(event, None), 20)
+    for thread in threads:
+        thread.join()
+    bodies = [json.loads(result["body"]) for result in results]
+    assert calls == {"text": 1, "image": 1}
+    assert len({(body["outfit_description"], body["image_url"]) for body in bodies}) == 1
@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import io
+
+import pytest
+
+from stylegenie import storage
+from stylegenie.artifacts import read_images
+from stylegenie.storage import KnownObjects, store_image
+
+BUCKET = "stylegenie-uploads"
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+class RecordingS3:
+    """S3 client recording calls; objects in `stored` exist"""
+
+    def __init__(self, stored=()):
+        self.stored = set(stored)
+        self.calls = []
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(("head", Key))
+        if Key not in self.stored:
+            raise Exception("404")
+        return {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        self.calls.append(("put", Key, data, kwargs))
+        self.stored.add(Key)
+
+@pytest.fixture(autouse=True)
+def fresh_known_objects(monkeypatch):
+    monkeypatch.setattr(storage, "known_objects", KnownObjects())
+
+def test_content_key_is_the_sha256_of_the_bytes():
+    assert storage.content_key(IMAGE) == f"images/{hashlib.sha256(IMAGE).hexdigest()}.png"
+
+def test_new_content_is_uploaded_as_immutable():
+    s3 = RecordingS3()
+    url = store_image(s3, BUCKET, IMAGE, "outfit")
+    key = storage.content_key(IMAGE)
+    assert url == f"https://{BUCKET}.s3.amazonaws.com/{key}"
+    assert s3.calls[0] == ("head", key)
+    assert s3.calls[1][:3] == ("put", key, IMAGE)
+    assert s3.calls[1][3]["CacheControl"] == storage.IMMUTABLE_CACHE_CONTROL
+
+def test_upload_is_skipped_when_head_finds_the_object():
+    key = storage.content_key(IMAGE)
+    s3 = RecordingS3(stored=[key])
+    assert store_image(s3, BUCKET, IMAGE).endswith(key)
+    assert s3.calls == [("head", key)]
+
+def test_known_objects_skip_the_head_request():
+    s3 = RecordingS3()
+    store_image(s3, BUCKET, IMAGE)
+    s3.calls.clear()
+    store_image(s3, BUCKET, IMAGE)
+    assert s3.calls == []
+
+def test_streamed_images_use_their_digest_and_file():
+    body = io.BytesIO(b'{"artifacts": [{"base64": "' + base64.b64encode(IMAGE) + b'"}]}')
+    [image] = read_images(body)
+    s3 = RecordingS3()
+    store_image(s3, BUCKET, image)
+    assert s3.calls[-1][:3] == ("put", storage.content_key(IMAGE), IMAGE)
+    assert s3.calls[-1][3]["ContentLength"] == len(IMAGE)
+
+def test_explicit_key_is_always_written():
+    s3 = RecordingS3(stored=["reserved.png"])
+    assert store_image(s3, BUCKET, IMAGE, key="reserved.png").endswith("/reserved.png")
+    assert [call[0] for call in s3.calls] == ["put"]
+
+def test_timestamp_mode_keeps_prefixed_names(monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_MODE", "timestamp")
+    s3 = RecordingS3()
+    url = store_image(s3, BUCKET, IMAGE, "outfit-pear")
+    assert url.startswith(f"https://{BUCKET}.s3.amazonaws.com/outfit-pear-")
+    assert [call[0] for call in s3.calls] == ["put"]
+
+def test_known_objects_is_a_bounded_lru():
+    known = KnownObjects(max_entries=2)
+    known.add("a")
+    known.add("b")
+    assert "a" in known
+    known.add("c")
+    assert "b" not in known
+    assert "a" in known and "c" in known
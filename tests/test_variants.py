@@ -0,0 +1,111 @@
+import io
+import json
+import threading
+
+import pytest
+from PIL import Image
+
+import lambda_function
+from stylegenie import clients, storage, variants
+from stylegenie.cache import LRUCache
+from stylegenie.storage import KnownObjects
+
+BUCKET = lambda_function.S3_BUCKET
+
+class CountingS3:
+    """Wraps the local S3 stand-in, counting variant uploads"""
+
+    def __init__(self):
+        self.s3 = clients.s3()
+        self.puts = []
+
+    def head_object(self, **kwargs):
+        return self.s3.head_object(**kwargs)
+
+    def put_object(self, **kwargs):
+        self.puts.append(kwargs)
+        return self.s3.put_object(**kwargs)
+
+def png(color, size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def stored(data):
+    return storage.store_image(clients.s3(), BUCKET, data)
+
+@pytest.fixture(autouse=True)
+def small_variants(monkeypatch):
+    monkeypatch.setattr(variants, "VARIANT_WIDTHS", [16, 32])
+    monkeypatch.setattr(variants, "VARIANT_FORMATS", ["webp", "jpeg"])
+    monkeypatch.setattr(variants, "placeholders", LRUCache(max_entries=16))
+    monkeypatch.setattr(storage, "known_objects", KnownObjects())
+
+def test_render_makes_every_width_and_format_and_a_placeholder():
+    placeholder, rendered = variants.render(png("red"))
+    assert placeholder.startswith("data:image/webp;base64,")
+    assert [(width, name) for width, name, _ in rendered] == [(16, "webp"), (16, "jpeg"), (32, "webp"), (32, "jpeg")]
+    for width, _, data in rendered:
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.width == width
+    assert variants.render(png("red"), encode=False)[1] == []
+
+def test_store_variants_keeps_the_placeholder_in_the_variant_metadata():
+    image_url = stored(png("green"))
+    description = variants.store_variants(clients.s3(), BUCKET, image_url, png("green"))
+    key = variants.key_from_url(BUCKET, image_url)
+    assert description["sources"][0] == {
+        "type": "image/webp",
+        "srcset": f"{storage.s3_url(BUCKET, variants.variant_key(key, 16, 'webp'))} 16w, {storage.s3_url(BUCKET, variants.variant_key(key, 32, 'webp'))} 32w"
+    }
+    assert description["sources"][1]["type"] == "image/jpeg"
+    # Another container, without the image in its memory, reads the placeholder from the store
+    variants.placeholders = LRUCache(max_entries=16)
+    assert variants.describe(clients.s3(), BUCKET, image_url) == description
+    assert description["placeholder"].startswith("data:image/webp;base64,")
+
+def test_existing_variants_are_not_encoded_again(monkeypatch):
+    image_url = stored(png("blue"))
+    first = variants.store_variants(clients.s3(), BUCKET, image_url, png("blue"))
+    variants.placeholders = LRUCache(max_entries=16)
+    monkeypatch.setattr(variants, "render", lambda *args, **kwargs: pytest.fail("rendered again"))
+    s3 = CountingS3()
+    assert variants.store_variants(s3, BUCKET, image_url, png("blue")) == first
+    assert s3.puts == []
+
+def test_describe_without_variants_is_none():
+    assert variants.describe(clients.s3(), BUCKET, stored(png("white"))) is None
+    assert variants.describe(clients.s3(), BUCKET, "https://example.com/elsewhere.png") is None
+
+def test_upload_returns_before_the_variants_are_rendered(monkeypatch):
+    release = threading.Event()
+    render = variants.render
+
+    def slow_render(*args, **kwargs):
+        release.wait(5)
+        return render(*args, **kwargs)
+    monkeypatch.setattr(variants, "render", slow_render)
+
+    image = io.BytesIO(png("yellow"))
+    image_url = storage.store_image(clients.s3(), BUCKET, image.getvalue())
+    future = variants.store_variants_later(clients.s3(), BUCKET, image_url, image)
+    # The caller may close its image as soon as this returns
+    image.close()
+    assert not future.done()
+    assert variants.describe(clients.s3(), BUCKET, image_url) is None
+    assert variants.store_variants_later(clients.s3(), BUCKET, image_url, png("yellow")) is future
+
+    release.set()
+    variants.wait(BUCKET, image_url, timeout=5)
+    assert variants.describe(clients.s3(), BUCKET, image_url)["placeholder"]
+
+def test_cached_responses_carry_the_placeholder(monkeypatch):
+    body = {"occasion": "gala", "extra_details": "variants placeholder on the cached path"}
+    first = json.loads(lambda_function.lambda_handler({"body": json.dumps(body)}, None)["body"])
+    variants.wait(BUCKET, first["image_url"], timeout=5)
+
+    # A container that did not generate the image answers from the cache
+    variants.placeholders = LRUCache(max_entries=16)
+    second = json.loads(lambda_function.lambda_handler({"body": json.dumps(body)}, None)["body"])
+    assert second["image_url"] == first["image_url"]
+    assert second["image_variants"]["placeholder"].startswith("data:image/webp;base64,")